@@ -1,5 +1,8 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from redisStore.job_events import job_event_hub
+from redisStore.myconnection import init_connection_pools, close_connection_pools
 from routes import (
     jobs,
     create_answer,
@@ -7,7 +10,9 @@ from routes import (
     star_feedback,
     audio_analysis,
     facial_analysis,
+    metrics,
 )
+from routes.star_feedback import warmup_inline_classifier
 
 
 api_description = """
@@ -20,10 +25,22 @@ DeepFace proivides emotional facial analysis for the submitted videos.
 Provided feedback is Big Five Scores, Star Scores, competency scores, and statistical feedback.  
 """
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Redis connection pools live as long as the application
+    init_connection_pools()
+    await warmup_inline_classifier()
+    yield
+    await job_event_hub.close()
+    await close_connection_pools()
+
+
 app = FastAPI(
     title="MLAPI",
     description=api_description,
     version="0.1.0",
+    lifespan=lifespan,
 )
 app.add_middleware(
     CORSMiddleware,
@@ -48,6 +65,7 @@ app.include_router(big_five.router)
 app.include_router(star_feedback.router)
 app.include_router(audio_analysis.router)
 app.include_router(facial_analysis.router)
+app.include_router(metrics.router)
 
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,185 @@
+"""
+Admission control for job submissions.
+
+Enqueuing without limit during a traffic spike makes every user wait longer.
+Submissions are instead rejected, with a hint of when to retry, when
+
+- the queues are deeper, or their estimated backlog longer, than configured
+  (from `redisStore.monitor.get_queue_stats`), or
+- the client has used up its token bucket.
+
+Jobs that are admitted therefore start within a bounded time.
+"""
+
+import math
+import os
+import threading
+import time
+from typing import NamedTuple, Optional
+
+from redis.commands.core import Script
+from redisStore.monitor import get_queue_stats
+from redisStore.myconnection import get_redis_con
+from utils.logger_config import get_logger
+
+logger = get_logger(__name__)
+
+# Queued jobs across all queues above which submissions are rejected (0 disables)
+ADMISSION_MAX_QUEUE_DEPTH = int(os.getenv("ADMISSION_MAX_QUEUE_DEPTH", 500))
+# Estimated seconds before a new job would start above which submissions are
+# rejected (0 disables)
+ADMISSION_MAX_BACKLOG_SECONDS = float(os.getenv("ADMISSION_MAX_BACKLOG_SECONDS", 1800))
+# Seconds queue statistics are reused before being read again
+ADMISSION_STATS_TTL = float(os.getenv("ADMISSION_STATS_TTL", 2))
+# Submissions per second each client may sustain (0 disables the limit)
+RATE_LIMIT_PER_SECOND = float(os.getenv("RATE_LIMIT_PER_SECOND", 0))
+# Submissions a client may make in a burst
+RATE_LIMIT_BURST = int(os.getenv("RATE_LIMIT_BURST", 10))
+
+RATE_LIMIT_KEY_PREFIX = "mlapi:ratelimit"
+
+# Refill a client's bucket and take `cost` tokens if it has them. A cost above
+# the burst is admitted from a full bucket and leaves it in debt, so large
+# batches are possible but paid for in full. Returns whether the request is
+# allowed and, if not, the seconds until enough tokens are available.
+TOKEN_BUCKET_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local cost = tonumber(ARGV[4])
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or burst
+local ts = tonumber(state[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - ts) * rate)
+local needed = math.min(cost, burst)
+local allowed = 0
+local wait = 0
+if tokens >= needed then
+    tokens = tokens - cost
+    allowed = 1
+else
+    wait = (needed - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil((burst - tokens) / rate) + 1)
+return {allowed, tostring(wait)}
+"""
+
+
+class AdmissionDecision(NamedTuple):
+    allowed: bool
+    retry_after: int = 0  # Seconds, when rejected
+    reason: str = ""
+
+
+ADMITTED = AdmissionDecision(True)
+
+
+class AdmissionController:
+    """
+    Decides whether a submission may be enqueued.
+
+    Queue statistics are cached for a short time so a burst of submissions
+    costs one read of the queues, not one per request. Any Redis error admits
+    the submission: enqueuing will then fail on its own if Redis is down.
+    """
+
+    def __init__(
+        self,
+        max_queue_depth: int = ADMISSION_MAX_QUEUE_DEPTH,
+        max_backlog_seconds: float = ADMISSION_MAX_BACKLOG_SECONDS,
+        rate: float = RATE_LIMIT_PER_SECOND,
+        burst: int = RATE_LIMIT_BURST,
+        stats_ttl: float = ADMISSION_STATS_TTL,
+    ):
+        self.max_queue_depth = max_queue_depth
+        self.max_backlog_seconds = max_backlog_seconds
+        self.rate = rate
+        self.burst = burst
+        self.stats_ttl = stats_ttl
+        self._stats: Optional[dict] = None
+        self._stats_read_at = 0.0
+        self._lock = threading.Lock()
+        self._token_bucket: Optional[Script] = None
+
+    def _queue_stats(self, redis_conn) -> dict:
+        with self._lock:
+            if (
+                self._stats is None
+                or time.monotonic() - self._stats_read_at > self.stats_ttl
+            ):
+                self._stats = get_queue_stats(redis_conn)
+                self._stats_read_at = time.monotonic()
+            return self._stats
+
+    def check_queues(self, redis_conn) -> AdmissionDecision:
+        """
+        Reject submissions while the queues are over their limits.
+        """
+        stats = self._queue_stats(redis_conn)
+        if not stats:
+            return ADMITTED
+        depth = sum(queue["count"] for queue in stats.values())
+        backlog = max(queue["backlog_seconds"] for queue in stats.values())
+        # Retrying once the excess backlog has drained is a reasonable guess
+        if self.max_queue_depth and depth >= self.max_queue_depth:
+            per_job = backlog / depth if depth else 1
+            retry_after = (depth - self.max_queue_depth + 1) * per_job
+            return AdmissionDecision(
+                False, max(math.ceil(retry_after), 1), "queue_depth"
+            )
+        if self.max_backlog_seconds and backlog >= self.max_backlog_seconds:
+            retry_after = backlog - self.max_backlog_seconds
+            return AdmissionDecision(False, max(math.ceil(retry_after), 1), "backlog")
+        return ADMITTED
+
+    def check_rate(
+        self, redis_conn, client_id: str, cost: int = 1
+    ) -> AdmissionDecision:
+        """
+        Take `cost` tokens from the client's bucket, shared by all API
+        processes.
+        """
+        if self.rate <= 0:
+            return ADMITTED
+        if self._token_bucket is None:
+            self._token_bucket = redis_conn.register_script(TOKEN_BUCKET_SCRIPT)
+        allowed, wait = self._token_bucket(
+            keys=[f"{RATE_LIMIT_KEY_PREFIX}:{client_id}"],
+            args=[self.rate, self.burst, time.time(), cost],
+            client=redis_conn,
+        )
+        if allowed:
+            return ADMITTED
+        return AdmissionDecision(False, max(math.ceil(float(wait)), 1), "rate_limit")
+
+    def admit(self, client_id: str, cost: int = 1) -> AdmissionDecision:
+        """
+        Decide whether a client's submission may be enqueued.
+
+        Args:
+            client_id: Identifies the client for rate limiting
+            cost: Tokens the submission takes, e.g. the videos of a batch
+
+        Returns:
+            AdmissionDecision: Whether to admit, and when to retry if not
+        """
+        try:
+            redis_conn = get_redis_con()
+            # Queues first, so rejected submissions do not use up tokens
+            decision = self.check_queues(redis_conn)
+            if decision.allowed:
+                decision = self.check_rate(redis_conn, client_id, cost)
+        except Exception as e:
+            logger.warning(f"Admitting submission without checks: {str(e)}")
+            return ADMITTED
+        if not decision.allowed:
+            logger.warning(
+                f"Rejected submission from {client_id} ({decision.reason}), "
+                f"retry after {decision.retry_after}s"
+            )
+        return decision
+
+
+# Create a singleton instance
+admission_controller = AdmissionController()
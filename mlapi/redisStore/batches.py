@@ -0,0 +1,129 @@
+"""
+Batches of create_answer submissions.
+
+A batch enqueues the audio, facial and create_answer jobs of many videos in
+one Redis transaction, so either every job of the batch exists or none does.
+The batch record maps each video to its jobs and is what progress is read
+from.
+"""
+
+import json
+import os
+import uuid
+from typing import Any, Dict, List, Optional
+
+from redisStore.jobs import describe_jobs
+from redisStore.myconnection import get_redis_con
+from schemas.jobs import JobStatus
+
+# Maximum videos accepted in one batch
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", 100))
+# Seconds a batch record is kept after submission
+BATCH_TTL = int(os.getenv("BATCH_TTL", 24 * 60 * 60))
+
+BATCH_KEY_PREFIX = "mlapi:batch"
+
+# Jobs of a batch item, in the order they are enqueued
+BATCH_STAGES = ("audio_job_id", "facial_job_id", "job_id")
+
+
+def batch_key(batch_id: str) -> str:
+    return f"{BATCH_KEY_PREFIX}:{batch_id}"
+
+
+def new_batch_id() -> str:
+    return uuid.uuid4().hex
+
+
+def save_batch(pipe, batch_id: str, items: List[Dict[str, str]]):
+    """
+    Queue the batch record on a pipeline, to be written in the same
+    transaction as the batch's jobs.
+
+    Args:
+        pipe: Redis pipeline the jobs are enqueued on
+        batch_id: The batch ID
+        items: One dict per video with its URL and the IDs of its jobs
+    """
+    key = batch_key(batch_id)
+    pipe.set(key, json.dumps(items))
+    pipe.expire(key, BATCH_TTL)
+
+
+def load_batch(redis_conn, batch_id: str) -> Optional[List[Dict[str, str]]]:
+    """
+    Read the items of a batch.
+
+    Returns:
+        Optional[List[Dict[str, str]]]: The items, None if the batch does not exist
+    """
+    record = redis_conn.get(batch_key(batch_id))
+    if record is None:
+        return None
+    return json.loads(record)
+
+
+def batch_job_ids(items: List[Dict[str, str]]) -> List[str]:
+    """
+    IDs of every job of a batch.
+    """
+    return [item[stage] for item in items for stage in BATCH_STAGES]
+
+
+def describe_batch(batch_id: str) -> Optional[Dict[str, Any]]:
+    """
+    Build the progress of a batch from its jobs' statuses.
+
+    All jobs are read with the pipelined `describe_jobs`. Each item reports
+    the status of its create_answer job; `progress` counts finished jobs of
+    every stage, so it also moves while the analyses run. Jobs that expired
+    count as failed.
+
+    Args:
+        batch_id: The batch ID
+
+    Returns:
+        Optional[dict]: `BatchResponse` body, None if the batch does not exist
+    """
+    redis_conn = get_redis_con()
+    items = load_batch(redis_conn, batch_id)
+    if items is None:
+        return None
+
+    jobs, _ = describe_jobs(batch_job_ids(items))
+    by_id = {job["job_id"]: job for job in jobs}
+    missing = {"status": JobStatus.FAILED, "error": "Job not found"}
+
+    finished_jobs = 0
+    counts = {status: 0 for status in JobStatus}
+    records = []
+    for index, item in enumerate(items):
+        for stage in BATCH_STAGES:
+            if by_id.get(item[stage], missing)["status"] in (
+                JobStatus.COMPLETED,
+                JobStatus.FAILED,
+            ):
+                finished_jobs += 1
+        job = by_id.get(item["job_id"], missing)
+        counts[job["status"]] += 1
+        record = {
+            "index": index,
+            "video_url": item["video_url"],
+            "job_id": item["job_id"],
+            "status": job["status"],
+        }
+        if job.get("error"):
+            record["error"] = job["error"]
+        records.append(record)
+
+    total_jobs = len(items) * len(BATCH_STAGES)
+    return {
+        "batch_id": batch_id,
+        "total": len(items),
+        "pending": counts[JobStatus.PENDING],
+        "processing": counts[JobStatus.PROCESSING],
+        "completed": counts[JobStatus.COMPLETED],
+        "failed": counts[JobStatus.FAILED],
+        "progress": round(finished_jobs / total_jobs, 4) if total_jobs else 1.0,
+        "items": records,
+    }
@@ -0,0 +1,185 @@
+"""
+Checkpoints of long jobs' progress, so a requeued job resumes where it died.
+
+A job saves its scalar state and the rows it produced so far every
+CHECKPOINT_INTERVAL seconds. Each save appends only the rows added since
+the previous one, packed as float32, and rewrites the small
+state in the same MULTI, so a checkpoint costs one round trip of a few
+hundred bytes however far the job got. Rows are therefore lossy beyond ~7
+significant digits, like the compact job serializer's float arrays.
+
+Checkpoints are keyed by job ID, which RQ keeps when a job is retried or
+the reaper requeues it, and expire after CHECKPOINT_TTL seconds.
+"""
+
+import json
+import os
+import time
+from array import array
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from rq import get_current_job
+from utils.logger_config import get_logger
+
+logger = get_logger(__name__)
+
+# Seconds between checkpoints of a running job (0 disables checkpoints)
+CHECKPOINT_INTERVAL = float(os.getenv("CHECKPOINT_INTERVAL", 5))
+# Seconds a checkpoint is kept after its last save
+CHECKPOINT_TTL = int(os.getenv("CHECKPOINT_TTL", 86400))
+
+CHECKPOINT_KEY_PREFIX = "mlapi:checkpoints"
+
+
+def checkpoint_keys(job_id: str) -> Tuple[str, str]:
+    """Keys of a job's checkpoint state and rows"""
+    key = f"{CHECKPOINT_KEY_PREFIX}:{job_id}"
+    return key, f"{key}:rows"
+
+
+def clear_checkpoint(redis_conn, job_id: str):
+    """Delete a job's checkpoint, if any"""
+    redis_conn.delete(*checkpoint_keys(job_id))
+
+
+class Checkpoint:
+    """
+    Resumable progress of one job.
+
+    The job's output is a table of float columns that grow together, whose
+    rows do not change once written, and state that is JSON serializable.
+    `params` identify the work: a checkpoint saved with other params is
+    discarded rather than resumed. Saving and loading never raise; a job
+    without a usable checkpoint starts over.
+    """
+
+    def __init__(
+        self,
+        redis_conn,
+        job_id: str,
+        columns: Sequence[str],
+        params: Optional[Dict[str, Any]] = None,
+        interval: Optional[float] = None,
+    ):
+        self.connection = redis_conn
+        self.job_id = job_id
+        self.columns = list(columns)
+        self.params = params or {}
+        self.interval = CHECKPOINT_INTERVAL if interval is None else interval
+        self.state_key, self.rows_key = checkpoint_keys(job_id)
+        self._saved_rows = 0
+        self._saved_at = time.monotonic()
+
+    @classmethod
+    def for_current_job(
+        cls, columns: Sequence[str], params: Optional[Dict[str, Any]] = None
+    ) -> Optional["Checkpoint"]:
+        """
+        Checkpoint of the job running in this process.
+
+        Returns:
+            Optional[Checkpoint]: None outside a job or with checkpoints disabled
+        """
+        if CHECKPOINT_INTERVAL <= 0:
+            return None
+        job = get_current_job()
+        if job is None:
+            return None
+        return cls(job.connection, job.id, columns, params)
+
+    def load(self) -> Optional[Tuple[Dict[str, Any], Dict[str, List[float]]]]:
+        """
+        Read the last checkpoint.
+
+        Returns:
+            Optional[Tuple[Dict[str, Any], Dict[str, List[float]]]]: The saved
+            state and each column, None if there is no matching checkpoint
+        """
+        try:
+            with self.connection.pipeline(transaction=False) as pipe:
+                pipe.hgetall(self.state_key)
+                pipe.get(self.rows_key)
+                saved, packed = pipe.execute()
+            if not saved:
+                return None
+            if json.loads(saved[b"params"]) != self.params:
+                logger.info(
+                    f"Discarding checkpoint of job {self.job_id}: params changed"
+                )
+                clear_checkpoint(self.connection, self.job_id)
+                return None
+            state = json.loads(saved[b"state"])
+            row_count = int(saved[b"rows"])
+            values = array("f")
+            values.frombytes((packed or b"")[: row_count * len(self.columns) * 4])
+            if len(values) != row_count * len(self.columns):
+                raise ValueError("rows are truncated")
+        except Exception as e:
+            logger.warning(f"Ignoring checkpoint of job {self.job_id}: {str(e)}")
+            return None
+        self._saved_rows = row_count
+        width = len(self.columns)
+        table = {
+            column: values[index::width].tolist()
+            for index, column in enumerate(self.columns)
+        }
+        return state, table
+
+    def save(
+        self, state: Dict[str, Any], table: Dict[str, List[float]], force: bool = False
+    ) -> bool:
+        """
+        Save the job's progress, at most once every `interval` seconds.
+
+        Cheap to call for every unit of work. Only rows added since the last
+        save are written; columns shorter than the longest are padded with
+        zeros.
+
+        Args:
+            state: JSON serializable state to resume from
+            table: Every column produced so far
+            force: Save even if the last save is recent
+
+        Returns:
+            bool: Whether a checkpoint was written
+        """
+        saved_at = time.monotonic()
+        if not force and saved_at - self._saved_at < self.interval:
+            return False
+        self._saved_at = saved_at
+        row_count = max((len(table.get(c, ())) for c in self.columns), default=0)
+        rows = array("f")
+        for row in range(self._saved_rows, row_count):
+            for column in self.columns:
+                values = table.get(column, ())
+                rows.append(values[row] if row < len(values) else 0.0)
+        try:
+            with self.connection.pipeline() as pipe:
+                if self._saved_rows == 0:
+                    pipe.delete(self.rows_key)
+                if rows:
+                    pipe.append(self.rows_key, rows.tobytes())
+                pipe.hset(
+                    self.state_key,
+                    mapping={
+                        "params": json.dumps(self.params),
+                        "state": json.dumps(state),
+                        "rows": row_count,
+                    },
+                )
+                pipe.expire(self.state_key, CHECKPOINT_TTL)
+                pipe.expire(self.rows_key, CHECKPOINT_TTL)
+                pipe.execute()
+        except Exception as e:
+            logger.warning(f"Could not checkpoint job {self.job_id}: {str(e)}")
+            return False
+        self._saved_rows = row_count
+        return True
+
+    def clear(self):
+        """Delete the checkpoint once the job is done"""
+        try:
+            clear_checkpoint(self.connection, self.job_id)
+        except Exception as e:
+            logger.warning(f"Could not clear checkpoint of job {self.job_id}: {str(e)}")
+        self._saved_rows = 0
@@ -0,0 +1,163 @@
+"""
+Idempotent job submission.
+
+Double-clicks and client retries must not start the same analysis twice. A
+submission is identified by a client-supplied `Idempotency-Key` header,
+or failing that by a hash of its parameters, both scoped to the tenant that
+sent it. The first submission enqueues its
+jobs under a Redis lock and records the job ID; identical submissions within
+the dedup window get that job ID back instead of new jobs.
+"""
+
+import hashlib
+import json
+import os
+from typing import Any, Callable, Dict, Optional, Tuple, Union
+
+from redis.exceptions import LockError
+from redisStore.jobs import RQ_STATUS_MAP
+from redisStore.myconnection import get_redis_con
+from schemas.jobs import JobStatus
+from rq.job import Job
+from utils.logger_config import get_logger
+
+logger = get_logger(__name__)
+
+# Seconds during which identical submissions return the existing job (0 disables)
+IDEMPOTENCY_WINDOW = int(os.getenv("IDEMPOTENCY_WINDOW", 600))
+# Seconds an identical submission waits for the first one to finish enqueuing
+IDEMPOTENCY_LOCK_TIMEOUT = float(os.getenv("IDEMPOTENCY_LOCK_TIMEOUT", 10))
+
+IDEMPOTENCY_KEY_PREFIX = "mlapi:idempotency"
+
+
+class IdempotencyError(Exception):
+    """
+    An idempotent submission could not be completed.
+    """
+
+    def __init__(self, message: str, status_code: int):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def fingerprint(scope: str, params: Dict[str, Any]) -> str:
+    """
+    Hash of a submission's parameters.
+
+    Args:
+        scope: Kind of submission, e.g. "create_answer"
+        params: Parameters that define the submitted work
+
+    Returns:
+        str: Hex digest
+    """
+    canonical = json.dumps({"scope": scope, **params}, sort_keys=True, default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def _reusable_job(
+    redis_conn, record: Optional[Union[bytes, str]], params_hash: str
+) -> Optional[str]:
+    """
+    The job ID of a recorded submission, if it can still be returned.
+
+    Raises:
+        IdempotencyError: If the key was used for different parameters
+    """
+    if record is None:
+        return None
+    recorded = json.loads(record)
+    if recorded["fingerprint"] != params_hash:
+        raise IdempotencyError(
+            "Idempotency-Key was already used with different parameters", 422
+        )
+    status = redis_conn.hget(Job.key_for(recorded["job_id"]), "status")
+    # Expired or failed jobs are submitted again
+    if status is None or RQ_STATUS_MAP.get(status.decode("utf-8")) == JobStatus.FAILED:
+        return None
+    return recorded["job_id"]
+
+
+def submit_once(
+    scope: str,
+    params: Dict[str, Any],
+    submit: Callable[[], str],
+    client_key: Optional[str] = None,
+    owner: Optional[str] = None,
+) -> Tuple[str, bool]:
+    """
+    Run a submission unless an identical one happened within the dedup window.
+
+    Concurrent identical submissions are serialized with a Redis lock, so only
+    the first enqueues jobs. If Redis cannot be reached for the bookkeeping,
+    the submission goes ahead without deduplication.
+
+    Args:
+        scope: Kind of submission, e.g. "create_answer"
+        params: Parameters that define the submitted work
+        submit: Enqueues the jobs and returns the job ID to hand out
+        client_key: Idempotency-Key header value, if the client sent one
+        owner: Tenant or client the submission belongs to, so tenants
+            picking the same key or sending the same parameters do not
+            share jobs
+
+    Returns:
+        Tuple: The job ID, and whether this call created it
+
+    Raises:
+        IdempotencyError: If the key was used for different parameters (422)
+            or an identical submission is still enqueuing (409)
+    """
+    if IDEMPOTENCY_WINDOW <= 0:
+        return submit(), True
+
+    params_hash = fingerprint(scope, params)
+    if client_key:
+        key = f"{IDEMPOTENCY_KEY_PREFIX}:{scope}:key:{owner or ''}:{client_key}"
+    else:
+        key = f"{IDEMPOTENCY_KEY_PREFIX}:{scope}:{owner or ''}:{params_hash}"
+
+    try:
+        redis_conn = get_redis_con()
+        job_id = _reusable_job(redis_conn, redis_conn.get(key), params_hash)
+        if job_id is not None:
+            return job_id, False
+        lock = redis_conn.lock(
+            f"{key}:lock",
+            timeout=IDEMPOTENCY_LOCK_TIMEOUT,
+            blocking_timeout=IDEMPOTENCY_LOCK_TIMEOUT,
+        )
+        acquired = lock.acquire()
+    except IdempotencyError:
+        raise
+    except Exception as e:
+        logger.warning(f"Submitting {scope} without deduplication: {str(e)}")
+        return submit(), True
+
+    if not acquired:
+        raise IdempotencyError("An identical submission is still being processed", 409)
+
+    try:
+        # The submission holding the lock before us may have recorded a job
+        job_id = _reusable_job(redis_conn, redis_conn.get(key), params_hash)
+        if job_id is not None:
+            return job_id, False
+
+        job_id = submit()
+        try:
+            redis_conn.set(
+                key,
+                json.dumps({"job_id": job_id, "fingerprint": params_hash}),
+                ex=IDEMPOTENCY_WINDOW,
+            )
+        except Exception as e:
+            logger.warning(f"Could not record {scope} submission {job_id}: {str(e)}")
+        return job_id, True
+    finally:
+        try:
+            lock.release()
+        except LockError:
+            logger.warning(f"Idempotency lock for {scope} expired before release")
+        except Exception as e:
+            logger.warning(f"Could not release idempotency lock for {scope}: {str(e)}")
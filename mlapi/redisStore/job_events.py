@@ -0,0 +1,148 @@
+"""
+Job status events pushed from the workers to API subscribers.
+
+Workers publish every status transition on a single Redis pub/sub channel.
+Each API process holds one subscription to that channel and fans the events
+out to in-memory queues, so idle subscribers cost no Redis traffic.
+
+The same transitions are appended to a capped Redis Stream, which the monitor
+reads incrementally from its last position.
+"""
+
+import asyncio
+import json
+import os
+from collections import defaultdict
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, Optional, Set
+
+from redisStore.myconnection import get_async_redis_con
+from schemas.jobs import JobStatus
+from utils.logger_config import get_logger
+
+logger = get_logger(__name__)
+
+JOB_EVENTS_CHANNEL = "mlapi:job-events"
+JOB_LIFECYCLE_STREAM = "mlapi:job-lifecycle"
+# Approximate number of transitions kept in the lifecycle stream
+JOB_LIFECYCLE_MAXLEN = int(os.getenv("JOB_LIFECYCLE_MAXLEN", 100000))
+
+
+def publish_job_status(redis_conn, job_id: str, status: JobStatus):
+    """
+    Publish a job status transition and append it to the lifecycle stream.
+    Failures are logged, never raised, so they cannot affect the job itself.
+
+    Args:
+        redis_conn: Synchronous Redis connection
+        job_id: The job ID
+        status: The new status
+    """
+    try:
+        value = JobStatus(status).value
+        with redis_conn.pipeline(transaction=False) as pipe:
+            pipe.publish(
+                JOB_EVENTS_CHANNEL, json.dumps({"job_id": job_id, "status": value})
+            )
+            pipe.xadd(
+                JOB_LIFECYCLE_STREAM,
+                {"job_id": job_id, "status": value},
+                maxlen=JOB_LIFECYCLE_MAXLEN,
+                approximate=True,
+            )
+            pipe.execute()
+    except Exception as e:
+        logger.warning(f"Could not publish status of job {job_id}: {str(e)}")
+
+
+class JobEventHub:
+    """
+    Single Redis subscription per process, fanned out to local subscribers.
+    """
+
+    def __init__(self):
+        self._subscribers: Dict[str, Set[asyncio.Queue]] = defaultdict(set)
+        self._task: Optional[asyncio.Task] = None
+        self._ready = asyncio.Event()
+
+    @property
+    def subscriber_count(self) -> int:
+        return sum(len(queues) for queues in self._subscribers.values())
+
+    def _ensure_listening(self):
+        if self._task is None or self._task.done():
+            self._ready = asyncio.Event()
+            self._task = asyncio.create_task(self._listen())
+
+    async def _listen(self):
+        """
+        Relay channel messages to subscriber queues, resubscribing on errors.
+        """
+        while True:
+            redis_conn = get_async_redis_con()
+            pubsub = redis_conn.pubsub()
+            try:
+                await pubsub.subscribe(JOB_EVENTS_CHANNEL)
+                self._ready.set()
+                while True:
+                    message = await pubsub.get_message(
+                        ignore_subscribe_messages=True, timeout=1.0
+                    )
+                    if message is None:
+                        continue
+                    event = json.loads(message["data"])
+                    for queue in self._subscribers.get(event["job_id"], ()):
+                        queue.put_nowait((event["job_id"], JobStatus(event["status"])))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Job event subscription failed: {str(e)}")
+                await asyncio.sleep(1)
+            finally:
+                self._ready.clear()
+                await pubsub.aclose()
+                await redis_conn.aclose()
+
+    @asynccontextmanager
+    async def subscribe(self, *job_ids: str) -> AsyncIterator[asyncio.Queue]:
+        """
+        Receive the status transitions of one or more jobs on a queue.
+
+        Args:
+            job_ids: The job IDs
+
+        Yields:
+            asyncio.Queue: Queue of `(job_id, JobStatus)` tuples
+        """
+        queue: asyncio.Queue = asyncio.Queue()
+        for job_id in job_ids:
+            self._subscribers[job_id].add(queue)
+        self._ensure_listening()
+        try:
+            # Events published before the channel subscription would be lost
+            try:
+                await asyncio.wait_for(self._ready.wait(), timeout=5)
+            except asyncio.TimeoutError:
+                logger.warning("Job event subscription is not ready")
+            yield queue
+        finally:
+            for job_id in job_ids:
+                self._subscribers[job_id].discard(queue)
+                if not self._subscribers[job_id]:
+                    del self._subscribers[job_id]
+
+    async def close(self):
+        """
+        Stop listening. Called at API shutdown.
+        """
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except (asyncio.CancelledError, Exception):
+                pass
+            self._task = None
+
+
+# Create a singleton instance
+job_event_hub = JobEventHub()
@@ -0,0 +1,200 @@
+"""
+Job lookups shared by the route handlers.
+
+The synchronous helpers talk to Redis through RQ and must be run off the event
+loop (e.g. with `run_in_threadpool`). `read_job_status` uses redis.asyncio and
+only reads the status field, without loading the pickled job.
+"""
+
+import os
+from typing import Any, Dict, List, Optional, Tuple
+from rq.job import Job
+from rq.results import Result
+from redisStore.myconnection import get_redis_con
+from redisStore.serializer import get_serializer
+from schemas.jobs import JobStatus
+
+# Upper bound on the job IDs accepted by one bulk status request
+MAX_BULK_JOB_IDS = int(os.getenv("MAX_BULK_JOB_IDS", 500))
+
+# RQ job statuses mapped onto the statuses reported by the API
+RQ_STATUS_MAP = {
+    "queued": JobStatus.PENDING,
+    "deferred": JobStatus.PENDING,
+    "scheduled": JobStatus.PENDING,
+    "started": JobStatus.PROCESSING,
+    "finished": JobStatus.COMPLETED,
+    "failed": JobStatus.FAILED,
+    "stopped": JobStatus.FAILED,
+    "canceled": JobStatus.FAILED,
+}
+
+
+def fetch_job(job_id: str) -> Job:
+    """
+    Fetch a job from Redis.
+
+    Args:
+        job_id: The job ID
+
+    Returns:
+        Job: The RQ job
+    """
+    return Job.fetch(job_id, connection=get_redis_con(), serializer=get_serializer())
+
+
+def _serialize_result(result: Any) -> Any:
+    return result.model_dump() if hasattr(result, "model_dump") else result
+
+
+def describe_job(job_id: str) -> dict:
+    """
+    Build the `JobResponse` body for a job, including its result if finished.
+
+    Args:
+        job_id: The job ID
+
+    Returns:
+        dict: job_id, status and result or error
+    """
+    job = fetch_job(job_id)
+
+    if job.is_finished:
+        result = job.result
+        if isinstance(result, Exception):
+            return {
+                "job_id": job_id,
+                "status": "failed",
+                "error": str(result),
+            }
+        return {
+            "job_id": job_id,
+            "status": "completed",
+            "result": _serialize_result(result),
+        }
+    elif job.is_failed:
+        return {
+            "job_id": job_id,
+            "status": "failed",
+            "error": str(job.exc_info),
+        }
+    elif job.is_started:
+        return {
+            "job_id": job_id,
+            "status": "processing",
+        }
+    else:
+        return {
+            "job_id": job_id,
+            "status": "pending",
+        }
+
+
+def describe_jobs(
+    job_ids: List[str], include_results: bool = False
+) -> Tuple[List[dict], List[str]]:
+    """
+    Build compact status records for many jobs in two pipelined round trips.
+
+    The first pipeline reads only the status field of every job. The second
+    reads the latest result of the jobs that need one: failed jobs for their
+    error, and finished jobs when results are requested. Pickled job payloads
+    are never loaded.
+
+    Args:
+        job_ids: The job IDs, duplicates are resolved once
+        include_results: Include the results of finished jobs
+
+    Returns:
+        Tuple: `JobResponse` bodies in request order, and the IDs of missing jobs
+    """
+    job_ids = list(dict.fromkeys(job_ids))
+    redis_conn = get_redis_con()
+
+    with redis_conn.pipeline(transaction=False) as pipe:
+        for job_id in job_ids:
+            pipe.hget(Job.key_for(job_id), "status")
+        raw_statuses = pipe.execute()
+
+    statuses: Dict[str, JobStatus] = {}
+    missing = []
+    for job_id, raw_status in zip(job_ids, raw_statuses):
+        if raw_status is None:
+            missing.append(job_id)
+        else:
+            statuses[job_id] = RQ_STATUS_MAP.get(
+                raw_status.decode("utf-8"), JobStatus.PENDING
+            )
+
+    needs_result = [
+        job_id
+        for job_id, status in statuses.items()
+        if status == JobStatus.FAILED
+        or (include_results and status == JobStatus.COMPLETED)
+    ]
+    results: Dict[str, Result] = {}
+    if needs_result:
+        with redis_conn.pipeline(transaction=False) as pipe:
+            for job_id in needs_result:
+                pipe.xrevrange(Result.get_key(job_id), "+", "-", count=1)
+            entries = pipe.execute()
+        for job_id, entry in zip(needs_result, entries):
+            if entry:
+                result_id, payload = entry[0]
+                results[job_id] = Result.restore(
+                    job_id,
+                    result_id.decode("utf-8"),
+                    payload,
+                    connection=redis_conn,
+                    serializer=get_serializer(),
+                )
+
+    jobs = []
+    for job_id, status in statuses.items():
+        record: Dict[str, Any] = {"job_id": job_id, "status": status}
+        result = results.get(job_id)
+        if result is not None:
+            if status == JobStatus.FAILED:
+                record["error"] = result.exc_string
+            elif isinstance(result.return_value, Exception):
+                record["status"] = JobStatus.FAILED
+                record["error"] = str(result.return_value)
+            else:
+                record["result"] = _serialize_result(result.return_value)
+        jobs.append(record)
+    return jobs, missing
+
+
+def fetch_job_result(job_id: str) -> Tuple[str, Any]:
+    """
+    Fetch the outcome of a job.
+
+    Args:
+        job_id: The job ID
+
+    Returns:
+        Tuple: ("finished", result), ("failed", exc_info) or ("pending", None)
+    """
+    job = fetch_job(job_id)
+    if job.is_finished:
+        return "finished", job.result
+    elif job.is_failed:
+        return "failed", job.exc_info
+    return "pending", None
+
+
+async def read_job_status(redis_conn, job_id: str) -> Optional[JobStatus]:
+    """
+    Read a job's status with a single HGET on an asyncio connection.
+
+    Args:
+        redis_conn: redis.asyncio connection
+        job_id: The job ID
+
+    Returns:
+        Optional[JobStatus]: The job status, None if the job does not exist
+    """
+    status = await redis_conn.hget(Job.key_for(job_id), "status")
+    if status is None:
+        return None
+    return RQ_STATUS_MAP.get(status.decode("utf-8"), JobStatus.PENDING)
@@ -0,0 +1,243 @@
+"""
+Cost-aware scheduling of video analysis jobs.
+
+With a single FIFO queue, one hour-long recording holds up every short
+practice answer submitted after it. When COST_SCHEDULING is enabled, the
+media duration is probed at submission, the cost of analyzing it is
+estimated, and the jobs are routed to the queue of the matching cost band
+("lane"). Workers draw from the lanes by weighted lottery, so short lanes
+are served most often while long jobs still make progress.
+"""
+
+import math
+import os
+import random
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, NamedTuple, Optional, Sequence, Tuple
+
+from utils.logger_config import get_logger
+
+logger = get_logger(__name__)
+
+# Route video jobs to cost-banded queues
+COST_SCHEDULING = os.getenv("COST_SCHEDULING", "false").lower() in ("1", "true", "yes")
+# Lanes as name:max_cost_seconds:weight, cheapest first; the last lane takes the rest
+COST_LANES = os.getenv("COST_LANES", "short:120:6,medium:900:3,long::1")
+# Estimated facial analysis seconds per analyzed frame
+FACIAL_SECONDS_PER_FRAME = float(os.getenv("FACIAL_SECONDS_PER_FRAME", 0.05))
+# Estimated audio analysis seconds per second of media
+AUDIO_SECONDS_PER_MEDIA_SECOND = float(
+    os.getenv("AUDIO_SECONDS_PER_MEDIA_SECOND", 0.25)
+)
+# Seconds to wait for a video's container when probing its duration
+MEDIA_PROBE_TIMEOUT = float(os.getenv("MEDIA_PROBE_TIMEOUT", 5))
+# Videos of a batch probed at once
+MEDIA_PROBE_WORKERS = int(os.getenv("MEDIA_PROBE_WORKERS", 8))
+
+LANE_QUEUE_PREFIX = "lane"
+DEFAULT_FPS = 30.0
+
+
+class Lane(NamedTuple):
+    name: str
+    max_cost: Optional[float]  # Seconds, None for the last lane
+    weight: float
+
+    @property
+    def queue_name(self) -> str:
+        return f"{LANE_QUEUE_PREFIX}:{self.name}"
+
+
+def parse_lanes(spec: str) -> List[Lane]:
+    """
+    Parse a lane specification such as "short:120:6,long::1".
+
+    Raises:
+        ValueError: If the specification is malformed or costs are not increasing
+    """
+    lanes = []
+    for part in spec.split(","):
+        name, max_cost, weight = part.strip().split(":")
+        lanes.append(Lane(name, float(max_cost) if max_cost else None, float(weight)))
+    # Every lane but the last needs a cost bound
+    bounds = [lane.max_cost for lane in lanes[:-1] if lane.max_cost is not None]
+    if len(bounds) != len(lanes) - 1 or bounds != sorted(bounds):
+        raise ValueError(f"Invalid cost lanes: {spec}")
+    return lanes
+
+
+LANES = parse_lanes(COST_LANES)
+
+
+def lane_queue_names() -> List[str]:
+    """
+    Queue names of the lanes, cheapest first, or none if disabled.
+    """
+    return [lane.queue_name for lane in LANES] if COST_SCHEDULING else []
+
+
+def expand_queues(queue_names: Sequence[str]) -> List[str]:
+    """
+    Add the lanes in front of "default", the queue they split up.
+    """
+    expanded = []
+    for name in queue_names:
+        if name == "default":
+            expanded.extend(lane_queue_names())
+        expanded.append(name)
+    return expanded
+
+
+def probe_media(video_url: str) -> Optional[Tuple[float, float]]:
+    """
+    Read a video's duration and frame rate from its container, giving up
+    on remote media that does not answer within MEDIA_PROBE_TIMEOUT.
+
+    Args:
+        video_url: URL or path of the video
+
+    Returns:
+        Optional[Tuple[float, float]]: Seconds and frames per second, None
+        if the media cannot be opened
+    """
+    import cv2
+
+    timeout_ms = int(MEDIA_PROBE_TIMEOUT * 1000)
+    video = cv2.VideoCapture(
+        video_url,
+        cv2.CAP_ANY,
+        [
+            cv2.CAP_PROP_OPEN_TIMEOUT_MSEC,
+            timeout_ms,
+            cv2.CAP_PROP_READ_TIMEOUT_MSEC,
+            timeout_ms,
+        ],
+    )
+    try:
+        if not video.isOpened():
+            return None
+        fps = video.get(cv2.CAP_PROP_FPS) or DEFAULT_FPS
+        frames = video.get(cv2.CAP_PROP_FRAME_COUNT)
+        if frames <= 0:
+            return None
+        return frames / fps, fps
+    finally:
+        video.release()
+
+
+def estimate_cost(
+    duration: float,
+    fps: float = DEFAULT_FPS,
+    sample_rate: int = 30,
+    facial: bool = True,
+    audio: bool = True,
+) -> float:
+    """
+    Estimate the worker seconds needed to analyze a video.
+
+    Args:
+        duration: Media length in seconds
+        fps: Frames per second of the video
+        sample_rate: Facial analysis looks at every Nth frame
+        facial: Include facial analysis
+        audio: Include audio analysis
+
+    Returns:
+        float: Estimated seconds
+    """
+    cost = 0.0
+    if facial:
+        cost += (
+            math.ceil(duration * fps / max(sample_rate, 1)) * FACIAL_SECONDS_PER_FRAME
+        )
+    if audio:
+        cost += duration * AUDIO_SECONDS_PER_MEDIA_SECOND
+    return cost
+
+
+def lane_for_cost(cost: Optional[float]) -> Lane:
+    """
+    The cheapest lane whose bound covers the cost. Unknown costs go to the
+    last lane, where they cannot hold up short jobs.
+    """
+    if cost is not None:
+        for lane in LANES:
+            if lane.max_cost is None or cost <= lane.max_cost:
+                return lane
+    return LANES[-1]
+
+
+def queue_for_video(
+    video_url: str, sample_rate: int = 30, facial: bool = True, audio: bool = True
+) -> str:
+    """
+    Queue for the analysis jobs of a video.
+
+    Args:
+        video_url: URL or path of the video
+        sample_rate: Facial analysis looks at every Nth frame
+        facial: The jobs include facial analysis
+        audio: The jobs include audio analysis
+
+    Returns:
+        str: The lane's queue, or "default" if cost scheduling is disabled
+    """
+    if not COST_SCHEDULING:
+        return "default"
+    cost = None
+    try:
+        media = probe_media(video_url)
+        if media is not None:
+            cost = estimate_cost(
+                *media, sample_rate=sample_rate, facial=facial, audio=audio
+            )
+    except Exception as e:
+        logger.warning(f"Could not probe {video_url}: {str(e)}")
+    lane = lane_for_cost(cost)
+    logger.info(f"Routing {video_url} (estimated {cost}s) to {lane.queue_name}")
+    return lane.queue_name
+
+
+def queues_for_videos(video_urls: Sequence[str]) -> List[str]:
+    """
+    Queues for the analysis jobs of many videos, probing them concurrently.
+
+    Args:
+        video_urls: URLs or paths of the videos
+
+    Returns:
+        List[str]: The queue of each video, in order
+    """
+    if not COST_SCHEDULING or len(video_urls) <= 1:
+        return [queue_for_video(video_url) for video_url in video_urls]
+    workers = min(len(video_urls), max(MEDIA_PROBE_WORKERS, 1))
+    with ThreadPoolExecutor(workers, thread_name_prefix="media-probe") as pool:
+        return list(pool.map(queue_for_video, video_urls))
+
+
+def weighted_order(queues: list, name=lambda queue: queue.name) -> list:
+    """
+    Shuffle the lane queues by weighted lottery, keeping other queues in place.
+
+    A lane comes first with probability proportional to its weight, so
+    workers take most jobs from cheap lanes without starving the others.
+
+    Args:
+        queues: Queues in the worker's current order
+        name: Gets a queue's name
+
+    Returns:
+        list: The queues in their new order
+    """
+    weights = {lane.queue_name: lane.weight for lane in LANES}
+    slots = [i for i, queue in enumerate(queues) if name(queue) in weights]
+    # Efraimidis-Spirakis: sorting by u^(1/w) draws without replacement by weight
+    lanes = sorted(
+        (queues[i] for i in slots),
+        key=lambda queue: random.random() ** (1 / max(weights[name(queue)], 1e-9)),
+        reverse=True,
+    )
+    ordered = list(queues)
+    for i, queue in zip(slots, lanes):
+        ordered[i] = queue
+    return ordered
@@ -0,0 +1,386 @@
+"""
+Telemetry in the Prometheus text exposition format.
+
+Workers record job timings, model load times and facial analysis throughput
+in Redis, so every API process can report them for the whole deployment.
+Queue depths, registry counts and worker states are read from RQ when the
+metrics are scraped. Recording never raises, so it cannot affect a job.
+"""
+
+import math
+import os
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+
+from rq import Worker
+from rq.utils import now
+from redisStore.monitor import MONITOR_COUNTERS_KEY, get_queue_stats
+from redisStore.result_store import result_bytes_cache
+from tasks.helpers.star_cache import get_star_cache_stats
+from utils.logger_config import get_logger
+
+logger = get_logger(__name__)
+
+METRICS_KEY_PREFIX = "mlapi:metrics"
+MODEL_LOAD_KEY = f"{METRICS_KEY_PREFIX}:model_load_seconds"
+FACIAL_KEY = f"{METRICS_KEY_PREFIX}:facial"
+LOST_JOBS_KEY = f"{METRICS_KEY_PREFIX}:lost_jobs"
+
+# Upper bounds of the job wait and run time histogram buckets, in seconds
+JOB_SECONDS_BUCKETS: Tuple[float, ...] = tuple(
+    float(b)
+    for b in os.getenv(
+        "METRICS_JOB_SECONDS_BUCKETS", "0.5,1,2.5,5,10,30,60,120,300,600"
+    ).split(",")
+) + (math.inf,)
+
+
+def _histogram_key(name: str) -> str:
+    return f"{METRICS_KEY_PREFIX}:hist:{name}"
+
+
+def _format_bound(bound: float) -> str:
+    return "+Inf" if math.isinf(bound) else repr(bound)
+
+
+def observe(pipe, name: str, label: str, seconds: float):
+    """
+    Add an observation to a histogram kept in a Redis hash.
+
+    Buckets are stored non-cumulative and summed when rendered.
+
+    Args:
+        pipe: Redis connection or pipeline
+        name: Histogram name, e.g. "job_run_seconds"
+        label: Value of the histogram's label, e.g. the task function
+        seconds: The observed value
+    """
+    bound = next(b for b in JOB_SECONDS_BUCKETS if seconds <= b)
+    key = _histogram_key(name)
+    pipe.hincrby(key, f"{label}|{_format_bound(bound)}", 1)
+    pipe.hincrbyfloat(key, f"{label}|sum", seconds)
+    pipe.hincrby(key, f"{label}|count", 1)
+
+
+def record_job_timings(redis_conn, job):
+    """
+    Record how long a job waited in its queue and how long it ran.
+
+    Args:
+        redis_conn: Redis connection
+        job: The RQ job, after it finished or failed
+    """
+    try:
+        with redis_conn.pipeline(transaction=False) as pipe:
+            if job.enqueued_at is not None and job.started_at is not None:
+                wait = (job.started_at - job.enqueued_at).total_seconds()
+                observe(pipe, "job_wait_seconds", job.func_name, max(wait, 0.0))
+            if job.started_at is not None:
+                run = (now() - job.started_at).total_seconds()
+                observe(pipe, "job_run_seconds", job.func_name, max(run, 0.0))
+            pipe.execute()
+    except Exception as e:
+        logger.warning(f"Could not record timings of job {job.id}: {str(e)}")
+
+
+def record_job_recovery(redis_conn, func_name: str, seconds: float):
+    """
+    Record how long a lost job took from losing its worker to completing.
+    """
+    try:
+        with redis_conn.pipeline(transaction=False) as pipe:
+            observe(pipe, "job_recovery_seconds", func_name, max(seconds, 0.0))
+            pipe.execute()
+    except Exception as e:
+        logger.warning(f"Could not record recovery of {func_name}: {str(e)}")
+
+
+def record_lost_job(redis_conn, outcome: str):
+    """
+    Count a lost job by what happened to it, "requeued" or "abandoned".
+    """
+    try:
+        redis_conn.hincrby(LOST_JOBS_KEY, outcome, 1)
+    except Exception as e:
+        logger.warning(f"Could not count lost job: {str(e)}")
+
+
+def record_model_load(redis_conn, model: str, seconds: Optional[float]):
+    """
+    Record how long a model took to load.
+    """
+    if seconds is None:
+        return
+    try:
+        redis_conn.hset(MODEL_LOAD_KEY, model, round(seconds, 3))
+    except Exception as e:
+        logger.warning(f"Could not record load time of {model}: {str(e)}")
+
+
+def record_facial_frames(redis_conn, frames: int, seconds: float):
+    """
+    Record the frames analyzed by a facial analysis job and the time it took.
+    """
+    try:
+        with redis_conn.pipeline(transaction=False) as pipe:
+            pipe.hincrby(FACIAL_KEY, "frames", frames)
+            pipe.hincrbyfloat(FACIAL_KEY, "seconds", seconds)
+            if seconds > 0:
+                pipe.hset(FACIAL_KEY, "last_fps", round(frames / seconds, 3))
+            pipe.execute()
+    except Exception as e:
+        logger.warning(f"Could not record facial analysis throughput: {str(e)}")
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class MetricsWriter:
+    """
+    Builds a Prometheus text exposition, one HELP/TYPE header per metric.
+    """
+
+    def __init__(self):
+        self._lines: List[str] = []
+        self._declared = set()
+
+    def add(
+        self,
+        name: str,
+        kind: str,
+        help_text: str,
+        value: float,
+        labels: Optional[Dict[str, str]] = None,
+    ):
+        family = name
+        for suffix in ("_bucket", "_sum", "_count"):
+            if kind == "histogram" and name.endswith(suffix):
+                family = name[: -len(suffix)]
+        if family not in self._declared:
+            self._declared.add(family)
+            self._lines.append(f"# HELP {family} {help_text}")
+            self._lines.append(f"# TYPE {family} {kind}")
+        label_text = ""
+        if labels:
+            label_text = (
+                "{"
+                + ",".join(f'{k}="{_escape(str(v))}"' for k, v in labels.items())
+                + "}"
+            )
+        self._lines.append(f"{name}{label_text} {float(value)!r}")
+
+    def render(self) -> str:
+        return "\n".join(self._lines) + "\n"
+
+
+def _decode_hash(raw: Dict[bytes, bytes]) -> Dict[str, str]:
+    return {k.decode("utf-8"): v.decode("utf-8") for k, v in raw.items()}
+
+
+def _write_histogram(
+    writer: MetricsWriter, name: str, help_text: str, raw: Dict[str, str]
+):
+    series: Dict[str, Dict[str, float]] = defaultdict(dict)
+    for field, value in raw.items():
+        label, _, part = field.rpartition("|")
+        series[label][part] = float(value)
+    for label, parts in sorted(series.items()):
+        cumulative = 0.0
+        for bound in JOB_SECONDS_BUCKETS:
+            cumulative += parts.get(_format_bound(bound), 0.0)
+            writer.add(
+                f"{name}_bucket",
+                "histogram",
+                help_text,
+                cumulative,
+                {"task": label, "le": _format_bound(bound)},
+            )
+        writer.add(
+            f"{name}_sum",
+            "histogram",
+            help_text,
+            parts.get("sum", 0.0),
+            {"task": label},
+        )
+        writer.add(
+            f"{name}_count",
+            "histogram",
+            help_text,
+            parts.get("count", 0.0),
+            {"task": label},
+        )
+
+
+def _write_queues(writer: MetricsWriter, redis_conn):
+    # Each metric family must be one contiguous group, so loop per metric
+    queues = get_queue_stats(redis_conn)
+    for queue_name, stats in queues.items():
+        writer.add(
+            "mlapi_queue_jobs",
+            "gauge",
+            "Jobs waiting in the queue",
+            stats["count"],
+            {"queue": queue_name},
+        )
+    for queue_name, stats in queues.items():
+        for registry in ("started", "deferred", "scheduled", "failed"):
+            writer.add(
+                "mlapi_queue_registry_jobs",
+                "gauge",
+                "Jobs in each RQ registry of the queue",
+                stats[registry],
+                {"queue": queue_name, "registry": registry},
+            )
+    for queue_name, stats in queues.items():
+        writer.add(
+            "mlapi_queue_backlog_seconds",
+            "gauge",
+            "Estimated seconds before a job enqueued now would start",
+            stats["backlog_seconds"],
+            {"queue": queue_name},
+        )
+
+
+def _write_workers(writer: MetricsWriter, redis_conn):
+    states: Dict[str, int] = defaultdict(int)
+    for worker in Worker.all(connection=redis_conn):
+        states[str(getattr(worker.state, "value", worker.state))] += 1
+    total = sum(states.values())
+    for state, count in sorted(states.items()):
+        writer.add(
+            "mlapi_workers", "gauge", "Workers per state", count, {"state": state}
+        )
+    writer.add(
+        "mlapi_worker_busy_ratio",
+        "gauge",
+        "Fraction of workers running a job",
+        states.get("busy", 0) / total if total else 0.0,
+    )
+
+
+def _write_caches(writer: MetricsWriter, redis_conn):
+    star = get_star_cache_stats(redis_conn)
+    for result, count in (
+        ("local_hit", star["local_hits"]),
+        ("redis_hit", star["redis_hits"]),
+        ("miss", star["misses"]),
+    ):
+        writer.add(
+            "mlapi_star_cache_lookups_total",
+            "counter",
+            "STAR label cache lookups by outcome",
+            count,
+            {"result": result},
+        )
+    writer.add(
+        "mlapi_star_cache_hit_ratio",
+        "gauge",
+        "STAR label cache hit rate",
+        star["hit_rate"],
+    )
+    for result, count in (
+        ("hit", result_bytes_cache.hits),
+        ("miss", result_bytes_cache.misses),
+    ):
+        writer.add(
+            "mlapi_result_cache_lookups_total",
+            "counter",
+            "Result cache lookups in this API process by outcome",
+            count,
+            {"result": result},
+        )
+
+
+def render_metrics(redis_conn) -> str:
+    """
+    Collect every metric in the Prometheus text format.
+
+    Sections that cannot be read are logged and left out, so one failing
+    source does not hide the others.
+
+    Args:
+        redis_conn: Redis connection
+
+    Returns:
+        str: The exposition text
+    """
+    writer = MetricsWriter()
+
+    def section(name: str, write):
+        try:
+            write()
+        except Exception as e:
+            logger.warning(f"Could not collect {name} metrics: {str(e)}")
+
+    section("queue", lambda: _write_queues(writer, redis_conn))
+    section("worker", lambda: _write_workers(writer, redis_conn))
+
+    def write_histograms():
+        with redis_conn.pipeline(transaction=False) as pipe:
+            pipe.hgetall(_histogram_key("job_wait_seconds"))
+            pipe.hgetall(_histogram_key("job_run_seconds"))
+            pipe.hgetall(MODEL_LOAD_KEY)
+            pipe.hgetall(FACIAL_KEY)
+            pipe.hgetall(MONITOR_COUNTERS_KEY)
+            pipe.hgetall(_histogram_key("job_recovery_seconds"))
+            pipe.hgetall(LOST_JOBS_KEY)
+            wait, run, model_loads, facial, transitions, recovery, lost = (
+                _decode_hash(raw) for raw in pipe.execute()
+            )
+        _write_histogram(
+            writer, "mlapi_job_wait_seconds", "Seconds jobs waited in the queue", wait
+        )
+        _write_histogram(writer, "mlapi_job_run_seconds", "Seconds jobs ran", run)
+        _write_histogram(
+            writer,
+            "mlapi_job_recovery_seconds",
+            "Seconds from losing a job to its completion after requeue",
+            recovery,
+        )
+        for outcome in ("requeued", "abandoned"):
+            writer.add(
+                "mlapi_lost_jobs_total",
+                "counter",
+                "Jobs lost with their worker or stalled, by outcome",
+                float(lost.get(outcome, 0)),
+                {"outcome": outcome},
+            )
+        for model, seconds in sorted(model_loads.items()):
+            writer.add(
+                "mlapi_model_load_seconds",
+                "gauge",
+                "Seconds the model took to load at worker start",
+                float(seconds),
+                {"model": model},
+            )
+        writer.add(
+            "mlapi_facial_frames_total",
+            "counter",
+            "Video frames analyzed by facial analysis",
+            float(facial.get("frames", 0)),
+        )
+        writer.add(
+            "mlapi_facial_seconds_total",
+            "counter",
+            "Seconds spent analyzing video frames",
+            float(facial.get("seconds", 0)),
+        )
+        writer.add(
+            "mlapi_facial_frames_per_second",
+            "gauge",
+            "Frames per second of the latest facial analysis job",
+            float(facial.get("last_fps", 0)),
+        )
+        for status, count in sorted(transitions.items()):
+            writer.add(
+                "mlapi_job_transitions_total",
+                "counter",
+                "Job status transitions seen by the monitor",
+                float(count),
+                {"status": status},
+            )
+
+    section("job", write_histograms)
+    section("cache", lambda: _write_caches(writer, redis_conn))
+    return writer.render()
@@ -1,36 +1,123 @@
+import os
 import time
-from typing import Never, Set, Iterator
+from collections import defaultdict
+from typing import Dict, List, Never, Optional
 from utils.logger_config import get_logger
+from redisStore.job_events import JOB_LIFECYCLE_STREAM
+from redisStore.lanes import lane_queue_names
 from redisStore.myconnection import get_redis_con
-from rq import Queue
+from redisStore.tenants import tenant_backlog
+from schemas.jobs import JobStatus
+from redis.commands.core import Script
+from rq import Queue, Worker
 
 logger = get_logger(__name__)
 
-ALL_JOBS: Set[str] = set()
-RESULT_ENCODING = "result".encode("utf-8")
-FINISHED_ENCODING = "finished".encode("utf-8")
-
-
-def _update_all_jobs(redis_conn) -> Iterator[str]:
+# Position of the monitor in the job lifecycle stream
+MONITOR_CURSOR_KEY = "mlapi:monitor:cursor"
+# Transitions seen by the monitor, per status
+MONITOR_COUNTERS_KEY = "mlapi:monitor:counters"
+# Stream entries read per round trip
+MONITOR_BATCH_SIZE = int(os.getenv("MONITOR_BATCH_SIZE", 1000))
+
+# Moving average of job run times per queue, kept up to date by the workers
+JOB_DURATIONS_KEY = "mlapi:queue:durations"
+# Weight of the newest run time in the moving average
+JOB_DURATION_SMOOTHING = float(os.getenv("JOB_DURATION_SMOOTHING", 0.2))
+# Run time assumed for queues that have not finished a job yet
+DEFAULT_JOB_SECONDS = float(os.getenv("DEFAULT_JOB_SECONDS", 30))
+
+# Fold a run time into a queue's moving average in one step, so concurrent
+# workers do not overwrite each other's updates
+JOB_DURATION_SCRIPT = """
+local seconds = tonumber(ARGV[2])
+local smoothing = tonumber(ARGV[3])
+local previous = tonumber(redis.call('HGET', KEYS[1], ARGV[1]))
+local average = seconds
+if previous then
+    average = smoothing * seconds + (1 - smoothing) * previous
+end
+redis.call('HSET', KEYS[1], ARGV[1], string.format('%.3f', average))
+"""
+
+_job_duration_script: Optional[Script] = None
+
+
+def record_job_duration(redis_conn, queue_name: str, seconds: float):
     """
-    Get finished jobs from Redis.
+    Fold the run time of a finished job into its queue's moving average.
 
     Args:
         redis_conn: Redis connection
-
-    Yields:
-        str: Job ID for each finished job
+        queue_name: Queue the job ran from
+        seconds: Run time of the job
     """
+    global _job_duration_script
     try:
-        keys = redis_conn.keys("rq:job:*")
-        for key in keys:
-            key_str = key.decode("utf-8")
-            status = redis_conn.hgetall(key)
-            status = {k.decode("utf-8"): v for k, v in status.items()}
-            if status.get("status") == FINISHED_ENCODING:
-                yield key_str
+        if _job_duration_script is None:
+            _job_duration_script = redis_conn.register_script(JOB_DURATION_SCRIPT)
+        _job_duration_script(
+            keys=[JOB_DURATIONS_KEY],
+            args=[queue_name, seconds, JOB_DURATION_SMOOTHING],
+            client=redis_conn,
+        )
     except Exception as e:
-        logger.error(f"Error updating jobs: {str(e)}")
+        logger.warning(f"Could not record job duration for {queue_name}: {str(e)}")
+
+
+class JobTracker:
+    """
+    Follows job status transitions through the lifecycle stream.
+
+    Each tick reads only the entries after the stored cursor and folds them
+    into rolling counters, so its cost depends on the number of new
+    transitions, not on the number of jobs kept in Redis. The cursor is kept
+    in Redis, so a restarted monitor resumes where it stopped.
+    """
+
+    def __init__(self, redis_conn, batch_size: int = MONITOR_BATCH_SIZE):
+        self.redis_conn = redis_conn
+        self.batch_size = batch_size
+        cursor = redis_conn.get(MONITOR_CURSOR_KEY)
+        self.cursor = cursor.decode("utf-8") if cursor is not None else "0-0"
+
+    def poll(self) -> Dict[str, List[str]]:
+        """
+        Read the transitions since the last tick.
+
+        Returns:
+            Dict[str, List[str]]: Job IDs per new status, in stream order
+        """
+        transitions: Dict[str, List[str]] = defaultdict(list)
+        while True:
+            response = self.redis_conn.xread(
+                {JOB_LIFECYCLE_STREAM: self.cursor}, count=self.batch_size
+            )
+            entries = response[0][1] if response else []
+            for entry_id, fields in entries:
+                status = fields[b"status"].decode("utf-8")
+                transitions[status].append(fields[b"job_id"].decode("utf-8"))
+            if entries:
+                self.cursor = entries[-1][0].decode("utf-8")
+            if len(entries) < self.batch_size:
+                break
+
+        if transitions:
+            with self.redis_conn.pipeline() as pipe:
+                for status, job_ids in transitions.items():
+                    pipe.hincrby(MONITOR_COUNTERS_KEY, status, len(job_ids))
+                pipe.set(MONITOR_CURSOR_KEY, self.cursor)
+                pipe.execute()
+        return dict(transitions)
+
+    def counters(self) -> Dict[str, int]:
+        """
+        Transitions per status since the counters were created.
+        """
+        return {
+            k.decode("utf-8"): int(v)
+            for k, v in self.redis_conn.hgetall(MONITOR_COUNTERS_KEY).items()
+        }
 
 
 def get_queue_stats(redis_conn) -> dict:
@@ -44,17 +131,29 @@ def get_queue_stats(redis_conn) -> dict:
         dict: Statistics about each queue
     """
     try:
-        queues = ["default", "high", "low"]
+        queues = ["default", "high", "low", *lane_queue_names()]
         stats = {}
+        durations = {
+            k.decode("utf-8"): float(v)
+            for k, v in redis_conn.hgetall(JOB_DURATIONS_KEY).items()
+        }
 
         for queue_name in queues:
             q = Queue(queue_name, connection=redis_conn)
+            # Jobs waiting in the tenant queues are part of the backlog
+            count = q.count + tenant_backlog(redis_conn, queue_name)
+            workers = Worker.count(queue=q)
+            avg_job_seconds = durations.get(queue_name, DEFAULT_JOB_SECONDS)
             stats[queue_name] = {
-                "count": q.count,
+                "count": count,
                 "failed": q.failed_job_registry.count,
                 "started": q.started_job_registry.count,
                 "deferred": q.deferred_job_registry.count,
                 "scheduled": q.scheduled_job_registry.count,
+                "workers": workers,
+                "avg_job_seconds": avg_job_seconds,
+                # Time until a job enqueued now would start
+                "backlog_seconds": round(count * avg_job_seconds / max(workers, 1), 1),
             }
 
         return stats
@@ -70,12 +169,14 @@ def poll_connection(redis_connection) -> Never:
     Args:
         redis_connection: Redis connection
     """
+    tracker = JobTracker(redis_connection)
     while True:
         try:
-            # Log finished jobs
-            finished_jobs = list(_update_all_jobs(redis_connection))
+            # Log jobs that finished since the last tick
+            finished_jobs = tracker.poll().get(JobStatus.COMPLETED.value, [])
             if finished_jobs:
                 logger.info(f"Finished jobs: {len(finished_jobs)} {finished_jobs}")
+                logger.info(f"Job transitions: {tracker.counters()}")
 
             # Log queue stats every 10 seconds
             stats = get_queue_stats(redis_connection)
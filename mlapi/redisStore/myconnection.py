@@ -1,35 +1,129 @@
 import os
-from redis import Redis, from_url
+from typing import Optional
+from redis import ConnectionPool, Redis
+from redis import asyncio as aioredis
 from utils.logger_config import get_logger
 
 logger = get_logger(__name__)
 
+# Upper bound on open connections per pool (per process)
+REDIS_MAX_CONNECTIONS = int(os.getenv("REDIS_MAX_CONNECTIONS", 50))
+
+# Process-wide pool shared by every synchronous client
+_pool: Optional[ConnectionPool] = None
+# Application-scoped asyncio pool, created by the API lifespan hook
+_async_pool: Optional[aioredis.ConnectionPool] = None
+
+
+def _connection_kwargs() -> dict:
+    """
+    Connection parameters from the environment.
+    """
+    return {
+        "host": os.getenv("REDIS_HOST", "localhost"),
+        "port": int(os.getenv("REDIS_PORT", 6379)),
+        "password": os.getenv("REDIS_PASSWORD"),
+        "decode_responses": False,
+        "socket_connect_timeout": 5,
+        "socket_keepalive": True,
+        "health_check_interval": 30,
+    }
+
+
+def get_connection_pool() -> ConnectionPool:
+    """
+    Get the process-wide Redis connection pool, creating it on first use.
+
+    redis-py resets the pool in a forked child, so RQ work horses get their
+    own connections.
+
+    Returns:
+        ConnectionPool: Shared connection pool
+    """
+    global _pool
+    if _pool is None:
+        # Check if a redis_url environment variable is available first
+        redis_url = os.getenv("REDIS_URL")
+        if redis_url:
+            _pool = ConnectionPool.from_url(
+                redis_url,
+                decode_responses=False,
+                max_connections=REDIS_MAX_CONNECTIONS,
+            )
+        else:
+            _pool = ConnectionPool(
+                **_connection_kwargs(),
+                socket_timeout=5,
+                max_connections=REDIS_MAX_CONNECTIONS,
+            )
+    return _pool
+
 
 def get_redis_con() -> Redis:
     """
     Create a secure Redis connection with authentication.
 
+    Clients share the process-wide connection pool, so creating one is cheap.
+
     Returns:
         Redis: Authenticated Redis connection
     """
     try:
-        # Check if a redis_url environment variable is available first
-        redis_url = os.getenv("REDIS_URL")
-        if redis_url:
-            return from_url(redis_url, decode_responses=False)
-        # Otherwise use individual connection parameters
-        redis_conn = Redis(
-            host=os.getenv("REDIS_HOST", "localhost"),
-            port=int(os.getenv("REDIS_PORT", 6379)),
-            password=os.getenv("REDIS_PASSWORD"),
-            decode_responses=False,
-            socket_timeout=5,
-            socket_connect_timeout=5,
-            socket_keepalive=True,
-            health_check_interval=30,
+        return Redis(connection_pool=get_connection_pool())
+    except Exception as e:
+        logger.error(f"Redis connection error: {str(e)}")
+        raise e
+
+
+def _create_async_pool() -> aioredis.ConnectionPool:
+    redis_url = os.getenv("REDIS_URL")
+    if redis_url:
+        return aioredis.ConnectionPool.from_url(
+            redis_url, decode_responses=False, max_connections=REDIS_MAX_CONNECTIONS
         )
-        # Test the connection
-        return redis_conn
+    return aioredis.ConnectionPool(
+        **_connection_kwargs(), max_connections=REDIS_MAX_CONNECTIONS
+    )
+
+
+def init_connection_pools():
+    """
+    Create the application-scoped connection pools. Called at API startup.
+    """
+    global _async_pool
+    get_connection_pool()
+    if _async_pool is None:
+        _async_pool = _create_async_pool()
+    logger.info("Redis connection pools initialized")
+
+
+async def close_connection_pools():
+    """
+    Disconnect the application-scoped connection pools. Called at API shutdown.
+    """
+    global _async_pool
+    if _async_pool is not None:
+        await _async_pool.disconnect()
+        _async_pool = None
+    if _pool is not None:
+        _pool.disconnect()
+    logger.info("Redis connection pools closed")
+
+
+def get_async_redis_con() -> aioredis.Redis:
+    """
+    Create an asyncio Redis connection for use inside async route handlers.
+
+    Uses the application-scoped pool when the API lifespan has created it,
+    otherwise a standalone client that owns its connections.
+
+    Returns:
+        aioredis.Redis: Authenticated asyncio Redis connection
+    """
+    try:
+        if _async_pool is not None:
+            return aioredis.Redis(connection_pool=_async_pool)
+        return aioredis.Redis.from_pool(_create_async_pool())
     except Exception as e:
         logger.error(f"Redis connection error: {str(e)}")
         raise e
@@ -1,7 +1,9 @@
-from typing import Callable
+from typing import Callable, Optional
 from rq.job import Job
 from rq.queue import Queue
 from redisStore.myconnection import get_redis_con
+from redisStore.serializer import get_serializer
+from redisStore.tenants import register_tenant_queue, tenant_queue_name
 from utils.logger_config import get_logger
 
 logger = get_logger(__name__)
@@ -18,13 +20,15 @@ def get_queue(queue_name="default") -> Queue:
         Queue: RQ Queue instance
     """
     conn = get_redis_con()
-    return Queue(name=queue_name, connection=conn)
+    return Queue(name=queue_name, connection=conn, serializer=get_serializer())
 
 
 def add_task_to_queue(
     task: Callable,
     *args,
     depends_on=None,
+    queue_name: str = "default",
+    tenant: Optional[str] = None,
 ) -> Job:
     """
     Add a task to the Redis queue with proper error handling.
@@ -32,12 +36,14 @@ def add_task_to_queue(
     Args:
         task: The task function to be executed
         args: List of arguments to pass to the task
+        queue_name: Queue to add the task to, e.g. a cost lane
+        tenant: Tenant submitting the task, for fair sharing of the workers
 
     Returns:
         Job: The enqueued job
     """
     try:
-        queue = get_queue("default")
+        queue = get_queue(tenant_queue_name(queue_name, tenant))
         # Set default empty list if args is None
         if args is None:
             args = []
@@ -47,6 +53,7 @@ def add_task_to_queue(
             *args,
             depends_on=depends_on,
         )
+        register_tenant_queue(queue.connection, queue.name)
         logger.info(f"Task {task.__name__} enqueued with job ID: {job.id}")
         return job
     except Exception as e:
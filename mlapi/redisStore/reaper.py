@@ -0,0 +1,372 @@
+"""
+Detection and recovery of lost jobs.
+
+A job whose worker is OOM-killed stays in the started registry until its RQ
+timeout expires, and `create_answer` jobs waiting for it give up long
+before. The reaper notices such jobs within seconds instead:
+
+- dead: RQ's job heartbeat, sent by the worker every JOB_HEARTBEAT_INTERVAL
+  seconds while the job runs, stopped for REAPER_DEAD_SECONDS. The reaper
+  requeues the job itself.
+- stalled: the job reports its progress with `job_heartbeat` but has not
+  for REAPER_STALL_SECONDS. The reaper kills its work horse, and the worker
+  requeues it like any job whose work horse was killed.
+
+Lost jobs are requeued at the front of their queue up to REAPER_MAX_RETRIES
+times, then failed along with the jobs depending on them. The time from
+losing a job to its completion after requeue is recorded for `/metrics`.
+
+    python -m redisStore.reaper
+"""
+
+import os
+import time
+from datetime import datetime
+from typing import List, NamedTuple, Optional, Tuple
+
+from rq import Queue, get_current_job
+from rq.command import send_kill_horse_command
+from rq.job import Job, JobStatus as RQJobStatus
+from rq.utils import utcparse
+from redisStore.checkpoints import checkpoint_keys
+from redisStore.job_events import publish_job_status
+from redisStore.lanes import lane_queue_names
+from redisStore.metrics import record_job_recovery, record_lost_job
+from redisStore.myconnection import get_redis_con
+from redisStore.serializer import get_serializer
+from redisStore.tenants import register_tenant_queue, tenant_queues
+from schemas.jobs import JobStatus
+from utils.logger_config import get_logger
+
+logger = get_logger(__name__)
+
+# Seconds between RQ's heartbeats of running jobs
+JOB_HEARTBEAT_INTERVAL = int(os.getenv("JOB_HEARTBEAT_INTERVAL", 10))
+# Seconds between progress heartbeats sent by a job
+JOB_PROGRESS_INTERVAL = float(os.getenv("JOB_PROGRESS_INTERVAL", 5))
+# Seconds without a job heartbeat after which its worker is considered dead
+REAPER_DEAD_SECONDS = float(
+    os.getenv("REAPER_DEAD_SECONDS", 3 * JOB_HEARTBEAT_INTERVAL + 5)
+)
+# Seconds without progress after which a job is considered stalled
+REAPER_STALL_SECONDS = float(os.getenv("REAPER_STALL_SECONDS", 120))
+# Times a lost job is requeued before it is failed
+REAPER_MAX_RETRIES = int(os.getenv("REAPER_MAX_RETRIES", 2))
+# Seconds between checks for lost jobs
+REAPER_INTERVAL = float(os.getenv("REAPER_INTERVAL", 10))
+
+# Last progress heartbeat of each running job
+HEARTBEATS_KEY = "mlapi:reaper:heartbeats"
+# Progress of each running job, as a fraction
+PROGRESS_KEY = "mlapi:reaper:progress"
+# Times each job was lost
+ATTEMPTS_KEY = "mlapi:reaper:attempts"
+# When each lost job stopped making progress, until it completes
+LOST_SINCE_KEY = "mlapi:reaper:lost-since"
+KILLING_KEY_PREFIX = "mlapi:reaper:killing"
+
+# Job ID and time of this process' last heartbeat
+_last_beat: Tuple[Optional[str], float] = (None, 0.0)
+
+
+def job_heartbeat(progress: Optional[float] = None):
+    """
+    Report that the current job is making progress.
+
+    Cheap to call in a job's inner loop: at most one heartbeat is written
+    every JOB_PROGRESS_INTERVAL seconds. Does nothing outside a job and
+    never raises.
+
+    Args:
+        progress: Fraction of the job done, if known
+    """
+    global _last_beat
+    job = get_current_job()
+    if job is None:
+        return
+    beat_at = time.time()
+    if _last_beat[0] == job.id and beat_at - _last_beat[1] < JOB_PROGRESS_INTERVAL:
+        return
+    _last_beat = (job.id, beat_at)
+    try:
+        with job.connection.pipeline(transaction=False) as pipe:
+            pipe.zadd(HEARTBEATS_KEY, {job.id: beat_at})
+            if progress is not None:
+                pipe.hset(PROGRESS_KEY, job.id, round(progress, 4))
+            pipe.execute()
+    except Exception as e:
+        logger.warning(f"Could not record heartbeat of job {job.id}: {str(e)}")
+
+
+def _timestamp(value: Optional[datetime]) -> Optional[float]:
+    return value.timestamp() if value is not None else None
+
+
+def last_sign_of_life(redis_conn, job: Job) -> Optional[float]:
+    """
+    Latest of the job's enqueue time, RQ heartbeat and progress heartbeat.
+
+    Args:
+        redis_conn: Redis connection
+        job: The job
+
+    Returns:
+        Optional[float]: Unix timestamp, None if there is none yet
+    """
+    times = [
+        _timestamp(job.enqueued_at),
+        _timestamp(job.last_heartbeat),
+        redis_conn.zscore(HEARTBEATS_KEY, job.id),
+    ]
+    times = [t for t in times if t is not None]
+    return max(times) if times else None
+
+
+def job_finished(redis_conn, job: Job, succeeded: bool):
+    """
+    Forget the heartbeats and checkpoint of a job that completed or failed
+    for good, and record its time to recovery if it had been lost.
+    """
+    try:
+        lost_since = redis_conn.hget(LOST_SINCE_KEY, job.id)
+        with redis_conn.pipeline(transaction=False) as pipe:
+            pipe.zrem(HEARTBEATS_KEY, job.id)
+            pipe.hdel(PROGRESS_KEY, job.id)
+            pipe.hdel(ATTEMPTS_KEY, job.id)
+            pipe.hdel(LOST_SINCE_KEY, job.id)
+            pipe.delete(*checkpoint_keys(job.id))
+            pipe.execute()
+        if succeeded and lost_since is not None:
+            seconds = time.time() - float(lost_since)
+            record_job_recovery(redis_conn, job.func_name or "unknown", seconds)
+    except Exception as e:
+        logger.warning(f"Could not clear heartbeats of job {job.id}: {str(e)}")
+
+
+def requeue_lost_job(
+    redis_conn, job: Job, reason: str, lost_since: Optional[float] = None
+) -> bool:
+    """
+    Put a lost job back at the front of its queue, unless it was already
+    lost REAPER_MAX_RETRIES times.
+
+    Args:
+        redis_conn: Redis connection
+        job: The lost job
+        reason: Why it was lost, for the logs
+        lost_since: When it stopped making progress (default: now)
+
+    Returns:
+        bool: Whether the job was requeued
+    """
+    attempts = redis_conn.hincrby(ATTEMPTS_KEY, job.id, 1)
+    if attempts > REAPER_MAX_RETRIES:
+        return False
+    queue = Queue(job.origin, connection=redis_conn, serializer=job.serializer)
+    with redis_conn.pipeline() as pipe:
+        queue.started_job_registry.remove_executions(job, pipeline=pipe)
+        queue.failed_job_registry.remove(job, pipeline=pipe)
+        pipe.hsetnx(LOST_SINCE_KEY, job.id, lost_since or time.time())
+        pipe.zrem(HEARTBEATS_KEY, job.id)
+        pipe.execute()
+    # Not on the pipeline: RQ watches the job's dependencies while enqueuing
+    queue.enqueue_job(job, at_front=True)
+    register_tenant_queue(redis_conn, queue.name)
+    publish_job_status(redis_conn, job.id, JobStatus.PENDING)
+    record_lost_job(redis_conn, "requeued")
+    logger.warning(
+        f"Requeued job {job.id} ({reason}), attempt {attempts} of {REAPER_MAX_RETRIES}"
+    )
+    return True
+
+
+def cancel_dependents(redis_conn, job: Job) -> List[str]:
+    """
+    Cancel the jobs waiting for a failed job, and the jobs waiting for them.
+
+    Returns:
+        List[str]: IDs of the canceled jobs
+    """
+    canceled = []
+    pending = list(job.dependent_ids)
+    while pending:
+        dependent_id = pending.pop()
+        try:
+            dependent = Job.fetch(
+                dependent_id, connection=redis_conn, serializer=job.serializer
+            )
+            pending.extend(dependent.dependent_ids)
+            dependent.cancel()
+        except Exception as e:
+            logger.warning(f"Could not cancel job {dependent_id}: {str(e)}")
+            continue
+        publish_job_status(redis_conn, dependent_id, JobStatus.FAILED)
+        canceled.append(dependent_id)
+    if canceled:
+        logger.warning(f"Canceled {len(canceled)} jobs depending on {job.id}")
+    return canceled
+
+
+def abandon_job(redis_conn, job: Job, reason: str, already_failed: bool = False):
+    """
+    Fail a job that was lost too often, and cancel the jobs depending on it.
+
+    Args:
+        redis_conn: Redis connection
+        job: The lost job
+        reason: Why it was lost, stored as its error
+        already_failed: The worker already moved it to the failed registry
+    """
+    if not already_failed:
+        queue = Queue(job.origin, connection=redis_conn, serializer=job.serializer)
+        with redis_conn.pipeline() as pipe:
+            queue.started_job_registry.remove_executions(job, pipeline=pipe)
+            job.set_status(RQJobStatus.FAILED, pipeline=pipe)
+            queue.failed_job_registry.add(job, exc_string=reason, pipeline=pipe)
+            pipe.execute()
+        publish_job_status(redis_conn, job.id, JobStatus.FAILED)
+    cancel_dependents(redis_conn, job)
+    job_finished(redis_conn, job, succeeded=False)
+    record_lost_job(redis_conn, "abandoned")
+    logger.error(
+        f"Gave up on job {job.id} after {REAPER_MAX_RETRIES} retries ({reason})"
+    )
+
+
+class LostJob(NamedTuple):
+    job_id: str
+    worker_name: Optional[str]
+    reason: str  # "dead" or "stalled"
+    since: float  # Last sign of life
+
+
+def watched_queues(redis_conn) -> List[str]:
+    """
+    Every queue jobs can run from, including the lanes and tenant queues.
+    """
+    names = ["default", "high", "low", *lane_queue_names()]
+    return names + [name for base in names for name in tenant_queues(redis_conn, base)]
+
+
+def find_lost_jobs(
+    redis_conn,
+    queue_names: List[str],
+    dead_seconds: float = REAPER_DEAD_SECONDS,
+    stall_seconds: float = REAPER_STALL_SECONDS,
+) -> List[LostJob]:
+    """
+    Find the running jobs whose worker died or that stopped making progress.
+
+    Args:
+        redis_conn: Redis connection
+        queue_names: Queues whose started jobs to check
+        dead_seconds: Seconds without an RQ job heartbeat
+        stall_seconds: Seconds without a progress heartbeat
+
+    Returns:
+        List[LostJob]: The lost jobs
+    """
+    job_ids = []
+    for name in queue_names:
+        registry = Queue(name, connection=redis_conn).started_job_registry
+        job_ids.extend(registry.get_job_ids(cleanup=False))
+    if not job_ids:
+        return []
+
+    with redis_conn.pipeline(transaction=False) as pipe:
+        for job_id in job_ids:
+            pipe.hmget(
+                Job.key_for(job_id), "worker_name", "last_heartbeat", "started_at"
+            )
+        pipe.zmscore(HEARTBEATS_KEY, job_ids)
+        *fields, progress = pipe.execute()
+
+    lost = []
+    now_ts = time.time()
+    for job_id, (worker_name, last_heartbeat, started_at), progressed in zip(
+        job_ids, fields, progress
+    ):
+        beat = last_heartbeat or started_at
+        beat = utcparse(beat.decode("utf-8")).timestamp() if beat else now_ts
+        worker_name = worker_name.decode("utf-8") if worker_name else None
+        if now_ts - beat > dead_seconds:
+            lost.append(LostJob(job_id, worker_name, "dead", beat))
+        elif progressed is not None and now_ts - progressed > stall_seconds:
+            lost.append(LostJob(job_id, worker_name, "stalled", progressed))
+    return lost
+
+
+class Reaper:
+    """
+    Periodically recovers the jobs of dead workers and stalled jobs.
+    """
+
+    def __init__(
+        self,
+        dead_seconds: float = REAPER_DEAD_SECONDS,
+        stall_seconds: float = REAPER_STALL_SECONDS,
+    ):
+        self.dead_seconds = dead_seconds
+        self.stall_seconds = stall_seconds
+
+    def recover(self, redis_conn, lost: LostJob):
+        """
+        Requeue or fail a dead job, or kill the work horse of a stalled one.
+        """
+        if lost.reason == "stalled":
+            if lost.worker_name is None:
+                return
+            # Kill once; the worker requeues the job when its work horse dies
+            killing_key = f"{KILLING_KEY_PREFIX}:{lost.job_id}"
+            if redis_conn.set(
+                killing_key, lost.worker_name, nx=True, ex=int(self.stall_seconds)
+            ):
+                redis_conn.hsetnx(LOST_SINCE_KEY, lost.job_id, lost.since)
+                send_kill_horse_command(redis_conn, lost.worker_name)
+                logger.warning(
+                    f"Job {lost.job_id} made no progress for {self.stall_seconds:.0f}s, "
+                    f"killing its work horse on {lost.worker_name}"
+                )
+            return
+
+        job = Job.fetch(lost.job_id, connection=redis_conn, serializer=get_serializer())
+        reason = f"worker {lost.worker_name} stopped sending heartbeats"
+        if not requeue_lost_job(redis_conn, job, reason, lost.since):
+            abandon_job(redis_conn, job, reason)
+
+    def tick(self, redis_conn) -> List[LostJob]:
+        """
+        Check every queue once and recover the lost jobs.
+        """
+        lost_jobs = find_lost_jobs(
+            redis_conn,
+            watched_queues(redis_conn),
+            self.dead_seconds,
+            self.stall_seconds,
+        )
+        for lost in lost_jobs:
+            try:
+                self.recover(redis_conn, lost)
+            except Exception as e:
+                logger.error(f"Could not recover job {lost.job_id}: {str(e)}")
+        return lost_jobs
+
+    def run(self):
+        """
+        Check for lost jobs every REAPER_INTERVAL seconds.
+        """
+        redis_conn = get_redis_con()
+        logger.info(
+            f"Reaping jobs dead for {self.dead_seconds:.0f}s "
+            f"or stalled for {self.stall_seconds:.0f}s"
+        )
+        while True:
+            try:
+                self.tick(redis_conn)
+            except Exception as e:
+                logger.error(f"Error in reaper: {str(e)}")
+            time.sleep(REAPER_INTERVAL)
+
+
+if __name__ == "__main__":
+    Reaper().run()
@@ -0,0 +1,284 @@
+"""
+Finished job results stored as ready-to-send JSON.
+
+Workers encode the final result once, when the job succeeds, and keep the
+bytes next to the job in Redis. The result routes send those bytes as they
+are, so serving a large timeline costs no unpickling or JSON encoding in the
+API. Large bodies are compressed with gzip or zstd and sent with a matching
+Content-Encoding.
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from types import ModuleType
+from typing import Any, NamedTuple, Optional, Tuple
+
+from utils.logger_config import get_logger
+
+orjson: Optional[ModuleType]
+try:
+    # Imported under another name, so a missing orjson is not a redefinition
+    import orjson as _orjson  # type: ignore[import-not-found, unused-ignore]
+
+    orjson = _orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+zstandard: Optional[ModuleType]
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - optional dependency
+    zstandard = None
+
+logger = get_logger(__name__)
+
+# Compression of stored results: "none", "gzip" or "zstd"
+RESULT_COMPRESSION = os.getenv("RESULT_COMPRESSION", "gzip").lower()
+# Results smaller than this are stored uncompressed
+RESULT_COMPRESSION_MIN_BYTES = int(os.getenv("RESULT_COMPRESSION_MIN_BYTES", 1024))
+# Memory for recently served results in each API process (0 disables)
+RESULT_CACHE_MAX_BYTES = int(os.getenv("RESULT_CACHE_MAX_BYTES", 64 * 1024 * 1024))
+
+RESULT_KEY_PREFIX = "mlapi:result"
+IDENTITY = "identity"
+
+
+class StoredResult(NamedTuple):
+    body: bytes
+    encoding: str
+    digest: str  # Hash of the uncompressed JSON
+
+
+def result_digest(body: bytes) -> str:
+    return hashlib.blake2b(body, digest_size=12).hexdigest()
+
+
+def result_key(job_id: str) -> str:
+    return f"{RESULT_KEY_PREFIX}:{job_id}"
+
+
+def to_jsonable(value: Any) -> Any:
+    """
+    Dump pydantic models in JSON mode, so the output matches what the
+    route's response model would have produced.
+    """
+    if hasattr(value, "model_dump"):
+        return value.model_dump(mode="json")
+    return value
+
+
+def encode_json(value: Any) -> bytes:
+    """
+    Encode a job result as compact JSON.
+
+    Args:
+        value: The job result
+
+    Returns:
+        bytes: UTF-8 JSON
+    """
+    value = to_jsonable(value)
+    if orjson is not None:
+        return orjson.dumps(
+            value,
+            option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS,
+            default=str,
+        )
+    return json.dumps(value, separators=(",", ":"), default=str).encode("utf-8")
+
+
+def decode_json(body: bytes) -> Any:
+    """
+    Decode JSON bytes produced by `encode_json`.
+    """
+    if orjson is not None:
+        return orjson.loads(body)
+    return json.loads(body)
+
+
+def compress(body: bytes, encoding: str = RESULT_COMPRESSION) -> StoredResult:
+    """
+    Compress a JSON body with the configured encoding when it is large enough.
+    """
+    digest = result_digest(body)
+    if len(body) < RESULT_COMPRESSION_MIN_BYTES:
+        return StoredResult(body, IDENTITY, digest)
+    if encoding == "zstd":
+        if zstandard is not None:
+            return StoredResult(
+                zstandard.ZstdCompressor().compress(body), "zstd", digest
+            )
+        logger.warning("zstandard is not installed, storing results with gzip")
+        encoding = "gzip"
+    if encoding == "gzip":
+        return StoredResult(
+            gzip.compress(body, compresslevel=6, mtime=0), "gzip", digest
+        )
+    return StoredResult(body, IDENTITY, digest)
+
+
+def as_stored(result: Any) -> StoredResult:
+    """
+    Encode a result loaded from RQ the way a worker would have stored it,
+    without compression.
+    """
+    body = encode_json(result)
+    return StoredResult(body, IDENTITY, result_digest(body))
+
+
+def decompress(stored: StoredResult) -> bytes:
+    """
+    Get the plain JSON bytes of a stored result.
+    """
+    if stored.encoding == "gzip":
+        return gzip.decompress(stored.body)
+    if stored.encoding == "zstd":
+        if zstandard is None:
+            raise RuntimeError("zstandard is required to read zstd results")
+        return zstandard.ZstdDecompressor().decompressobj().decompress(stored.body)
+    return stored.body
+
+
+def store_result(redis_conn, job_id: str, result: Any, ttl: Optional[int]) -> bool:
+    """
+    Store the JSON encoding of a finished job's result.
+
+    Results that report errors or cannot be encoded are skipped; the routes
+    then fall back to the pickled RQ result. Failures never affect the job
+    itself.
+
+    Args:
+        redis_conn: Synchronous Redis connection
+        job_id: The job ID
+        result: The value returned by the job
+        ttl: Seconds to keep the result, None or -1 to keep it forever
+
+    Returns:
+        bool: Whether the result was stored
+    """
+    try:
+        result = to_jsonable(result)
+        if isinstance(result, dict) and result.get("errors"):
+            return False
+        stored = compress(encode_json(result))
+        key = result_key(job_id)
+        with redis_conn.pipeline() as pipe:
+            pipe.hset(key, mapping=stored._asdict())
+            if ttl is not None and ttl >= 0:
+                pipe.expire(key, max(ttl, 1))
+            pipe.execute()
+        return True
+    except Exception as e:
+        logger.warning(f"Could not store JSON result of job {job_id}: {str(e)}")
+        return False
+
+
+class ResultBytesCache:
+    """
+    In-process LRU of stored results, bounded by their total size.
+
+    Finished results never change, so entries stay valid for as long as the
+    job exists: each expires with the result's TTL in Redis.
+    """
+
+    def __init__(self, max_bytes: int = RESULT_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        # Stored result and monotonic expiry time, None if it never expires
+        self._entries: "OrderedDict[str, Tuple[StoredResult, Optional[float]]]" = (
+            OrderedDict()
+        )
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, job_id: str) -> Optional[StoredResult]:
+        with self._lock:
+            entry = self._entries.get(job_id)
+            if (
+                entry is not None
+                and entry[1] is not None
+                and entry[1] <= time.monotonic()
+            ):
+                # The job expired in Redis
+                del self._entries[job_id]
+                self._size -= len(entry[0].body)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(job_id)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, job_id: str, stored: StoredResult, ttl: Optional[float] = None):
+        """
+        Cache a stored result.
+
+        Args:
+            job_id: The job ID
+            stored: The stored result
+            ttl: Seconds until the result expires in Redis, None if never
+        """
+        if len(stored.body) > self.max_bytes:
+            return
+        expires_at = time.monotonic() + ttl if ttl is not None else None
+        with self._lock:
+            previous = self._entries.pop(job_id, None)
+            if previous is not None:
+                self._size -= len(previous[0].body)
+            self._entries[job_id] = (stored, expires_at)
+            self._size += len(stored.body)
+            while self._size > self.max_bytes:
+                _, (evicted, _) = self._entries.popitem(last=False)
+                self._size -= len(evicted.body)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+
+async def load_result(
+    redis_conn, job_id: str
+) -> Optional[Tuple[StoredResult, Optional[float]]]:
+    """
+    Read the stored JSON result of a job and its TTL in one round trip.
+
+    Args:
+        redis_conn: redis.asyncio connection
+        job_id: The job ID
+
+    Returns:
+        Optional[Tuple[StoredResult, Optional[float]]]: The stored bytes and
+        their encoding, and the seconds until they expire (None if never);
+        None if the job has no stored result or Redis is unavailable
+    """
+    key = result_key(job_id)
+    try:
+        async with redis_conn.pipeline(transaction=False) as pipe:
+            pipe.hgetall(key)
+            pipe.pttl(key)
+            fields, pttl = await pipe.execute()
+    except Exception as e:
+        logger.warning(f"Could not read JSON result of job {job_id}: {str(e)}")
+        return None
+    if not fields or b"body" not in fields:
+        return None
+    stored = StoredResult(
+        fields[b"body"],
+        fields.get(b"encoding", b"identity").decode(),
+        fields.get(b"digest", b"").decode(),
+    )
+    if not stored.digest:
+        stored = stored._replace(digest=result_digest(decompress(stored)))
+    return stored, pttl / 1000 if pttl >= 0 else None
+
+
+# Create a singleton instance
+result_bytes_cache = ResultBytesCache()
@@ -0,0 +1,260 @@
+"""
+Compact serializer for RQ job arguments and results.
+
+RQ pickles job payloads by default. Results such as `EmotionDetectionResult`
+carry timelines of thousands of Python floats, which pickle stores at 9 bytes
+each and rebuilds one object at a time. This serializer writes msgpack
+instead:
+
+- pydantic models as their class path and fields, rebuilt without
+  re-validation,
+- float lists of FLOAT_ARRAY_MIN_LENGTH or more (the timelines) as packed
+  little-endian float32, which is lossy beyond ~7 significant digits,
+- payloads of JOB_SERIALIZER_ZSTD_MIN_BYTES or more compressed with zstd.
+
+Values msgpack cannot represent fall back to pickle inside the payload, and
+payloads written by the pickle serializer are still read, so jobs enqueued
+before switching keep working. API and workers must use the same setting.
+
+    python -m redisStore.serializer  # size and speed against pickle
+"""
+
+import importlib
+import os
+import pickle
+import sys
+import time
+from array import array
+from enum import Enum
+from types import ModuleType
+from typing import Any, Dict, Optional, Type, TypeVar
+
+from pydantic import BaseModel
+from rq.serializers import Serializer
+from utils.logger_config import get_logger
+
+msgpack: Optional[ModuleType]
+zstandard: Optional[ModuleType]
+
+try:
+    # Imported under another name: msgpack has no type information
+    import msgpack as _msgpack  # type: ignore[import-untyped]
+
+    msgpack = _msgpack
+except ImportError:  # pragma: no cover - optional dependency
+    msgpack = None
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - optional dependency
+    zstandard = None
+
+logger = get_logger(__name__)
+
+# Serializer of job payloads: "pickle" (RQ's default) or "compact"
+JOB_SERIALIZER = os.getenv("JOB_SERIALIZER", "pickle").lower()
+# Compact payloads at least this large are zstd-compressed (0 disables)
+JOB_SERIALIZER_ZSTD_MIN_BYTES = int(os.getenv("JOB_SERIALIZER_ZSTD_MIN_BYTES", 4096))
+# Float lists at least this long are stored as float32 arrays
+FLOAT_ARRAY_MIN_LENGTH = int(os.getenv("FLOAT_ARRAY_MIN_LENGTH", 16))
+
+# Pickles start with b"\x80", so the header tells the formats apart
+MAGIC = b"\x00MJ"
+PLAIN = b"\x00"
+ZSTD = b"\x01"
+
+EXT_MODEL = 1
+EXT_ENUM = 2
+EXT_FLOAT32 = 3
+EXT_TUPLE = 4
+EXT_PICKLE = 5
+
+_classes: Dict[str, type] = {}
+
+T = TypeVar("T", BaseModel, Enum)
+
+
+def _class_path(cls: type) -> str:
+    return f"{cls.__module__}:{cls.__qualname__}"
+
+
+def _resolve(path: str, base: Type[T]) -> Type[T]:
+    cls = _classes.get(path)
+    if cls is None:
+        module_name, _, qualname = path.partition(":")
+        found: Any = importlib.import_module(module_name)
+        for name in qualname.split("."):
+            found = getattr(found, name)
+        if not (isinstance(found, type) and issubclass(found, (BaseModel, Enum))):
+            raise TypeError(f"Not a model or enum: {path}")
+        cls = _classes[path] = found
+    if not issubclass(cls, base):
+        raise TypeError(f"Not a {base.__name__}: {path}")
+    return cls
+
+
+def _pack(value: Any) -> bytes:
+    # Only reached through CompactSerializer, which needs msgpack
+    assert msgpack is not None
+    return msgpack.packb(_encode(value), use_bin_type=True, strict_types=True)
+
+
+def _encode(value: Any) -> Any:
+    """
+    Convert a value to msgpack-native types and extension types.
+    """
+    assert msgpack is not None
+    kind = type(value)
+    if value is None or kind in (str, int, float, bool, bytes):
+        return value
+    if kind is list:
+        if len(value) >= FLOAT_ARRAY_MIN_LENGTH and all(
+            type(v) is float for v in value
+        ):
+            packed = array("f", value)
+            if sys.byteorder != "little":
+                packed.byteswap()
+            return msgpack.ExtType(EXT_FLOAT32, packed.tobytes())
+        return [_encode(v) for v in value]
+    if kind is dict:
+        return {_encode(k): _encode(v) for k, v in value.items()}
+    if kind is tuple:
+        return msgpack.ExtType(EXT_TUPLE, _pack(list(value)))
+    if isinstance(value, BaseModel):
+        fields = {name: getattr(value, name) for name in kind.model_fields}
+        return msgpack.ExtType(EXT_MODEL, _pack([_class_path(kind), fields]))
+    if isinstance(value, Enum):
+        return msgpack.ExtType(EXT_ENUM, _pack([_class_path(kind), value.value]))
+    return msgpack.ExtType(EXT_PICKLE, pickle.dumps(value, pickle.HIGHEST_PROTOCOL))
+
+
+def _ext_hook(code: int, data: bytes) -> Any:
+    assert msgpack is not None
+    if code == EXT_FLOAT32:
+        values = array("f")
+        values.frombytes(data)
+        if sys.byteorder != "little":
+            values.byteswap()
+        return values.tolist()
+    if code == EXT_TUPLE:
+        return tuple(_unpack(data))
+    if code == EXT_MODEL:
+        path, fields = _unpack(data)
+        # Written from a valid model, so validating again is wasted work
+        return _resolve(path, BaseModel).model_construct(**fields)
+    if code == EXT_ENUM:
+        path, value = _unpack(data)
+        return _resolve(path, Enum)(value)
+    if code == EXT_PICKLE:
+        return pickle.loads(data)
+    return msgpack.ExtType(code, data)
+
+
+def _unpack(data: bytes) -> Any:
+    assert msgpack is not None
+    return msgpack.unpackb(data, raw=False, ext_hook=_ext_hook, strict_map_key=False)
+
+
+class CompactSerializer:
+    """
+    RQ serializer writing msgpack with float32 timelines and zstd.
+    """
+
+    @staticmethod
+    def dumps(obj: Any) -> bytes:
+        body = _pack(obj)
+        if (
+            zstandard is not None
+            and JOB_SERIALIZER_ZSTD_MIN_BYTES
+            and len(body) >= JOB_SERIALIZER_ZSTD_MIN_BYTES
+        ):
+            return MAGIC + ZSTD + zstandard.ZstdCompressor(level=3).compress(body)
+        return MAGIC + PLAIN + body
+
+    @staticmethod
+    def loads(data: bytes) -> Any:
+        if not data.startswith(MAGIC):
+            # Enqueued with the pickle serializer
+            return pickle.loads(data)
+        flag, body = data[len(MAGIC) : len(MAGIC) + 1], data[len(MAGIC) + 1 :]
+        if flag == ZSTD:
+            if zstandard is None:
+                raise RuntimeError(
+                    "zstandard is required to read compressed job payloads"
+                )
+            body = zstandard.ZstdDecompressor().decompressobj().decompress(body)
+        return _unpack(body)
+
+
+def get_serializer() -> Optional[Serializer]:
+    """
+    The serializer configured for queues, workers and job lookups.
+
+    Returns:
+        Optional[Serializer]: `CompactSerializer`, or None for RQ's pickle serializer
+    """
+    if JOB_SERIALIZER != "compact":
+        return None
+    if msgpack is None:
+        logger.warning("msgpack is not installed, serializing jobs with pickle")
+        return None
+    return CompactSerializer
+
+
+def benchmark(value: Any, rounds: int = 20) -> Dict[str, Dict[str, float]]:
+    """
+    Compare payload size and encode/decode time with pickle.
+
+    Args:
+        value: A representative job result
+        rounds: Repetitions to average over
+
+    Returns:
+        dict: Bytes and milliseconds per encode and decode for each serializer
+    """
+    report = {}
+    for name, serializer in (("pickle", pickle), ("compact", CompactSerializer)):
+        start_time = time.perf_counter()
+        for _ in range(rounds):
+            payload = serializer.dumps(value)
+        encode_time = (time.perf_counter() - start_time) / rounds
+        start_time = time.perf_counter()
+        for _ in range(rounds):
+            serializer.loads(payload)
+        decode_time = (time.perf_counter() - start_time) / rounds
+        report[name] = {
+            "bytes": len(payload),
+            "encode_ms": round(encode_time * 1000, 3),
+            "decode_ms": round(decode_time * 1000, 3),
+        }
+    return report
+
+
+if __name__ == "__main__":
+    import random
+
+    from schemas.create_answer import (
+        EmotionDetectionResult,
+        EmotionTimelines,
+        EmotionTotals,
+    )
+
+    # One emotion score per sampled frame of a 30 minute, 30 fps video
+    frames = 30 * 60 * 30 // 30
+    timelines = {
+        emotion: [random.random() for _ in range(frames)]
+        for emotion in EmotionTimelines.model_fields
+    }
+    result = EmotionDetectionResult(
+        total_frames=frames,
+        frame_inference_rate=30,
+        emotion_sums=EmotionTotals(),
+        timeline=EmotionTimelines(**timelines),
+        clip_length_seconds=1800.0,
+        avg_inference_time=0.05,
+    )
+    for name, stats in benchmark(result).items():
+        print(
+            f"{name:>8}: {stats['bytes']:>9} bytes, "
+            f"encode {stats['encode_ms']:.2f} ms, decode {stats['decode_ms']:.2f} ms"
+        )
@@ -0,0 +1,265 @@
+"""
+Autoscaling supervisor for RQ workers on a single host.
+
+Watches the depth of its queues and the age of their oldest job, and starts
+or retires `redisStore.worker` processes to keep the expected wait under a
+target, within min/max bounds and a CPU budget. Retired workers get a warm
+shutdown, so they finish their current job before exiting.
+
+    python -m redisStore.supervisor high --min 1 --max 4
+"""
+
+import argparse
+import math
+import os
+import signal
+import subprocess
+import sys
+import time
+from typing import Dict, List, NamedTuple, Optional
+
+from rq import Queue
+from rq.job import Job
+from rq.utils import now, utcparse
+from redisStore.lanes import expand_queues
+from redisStore.monitor import get_queue_stats
+from redisStore.myconnection import get_redis_con
+from redisStore.worker import DEFAULT_QUEUES
+from utils.logger_config import get_logger
+
+logger = get_logger(__name__)
+
+# Workers kept running even when the queues are empty
+SUPERVISOR_MIN_WORKERS = int(os.getenv("SUPERVISOR_MIN_WORKERS", 1))
+# Upper bound on workers started by the supervisor
+SUPERVISOR_MAX_WORKERS = int(os.getenv("SUPERVISOR_MAX_WORKERS", os.cpu_count() or 1))
+# CPU cores the supervisor's workers may use in total
+SUPERVISOR_CPU_BUDGET = float(os.getenv("SUPERVISOR_CPU_BUDGET", os.cpu_count() or 1))
+# CPU cores one busy worker is expected to use
+SUPERVISOR_CPUS_PER_WORKER = float(os.getenv("SUPERVISOR_CPUS_PER_WORKER", 1))
+# Longest acceptable wait in seconds before a queued job starts
+SUPERVISOR_TARGET_WAIT = float(os.getenv("SUPERVISOR_TARGET_WAIT", 60))
+# Seconds between scaling decisions
+SUPERVISOR_INTERVAL = float(os.getenv("SUPERVISOR_INTERVAL", 5))
+# Seconds fewer workers must be enough before one is retired
+SUPERVISOR_SCALE_DOWN_DELAY = float(os.getenv("SUPERVISOR_SCALE_DOWN_DELAY", 120))
+# Seconds a retired worker may take to finish its job before it is killed
+SUPERVISOR_DRAIN_TIMEOUT = float(os.getenv("SUPERVISOR_DRAIN_TIMEOUT", 900))
+
+
+class ScalingPolicy(NamedTuple):
+    min_workers: int = SUPERVISOR_MIN_WORKERS
+    max_workers: int = SUPERVISOR_MAX_WORKERS
+    cpu_budget: float = SUPERVISOR_CPU_BUDGET
+    cpus_per_worker: float = SUPERVISOR_CPUS_PER_WORKER
+    target_wait: float = SUPERVISOR_TARGET_WAIT
+
+    @property
+    def ceiling(self) -> int:
+        """
+        Most workers allowed by both the max bound and the CPU budget.
+        """
+        by_cpu = math.floor(self.cpu_budget / max(self.cpus_per_worker, 0.01))
+        return max(min(self.max_workers, by_cpu), self.min_workers)
+
+
+class QueueLoad(NamedTuple):
+    depth: int  # Jobs waiting
+    oldest_age: float  # Seconds the oldest waiting job has waited
+    avg_job_seconds: float
+
+
+def oldest_job_age(redis_conn, queue: Queue) -> float:
+    """
+    Seconds the job at the head of a queue has been waiting.
+
+    Args:
+        redis_conn: Redis connection
+        queue: The queue
+
+    Returns:
+        float: Age of the oldest queued job, 0 if the queue is empty
+    """
+    job_id = redis_conn.lindex(queue.key, 0)
+    if job_id is None:
+        return 0.0
+    enqueued_at = redis_conn.hget(Job.key_for(job_id.decode("utf-8")), "enqueued_at")
+    if not enqueued_at:
+        return 0.0
+    return max((now() - utcparse(enqueued_at.decode("utf-8"))).total_seconds(), 0.0)
+
+
+def read_load(redis_conn, queues: List[str]) -> QueueLoad:
+    """
+    Combined load of the queues a supervisor's workers listen on.
+    """
+    stats = get_queue_stats(redis_conn)
+    queues = expand_queues(queues)
+    depth = 0
+    oldest = 0.0
+    avg_job_seconds = 0.0
+    for queue_name in queues:
+        depth += stats.get(queue_name, {}).get("count", 0)
+        avg_job_seconds = max(
+            avg_job_seconds, stats.get(queue_name, {}).get("avg_job_seconds", 0.0)
+        )
+        oldest = max(
+            oldest, oldest_job_age(redis_conn, Queue(queue_name, connection=redis_conn))
+        )
+    return QueueLoad(depth, oldest, avg_job_seconds)
+
+
+def desired_workers(load: QueueLoad, current: int, policy: ScalingPolicy) -> int:
+    """
+    Number of workers needed to start every queued job within the target wait.
+
+    Args:
+        load: Depth, oldest job age and average run time of the queues
+        current: Workers running now
+        policy: Bounds and target
+
+    Returns:
+        int: Desired worker count, within the policy's bounds
+    """
+    needed = math.ceil(load.depth * load.avg_job_seconds / max(policy.target_wait, 1))
+    # Jobs already waiting too long mean the estimate is too low
+    if load.depth and load.oldest_age > policy.target_wait:
+        needed = max(needed, current + 1)
+    return min(max(needed, policy.min_workers), policy.ceiling)
+
+
+class Supervisor:
+    """
+    Starts and retires worker processes to follow the queue load.
+    """
+
+    def __init__(
+        self,
+        queues: List[str],
+        policy: Optional[ScalingPolicy] = None,
+        command: Optional[List[str]] = None,
+    ):
+        """
+        Args:
+            queues: Queue names the workers listen on
+            policy: Scaling bounds and target
+            command: Worker command line (default: `python -m redisStore.worker`)
+        """
+        self.queues = queues
+        self.policy = policy or ScalingPolicy()
+        self.command = command or [sys.executable, "-m", "redisStore.worker", *queues]
+        self.workers: List[subprocess.Popen] = []
+        self.draining: Dict[subprocess.Popen, float] = {}  # worker -> kill deadline
+        self._scale_down_since: Optional[float] = None
+        self._stopping = False
+
+    def _start_worker(self):
+        # In its own session, so a Ctrl-C for the supervisor does not reach
+        # the worker too: a second signal would make RQ abandon its job
+        worker = subprocess.Popen(self.command, start_new_session=True)
+        self.workers.append(worker)
+        logger.info(f"Started worker {worker.pid} ({len(self.workers)} running)")
+
+    def _retire_worker(self):
+        # Newest first: the oldest workers are the warmest
+        worker = self.workers.pop()
+        self.draining[worker] = time.monotonic() + SUPERVISOR_DRAIN_TIMEOUT
+        # Warm shutdown: RQ finishes the current job first
+        worker.send_signal(signal.SIGTERM)
+        logger.info(f"Draining worker {worker.pid} ({len(self.workers)} running)")
+
+    def _reap(self):
+        for worker in [w for w in self.workers if w.poll() is not None]:
+            self.workers.remove(worker)
+            logger.warning(
+                f"Worker {worker.pid} exited with status {worker.returncode}"
+            )
+        for worker, deadline in list(self.draining.items()):
+            if worker.poll() is not None:
+                del self.draining[worker]
+            elif time.monotonic() > deadline:
+                logger.warning(f"Worker {worker.pid} did not drain in time, killing it")
+                worker.kill()
+
+    def scale_to(self, target: int):
+        """
+        Start workers up to `target` at once; retire them one at a time,
+        only after fewer have been enough for SUPERVISOR_SCALE_DOWN_DELAY.
+        """
+        self._reap()
+        if target >= len(self.workers):
+            self._scale_down_since = None
+            while len(self.workers) < target:
+                self._start_worker()
+            return
+        if self._scale_down_since is None:
+            self._scale_down_since = time.monotonic()
+        if time.monotonic() - self._scale_down_since >= SUPERVISOR_SCALE_DOWN_DELAY:
+            self._retire_worker()
+            self._scale_down_since = None
+
+    def tick(self, redis_conn):
+        """
+        Make one scaling decision from the current queue load.
+        """
+        self._reap()
+        load = read_load(redis_conn, self.queues)
+        target = desired_workers(load, len(self.workers), self.policy)
+        if target != len(self.workers):
+            logger.info(
+                f"Queues {self.queues}: {load.depth} waiting, oldest "
+                f"{load.oldest_age:.0f}s, want {target} workers"
+            )
+        self.scale_to(target)
+
+    def stop(self, signum=None, frame=None):
+        """
+        Ask `run` to stop; used as the SIGTERM and SIGINT handler, so it
+        only sets a flag and leaves the workers to the supervising loop.
+        """
+        self._stopping = True
+
+    def drain(self):
+        """
+        Retire every worker and wait until they have exited or been killed.
+        """
+        while self.workers:
+            self._retire_worker()
+        while self.draining:
+            self._reap()
+            time.sleep(1)
+
+    def run(self):
+        """
+        Supervise the workers until SIGTERM or SIGINT, then drain them.
+        """
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+        redis_conn = get_redis_con()
+        logger.info(f"Supervising workers for {self.queues} with {self.policy}")
+        while not self._stopping:
+            try:
+                self.tick(redis_conn)
+            except Exception as e:
+                logger.error(f"Error in supervisor: {str(e)}")
+                # Keep at least the minimum running while Redis is unreachable
+                self.scale_to(max(len(self.workers), self.policy.min_workers))
+            time.sleep(SUPERVISOR_INTERVAL)
+        self.drain()
+        logger.info("Supervisor stopped")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Autoscale RQ workers")
+    parser.add_argument("queues", nargs="*", help="Queues the workers listen on")
+    parser.add_argument("--min", type=int, default=SUPERVISOR_MIN_WORKERS)
+    parser.add_argument("--max", type=int, default=SUPERVISOR_MAX_WORKERS)
+    parser.add_argument("--cpu-budget", type=float, default=SUPERVISOR_CPU_BUDGET)
+    args = parser.parse_args()
+
+    Supervisor(
+        args.queues or DEFAULT_QUEUES,
+        ScalingPolicy(
+            min_workers=args.min, max_workers=args.max, cpu_budget=args.cpu_budget
+        ),
+    ).run()
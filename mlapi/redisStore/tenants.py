@@ -0,0 +1,390 @@
+"""
+Per-tenant fair-share queuing.
+
+With one FIFO queue, a customer submitting a large batch occupies every
+worker and all other customers wait behind it. When FAIR_SHARE is enabled,
+each tenant's jobs go to their own queue next to the one they were meant
+for ("tenant:{tenant}:{queue}"), and workers pick the next job round-robin:
+the tenant served longest ago goes first, and tenants already running their
+concurrency cap are skipped.
+
+Workers only listen on the tenant queues known when they start waiting, so
+the first job of a new tenant may wait up to FAIR_SHARE_REFRESH seconds.
+"""
+
+import os
+import re
+import time
+from typing import Dict, List, Optional, Set, Tuple
+
+from rq import Queue
+from rq.registry import DeferredJobRegistry, ScheduledJobRegistry, StartedJobRegistry
+from utils.logger_config import get_logger
+
+logger = get_logger(__name__)
+
+# Give each tenant its own queues and share the workers between them
+FAIR_SHARE = os.getenv("FAIR_SHARE", "false").lower() in ("1", "true", "yes")
+# Header naming the tenant, set by a trusted proxy in front of the API. Unset,
+# the client identity is used: clients could otherwise pick their own tenant.
+TENANT_HEADER: Optional[str] = os.getenv("TENANT_HEADER") or None
+# Jobs a tenant may have running at once (0 for no limit)
+TENANT_MAX_CONCURRENCY = int(os.getenv("TENANT_MAX_CONCURRENCY", 0))
+# Per-tenant overrides of the cap as tenant:cap, e.g. "acme:8,trial:1"
+TENANT_CONCURRENCY = os.getenv("TENANT_CONCURRENCY", "")
+# Longest seconds a worker waits before picking up queues of new tenants
+FAIR_SHARE_REFRESH = int(os.getenv("FAIR_SHARE_REFRESH", 5))
+
+TENANT_QUEUE_PREFIX = "tenant"
+# Set of the tenant queues of each queue
+TENANT_QUEUES_KEY = "mlapi:tenants:queues"
+# When each tenant was last served, for the round-robin
+TENANT_SERVED_KEY = "mlapi:tenants:served"
+
+# Forget a tenant queue only when nothing can be added back to it by RQ:
+# no queued, running, scheduled or deferred jobs
+FORGET_IDLE_QUEUE_SCRIPT = """
+if redis.call('LLEN', KEYS[2]) > 0 then return 0 end
+for i = 3, #KEYS do
+    if redis.call('ZCARD', KEYS[i]) > 0 then return 0 end
+end
+return redis.call('SREM', KEYS[1], ARGV[1])
+"""
+
+
+def parse_caps(spec: str) -> Dict[str, int]:
+    """
+    Parse per-tenant concurrency caps such as "acme:8,trial:1".
+
+    Raises:
+        ValueError: If the specification is malformed
+    """
+    caps = {}
+    for part in filter(None, (p.strip() for p in spec.split(","))):
+        tenant, cap = part.rsplit(":", 1)
+        caps[normalize_tenant(tenant)] = int(cap)
+    return caps
+
+
+def normalize_tenant(tenant: str) -> str:
+    """
+    Make a tenant ID safe to use in queue names and Redis keys.
+    """
+    return re.sub(r"[^A-Za-z0-9_.@-]", "_", tenant.strip())[:64] or "_"
+
+
+TENANT_CAPS = parse_caps(TENANT_CONCURRENCY)
+
+
+def tenant_cap(tenant: str) -> int:
+    """
+    Jobs the tenant may have running at once, 0 for no limit.
+    """
+    return TENANT_CAPS.get(tenant, TENANT_MAX_CONCURRENCY)
+
+
+def tenant_queue_name(queue_name: str, tenant: Optional[str]) -> str:
+    """
+    Queue for a tenant's jobs meant for `queue_name`, or `queue_name`
+    itself without a tenant or with fair share disabled.
+    """
+    if not FAIR_SHARE or not tenant:
+        return queue_name
+    return f"{TENANT_QUEUE_PREFIX}:{normalize_tenant(tenant)}:{queue_name}"
+
+
+def split_queue_name(queue_name: str) -> Tuple[Optional[str], str]:
+    """
+    Split a queue name into its tenant, if any, and the queue it belongs to.
+
+    Returns:
+        Tuple[Optional[str], str]: The tenant and the base queue name
+    """
+    if queue_name.startswith(f"{TENANT_QUEUE_PREFIX}:"):
+        _, tenant, base = queue_name.split(":", 2)
+        return tenant, base
+    return None, queue_name
+
+
+def register_tenant_queue(redis_conn, queue_name: str):
+    """
+    Make a tenant queue known to the workers of its base queue.
+
+    Must run after the job is pushed, so a worker cannot forget the queue
+    between the two.
+
+    Args:
+        redis_conn: Redis connection or pipeline
+        queue_name: The tenant queue
+    """
+    tenant, base = split_queue_name(queue_name)
+    if tenant is not None:
+        redis_conn.sadd(f"{TENANT_QUEUES_KEY}:{base}", queue_name)
+
+
+def tenant_queues(redis_conn, queue_name: str) -> List[str]:
+    """
+    Names of the known tenant queues of a queue.
+    """
+    members = redis_conn.smembers(f"{TENANT_QUEUES_KEY}:{queue_name}")
+    return sorted(member.decode("utf-8") for member in members)
+
+
+def _running(redis_conn, queue_names: List[str]) -> int:
+    """
+    Jobs running from the given queues. Entries left by dead workers stop
+    counting once their registry entry expires.
+    """
+    with redis_conn.pipeline() as pipe:
+        for name in queue_names:
+            key = StartedJobRegistry(name, connection=redis_conn).key
+            pipe.zcount(key, time.time(), "+inf")
+        return sum(pipe.execute())
+
+
+def _forget_idle(redis_conn, base: str, queue_names: List[str]):
+    script = redis_conn.register_script(FORGET_IDLE_QUEUE_SCRIPT)
+    for name in queue_names:
+        script(
+            keys=[
+                f"{TENANT_QUEUES_KEY}:{base}",
+                Queue(name, connection=redis_conn).key,
+                StartedJobRegistry(name, connection=redis_conn).key,
+                ScheduledJobRegistry(name, connection=redis_conn).key,
+                DeferredJobRegistry(name, connection=redis_conn).key,
+            ],
+            args=[name],
+        )
+
+
+def active_tenant_queues(redis_conn, queue_name: str) -> Dict[str, int]:
+    """
+    Tenant queues of a queue that have jobs waiting, with their counts.
+    Queues with nothing left to do are forgotten on the way.
+
+    Returns:
+        Dict[str, int]: Waiting jobs per tenant queue
+    """
+    names = tenant_queues(redis_conn, queue_name)
+    with redis_conn.pipeline() as pipe:
+        for name in names:
+            pipe.llen(Queue(name, connection=redis_conn).key)
+        counts = dict(zip(names, pipe.execute()))
+    idle = [name for name, count in counts.items() if not count]
+    if idle:
+        _forget_idle(redis_conn, queue_name, idle)
+    return {name: count for name, count in counts.items() if count}
+
+
+def tenant_backlog(redis_conn, queue_name: str) -> int:
+    """
+    Jobs waiting in the tenant queues of a queue, 0 without fair share.
+    """
+    if not FAIR_SHARE:
+        return 0
+    return sum(active_tenant_queues(redis_conn, queue_name).values())
+
+
+def fair_order(redis_conn, queues: List[Queue], queue_class=Queue) -> List[Queue]:
+    """
+    Put the tenant queues of each queue in front of it, least recently
+    served tenant first, leaving out tenants at their concurrency cap.
+
+    Args:
+        redis_conn: Redis connection
+        queues: The worker's queues, in its order
+        queue_class: Class of the queues to create
+
+    Returns:
+        List[Queue]: The queues to dequeue from, in order
+    """
+    by_base = {
+        queue.name: list(active_tenant_queues(redis_conn, queue.name))
+        for queue in queues
+    }
+    # Tenant of each tenant queue; every name listed has one
+    owners: Dict[str, str] = {}
+    for names in by_base.values():
+        for name in names:
+            tenant, _ = split_queue_name(name)
+            if tenant is not None:
+                owners[name] = tenant
+    tenants = set(owners.values())
+    if not tenants:
+        return list(queues)
+
+    ordered_tenants = sorted(tenants)
+    served = redis_conn.zmscore(TENANT_SERVED_KEY, ordered_tenants)
+    last_served = {t: s or 0.0 for t, s in zip(ordered_tenants, served)}
+    capped: Set[str] = set()
+    for tenant in tenants:
+        cap = tenant_cap(tenant)
+        if cap:
+            # Counted over this worker's queues; workers racing may overshoot by one
+            names = [tenant_queue_name(q.name, tenant) for q in queues]
+            if _running(redis_conn, names) >= cap:
+                capped.add(tenant)
+
+    ordered: List[Queue] = []
+    for queue in queues:
+        names = [
+            n for n in by_base[queue.name] if n in owners and owners[n] not in capped
+        ]
+        names.sort(key=lambda n: last_served[owners[n]])
+        ordered.extend(
+            queue_class(
+                n,
+                connection=redis_conn,
+                job_class=queue.job_class,
+                serializer=queue.serializer,
+                death_penalty_class=queue.death_penalty_class,
+            )
+            for n in names
+        )
+        ordered.append(queue)
+    return ordered
+
+
+def record_served(redis_conn, queue_name: str):
+    """
+    Move the tenant of a queue to the back of the round-robin.
+    """
+    tenant, _ = split_queue_name(queue_name)
+    if tenant is not None:
+        redis_conn.zadd(TENANT_SERVED_KEY, {tenant: time.time()})
+
+
+class FairQueue(Queue):
+    """
+    RQ queue whose workers also take jobs from the tenant queues of their
+    queues, sharing the workers fairly between tenants.
+    """
+
+    @classmethod
+    def dequeue_any(cls, queues, timeout, connection, *args, **kwargs):
+        if not FAIR_SHARE:
+            return super().dequeue_any(queues, timeout, connection, *args, **kwargs)
+        queues = fair_order(connection, list(queues), cls)
+        # Wake up regularly to listen on the queues of new tenants
+        if timeout is not None:
+            timeout = min(timeout, FAIR_SHARE_REFRESH)
+        result = super().dequeue_any(queues, timeout, connection, *args, **kwargs)
+        if result is not None:
+            record_served(connection, result[1].name)
+        return result
+
+
+def estimate_wait(
+    jobs_ahead: int, avg_job_seconds: float, workers: int, active_tenants: int, cap: int
+) -> float:
+    """
+    Seconds before a tenant's job starts, given the jobs ahead of it in
+    the tenant's own queue.
+
+    With the round-robin, each of the tenants with waiting jobs gets an
+    equal share of the workers, but never more than its concurrency cap.
+
+    Returns:
+        float: Estimated seconds
+    """
+    share = max(workers, 1) / max(active_tenants, 1)
+    if cap:
+        share = min(share, cap)
+    return round(jobs_ahead * avg_job_seconds / share, 1)
+
+
+def job_position(redis_conn, job_id: str) -> Optional[dict]:
+    """
+    Position of a waiting job in its tenant's queue and its estimated wait.
+
+    Args:
+        redis_conn: Redis connection
+        job_id: The job ID
+
+    Returns:
+        Optional[dict]: Tenant, queue, position (None unless the job is
+        waiting), jobs ahead, active tenants and estimated wait; None if the
+        job does not exist
+    """
+    from redisStore.monitor import get_queue_stats
+
+    origin = redis_conn.hget(f"rq:job:{job_id}", "origin")
+    if origin is None:
+        return None
+    origin = origin.decode("utf-8")
+    tenant, base = split_queue_name(origin)
+    index = redis_conn.lpos(Queue(origin, connection=redis_conn).key, job_id)
+    active = active_tenant_queues(redis_conn, base)
+    stats = get_queue_stats(redis_conn).get(base, {})
+    position = {
+        "job_id": job_id,
+        "tenant": tenant,
+        "queue": base,
+        "position": None if index is None else index + 1,
+        "jobs_ahead": index,
+        # Jobs without a tenant share the workers like one more tenant
+        "active_tenants": len(active)
+        + (1 if Queue(base, connection=redis_conn).count else 0),
+        "estimated_wait_seconds": None,
+    }
+    if index is not None:
+        position["estimated_wait_seconds"] = estimate_wait(
+            index,
+            stats.get("avg_job_seconds", 0.0),
+            stats.get("workers", 0),
+            position["active_tenants"],
+            tenant_cap(tenant) if tenant is not None else 0,
+        )
+    return position
+
+
+def describe_tenant(redis_conn, tenant: str) -> Optional[dict]:
+    """
+    Waiting and running jobs of a tenant, with the estimated wait for a job
+    it submits now on each queue.
+
+    Args:
+        redis_conn: Redis connection
+        tenant: The tenant ID
+
+    Returns:
+        Optional[dict]: Tenant, concurrency cap, running jobs, and per queue
+        the waiting jobs, active tenants and estimated wait; None if fair
+        share is disabled
+    """
+    from redisStore.monitor import get_queue_stats
+
+    if not FAIR_SHARE:
+        return None
+    tenant = normalize_tenant(tenant)
+    cap = tenant_cap(tenant)
+    stats = get_queue_stats(redis_conn)
+    queues = []
+    for base, queue_stats in stats.items():
+        name = tenant_queue_name(base, tenant)
+        waiting = Queue(name, connection=redis_conn).count
+        active = set(active_tenant_queues(redis_conn, base))
+        # A new job makes the tenant active if it was not already
+        active.add(name)
+        if Queue(base, connection=redis_conn).count:
+            active.add(base)
+        queues.append(
+            {
+                "queue": base,
+                "waiting": waiting,
+                "active_tenants": len(active),
+                "estimated_wait_seconds": estimate_wait(
+                    waiting,
+                    queue_stats["avg_job_seconds"],
+                    queue_stats["workers"],
+                    len(active),
+                    cap,
+                ),
+            }
+        )
+    return {
+        "tenant": tenant,
+        "concurrency_cap": cap or None,
+        "running": _running(redis_conn, [tenant_queue_name(b, tenant) for b in stats]),
+        "queues": queues,
+    }
@@ -1,6 +1,28 @@
+import argparse
+import gc
+import os
+import signal
 import sys
+import time
+from typing import Dict, List, Optional
 from rq import Worker
+from rq.utils import now
+from redisStore.job_events import publish_job_status
+from redisStore.jobs import RQ_STATUS_MAP
+from redisStore.lanes import expand_queues, lane_queue_names, weighted_order
+from redisStore.metrics import record_job_timings, record_model_load
+from redisStore.monitor import record_job_duration
 from redisStore.myconnection import get_redis_con
+from redisStore.reaper import (
+    JOB_HEARTBEAT_INTERVAL,
+    abandon_job,
+    job_finished,
+    requeue_lost_job,
+)
+from redisStore.result_store import store_result
+from redisStore.serializer import get_serializer
+from redisStore.tenants import FairQueue, split_queue_name
+from schemas.jobs import JobStatus
 from utils.logger_config import get_logger
 
 logger = get_logger(__name__)
@@ -8,32 +30,353 @@ logger = get_logger(__name__)
 # Default list of queues to listen for jobs on
 DEFAULT_QUEUES = ["default", "high", "low"]
 
+# Load models in the parent process so forked work horses start warm
+WARMUP_MODELS = os.getenv("WARMUP_MODELS", "true").lower() in ("1", "true", "yes")
+# Seconds between memory reports of a worker pool (0 disables)
+POOL_MEMORY_REPORT_INTERVAL = float(os.getenv("POOL_MEMORY_REPORT_INTERVAL", 300))
+# Longest wait before restarting a pool worker that keeps exiting
+POOL_MAX_RESTART_DELAY = float(os.getenv("POOL_MAX_RESTART_DELAY", 60))
+
+
+class AnalysisWorker(Worker):
+    """
+    RQ worker that publishes job status transitions for push subscribers
+    and stores finished results as JSON. Jobs whose work horse is killed,
+    e.g. by the OOM killer or the reaper, are requeued.
+    """
+
+    _killed_job_id = None
+
+    def prepare_job_execution(self, job, remove_from_intermediate_queue=False):
+        super().prepare_job_execution(job, remove_from_intermediate_queue)
+        publish_job_status(self.connection, job.id, JobStatus.PROCESSING)
+
+    def handle_job_success(self, job, queue, started_job_registry):
+        # Store the JSON result before the job is marked finished, so it is
+        # there as soon as clients see the status change
+        ttl = job.get_result_ttl(self.default_result_ttl)
+        store_result(self.connection, job.id, job._result, ttl)
+        super().handle_job_success(job, queue, started_job_registry)
+        publish_job_status(self.connection, job.id, JobStatus.COMPLETED)
+        record_job_timings(self.connection, job)
+        job_finished(self.connection, job, succeeded=True)
+        if job.started_at is not None:
+            # Feeds the backlog estimate used by admission control
+            seconds = (now() - job.started_at).total_seconds()
+            _, queue_name = split_queue_name(queue.name)
+            record_job_duration(self.connection, queue_name, seconds)
+
+    def handle_work_horse_killed(self, job, retpid, ret_val, rusage):
+        super().handle_work_horse_killed(job, retpid, ret_val, rusage)
+        self._killed_job_id = job.id
+
+    def handle_job_failure(self, job, queue, started_job_registry=None, exc_string=""):
+        super().handle_job_failure(job, queue, started_job_registry, exc_string)
+        record_job_timings(self.connection, job)
+        if self._killed_job_id == job.id:
+            self._killed_job_id = None
+            try:
+                if requeue_lost_job(self.connection, job, "work horse killed"):
+                    return
+                abandon_job(self.connection, job, exc_string, already_failed=True)
+            except Exception as e:
+                logger.error(f"Could not recover job {job.id}: {str(e)}")
+        # A failed job with retries left goes back to the queue
+        try:
+            rq_status = job.get_status(refresh=True)
+            status = RQ_STATUS_MAP.get(
+                getattr(rq_status, "value", rq_status), JobStatus.FAILED
+            )
+        except Exception:
+            status = JobStatus.FAILED
+        publish_job_status(self.connection, job.id, status)
+        if status == JobStatus.FAILED:
+            job_finished(self.connection, job, succeeded=False)
+
+    def reorder_queues(self, reference_queue):
+        # Draw from the cost lanes by weighted lottery
+        if lane_queue_names():
+            self._ordered_queues = weighted_order(self._ordered_queues)
+        else:
+            super().reorder_queues(reference_queue)
+
+    def handle_job_retry(self, job, queue, retry, started_job_registry, execution):
+        super().handle_job_retry(job, queue, retry, started_job_registry, execution)
+        publish_job_status(self.connection, job.id, JobStatus.PENDING)
+
 
 def get_worker(queues=None):
     """
     Create and return a worker instance
-    
+
     Args:
         queues: List of queue names to listen on (default: ["default", "high", "low"])
-    
+
     Returns:
         Worker: RQ Worker instance
     """
     if queues is None:
         queues = DEFAULT_QUEUES
-    
+    # Workers of the default queue also serve its cost lanes
+    queues = expand_queues(queues)
+
     conn = get_redis_con()
-    return Worker(queues, connection=conn)
+    return AnalysisWorker(
+        queues,
+        connection=conn,
+        serializer=get_serializer(),
+        queue_class=FairQueue,
+        # Frequent job heartbeats let the reaper notice dead workers quickly
+        job_monitoring_interval=JOB_HEARTBEAT_INTERVAL,
+    )
+
+
+def warmup_models(queues=None):
+    """
+    Load the models used by jobs on the given queues before taking work.
+
+    RQ forks a work horse for every job, so anything loaded here is shared
+    by all jobs instead of being loaded again inside each of them.
+
+    Args:
+        queues: List of queue names the worker listens on
+    """
+    if queues is None:
+        queues = DEFAULT_QUEUES
+
+    # STAR feedback jobs are enqueued on the default queue
+    if "default" in queues:
+        from tasks.helpers.star_classifier import warmup_star_classifier
+
+        try:
+            stats = warmup_star_classifier()
+            logger.info(f"STAR classifier ready: {stats}")
+            record_model_load(
+                get_redis_con(),
+                f"star:{stats['model_name']}:{stats['backend']}",
+                stats["load_time_seconds"],
+            )
+        except Exception as e:
+            logger.error(f"Failed to warm up STAR classifier: {str(e)}")
+
+    # Facial analysis jobs are enqueued on the high queue
+    if "high" in queues:
+        try:
+            from deepface import DeepFace
+
+            start_time = time.perf_counter()
+            DeepFace.build_model("Emotion", task="facial_attribute")
+            DeepFace.build_model("opencv", task="face_detector")
+            load_time = time.perf_counter() - start_time
+            logger.info(f"DeepFace emotion model ready in {load_time:.2f}s")
+            record_model_load(get_redis_con(), "deepface:emotion", load_time)
+        except Exception as e:
+            logger.error(f"Failed to warm up DeepFace: {str(e)}")
+
+
+def process_memory(pid: int) -> Optional[Dict[str, int]]:
+    """
+    Resident and proportional set size of a process, from /proc (Linux).
+
+    Pages shared copy-on-write with other processes count fully towards
+    RSS but only by their share towards PSS.
+
+    Args:
+        pid: The process ID
+
+    Returns:
+        Optional[Dict[str, int]]: "rss" and "pss" in bytes, None if unavailable
+    """
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            fields = dict(line.split(":", 1) for line in f if ":" in line)
+        return {
+            "rss": int(fields["Rss"].split()[0]) * 1024,
+            "pss": int(fields["Pss"].split()[0]) * 1024,
+        }
+    except (OSError, KeyError, ValueError):
+        return None
+
+
+def pool_memory_report(pids: List[int]) -> Dict[str, int]:
+    """
+    Memory used by a worker pool compared with separate worker replicas.
+
+    Each separate replica would hold its own copy of what a pool process has
+    resident, so their combined RSS approximates the replicas' footprint,
+    while the combined PSS is what the pool actually uses.
+
+    Args:
+        pids: Parent and worker process IDs
+
+    Returns:
+        Dict[str, int]: Processes measured, RSS and PSS totals and bytes saved
+    """
+    usage = [m for m in (process_memory(pid) for pid in pids) if m is not None]
+    rss = sum(m["rss"] for m in usage)
+    pss = sum(m["pss"] for m in usage)
+    return {
+        "processes": len(usage),
+        "rss_bytes": rss,
+        "pss_bytes": pss,
+        "saved_bytes": rss - pss,
+    }
+
+
+class WorkerPool:
+    """
+    Pre-forking pool of RQ workers sharing the models of their parent.
+
+    The parent loads the models once and forks the workers, which share the
+    model weights copy-on-write instead of each loading their own. Workers
+    that exit are restarted, with a growing delay if they keep failing.
+    SIGTERM or SIGINT stop the workers after their current job.
+    """
+
+    def __init__(self, size: int, queues: Optional[List[str]] = None):
+        """
+        Args:
+            size: Number of worker processes
+            queues: List of queue names the workers listen on
+        """
+        if size < 1:
+            raise ValueError("A worker pool needs at least one worker")
+        self.size = size
+        self.queues = queues or DEFAULT_QUEUES
+        self._children: Dict[int, int] = {}  # pid -> slot
+        self._started_at: Dict[int, float] = {}  # slot -> start time
+        self._failures: Dict[int, int] = {}  # slot -> consecutive quick exits
+        self._restart_at: Dict[int, float] = {}  # slot -> time to restart
+        self._stopping = False
+
+    def _spawn(self, slot: int):
+        pid = os.fork()
+        if pid == 0:
+            # Worker process in its own session, so only the pool signals it:
+            # RQ abandons the current job on a second SIGINT
+            os.setsid()
+            # RQ installs its own signal handlers
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+            exit_code = 0
+            try:
+                # One scheduler per pool is enough
+                get_worker(self.queues).work(with_scheduler=slot == 0)
+            except BaseException as e:
+                logger.error(f"Pool worker {slot} crashed: {str(e)}")
+                exit_code = 1
+            finally:
+                os._exit(exit_code)
+        self._children[pid] = slot
+        self._started_at[slot] = time.monotonic()
+        logger.info(f"Started pool worker {slot} (pid {pid})")
+
+    def _stop(self, signum, frame):
+        if self._stopping:
+            # The workers are already finishing their jobs
+            return
+        self._stopping = True
+        logger.info(f"Stopping worker pool ({signal.Signals(signum).name})")
+        for pid in self._children:
+            try:
+                # Warm shutdown: RQ finishes the current job first
+                os.kill(pid, signal.SIGINT)
+            except ProcessLookupError:
+                pass
+
+    def _reap(self):
+        while self._children:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+            slot = self._children.pop(pid, None)
+            if slot is None or self._stopping:
+                continue
+            uptime = time.monotonic() - self._started_at[slot]
+            # Back off workers that exit right after starting
+            self._failures[slot] = self._failures.get(slot, 0) + 1 if uptime < 30 else 0
+            delay = min(2 ** self._failures[slot] - 1, POOL_MAX_RESTART_DELAY)
+            logger.warning(
+                f"Pool worker {slot} (pid {pid}) exited with status "
+                f"{os.waitstatus_to_exitcode(status)}, restarting in {delay:.0f}s"
+            )
+            self._restart_at[slot] = time.monotonic() + delay
+
+    def _log_memory(self):
+        report = pool_memory_report([os.getpid(), *self._children])
+        if report["processes"]:
+            logger.info(
+                f"Worker pool memory: {report['pss_bytes'] / 1024 / 1024:.0f} MiB "
+                f"(PSS) vs {report['rss_bytes'] / 1024 / 1024:.0f} MiB as "
+                f"separate replicas, saving {report['saved_bytes'] / 1024 / 1024:.0f} MiB"
+            )
+
+    def run(self):
+        """
+        Load the models, fork the workers and supervise them until stopped.
+        """
+        if WARMUP_MODELS:
+            warmup_models(self.queues)
+        # Keep the collector from touching, and so copying, shared objects
+        gc.collect()
+        gc.freeze()
+
+        signal.signal(signal.SIGTERM, self._stop)
+        signal.signal(signal.SIGINT, self._stop)
+        for slot in range(self.size):
+            self._spawn(slot)
+
+        next_report = time.monotonic() + POOL_MEMORY_REPORT_INTERVAL
+        while self._children or not self._stopping:
+            time.sleep(1)
+            self._reap()
+            if self._stopping:
+                continue
+            for slot, restart_at in list(self._restart_at.items()):
+                if time.monotonic() >= restart_at:
+                    del self._restart_at[slot]
+                    self._spawn(slot)
+            if POOL_MEMORY_REPORT_INTERVAL > 0 and time.monotonic() >= next_report:
+                self._log_memory()
+                next_report = time.monotonic() + POOL_MEMORY_REPORT_INTERVAL
+        logger.info("Worker pool stopped")
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run RQ workers")
     # Accept queue names as command-line arguments
-    if len(sys.argv) > 1:
-        queue_names = sys.argv[1:]
+    parser.add_argument("queues", nargs="*", help="Queues to listen on")
+    parser.add_argument(
+        "--pool",
+        type=int,
+        default=0,
+        metavar="N",
+        help="Fork N workers sharing preloaded models (default: single worker)",
+    )
+    args = parser.parse_args()
+    queue_names = args.queues or DEFAULT_QUEUES
+
+    if args.pool:
+        logger.info(
+            f"Starting pool of {args.pool} workers listening to queues: "
+            f"{', '.join(queue_names)}"
+        )
+        WorkerPool(args.pool, queue_names).run()
+        sys.exit(0)
+
+    if args.queues:
         logger.info(f"Starting worker listening to queues: {', '.join(queue_names)}")
         worker = get_worker(queue_names)
     else:
-        logger.info(f"Starting worker listening to default queues: {', '.join(DEFAULT_QUEUES)}")
+        logger.info(
+            f"Starting worker listening to default queues: {', '.join(DEFAULT_QUEUES)}"
+        )
         worker = get_worker()
-    
+
+    if WARMUP_MODELS:
+        warmup_models([queue.name for queue in worker.queues])
+
     worker.work(with_scheduler=True)
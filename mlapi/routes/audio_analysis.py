@@ -1,11 +1,17 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request, Header, Response
 from schemas.jobs import JobId, JobResponse
 from schemas.create_answer import AudioSentimentResult, AudioAnalysisJob
 from redisStore.queue import add_task_to_queue
+from redisStore.lanes import queue_for_video
 from tasks.assemblyai_api import detect_audio_sentiment
-from rq.job import Job
-from redisStore.myconnection import get_redis_con
+from fastapi.concurrency import run_in_threadpool
+from redisStore.idempotency import IdempotencyError, submit_once
+from redisStore.jobs import describe_job, fetch_job_result
+from redisStore.result_store import as_stored
+from typing import Optional
+from utils.dependencies import admit_client, tenant_identity
 from utils.logger_config import get_logger
+from utils.responses import finished_result_response, get_stored_result
 from pydantic import BaseModel
 
 logger = get_logger(__name__)
@@ -27,7 +33,13 @@ class AudioAnalysisRequest(BaseModel):
     summary="Start an audio analysis job for the given video",
     description="Starts a background job to analyze audio using AssemblyAI",
 )
-async def start_audio_analysis_job(request: AudioAnalysisRequest):
+async def start_audio_analysis_job(
+    request: AudioAnalysisRequest,
+    http_request: Request,
+    response: Response,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
+    tenant: str = Depends(tenant_identity),
+):
     """
     Start a job to analyze audio from the video URL using AssemblyAI.
 
@@ -36,16 +48,48 @@ async def start_audio_analysis_job(request: AudioAnalysisRequest):
     - Sentiment analysis
     - Auto-highlights (key phrases)
     - Topic detection (IAB categories)
+
+    Identical submissions within the dedup window, or with the same
+    Idempotency-Key header, return the existing job instead; only new
+    submissions go through admission control.
     """
     try:
         # Use default video URL for testing if not provided
         video_url = request.video_url or "https://assembly.ai/wildfires.mp3"
 
-        # Start the audio analysis job
-        job = add_task_to_queue(detect_audio_sentiment, video_url)
+        # Probe the media before taking the idempotency lock, which may expire
+        # while a slow remote video is opened
+        queue_name = await run_in_threadpool(queue_for_video, video_url, facial=False)
+
+        def submit() -> str:
+            admit_client(http_request)
+            return add_task_to_queue(
+                detect_audio_sentiment,
+                video_url,
+                queue_name=queue_name,
+                tenant=tenant,
+            ).get_id()
 
-        logger.info(f"Started audio analysis job: {job.get_id()}")
-        return {"job_id": job.get_id()}
+        # Start the audio analysis job
+        job_id, created = await run_in_threadpool(
+            submit_once,
+            "audio_analysis",
+            {"video_url": video_url},
+            submit,
+            idempotency_key,
+            tenant,
+        )
+
+        if created:
+            logger.info(f"Started audio analysis job: {job_id}")
+        else:
+            logger.info(f"Returning existing audio analysis job: {job_id}")
+            response.headers["Idempotent-Replayed"] = "true"
+        return {"job_id": job_id}
+    except HTTPException:
+        raise
+    except IdempotencyError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
     except Exception as e:
         logger.error(f"Error starting audio analysis job: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -64,39 +108,7 @@ async def get_audio_analysis_job(job_id: str):
     Returns the job status and result if available.
     """
     try:
-        job = Job.fetch(job_id, connection=get_redis_con())
-
-        if job.is_finished:
-            result = job.result
-            if isinstance(result, Exception):
-                return {
-                    "job_id": job_id,
-                    "status": "failed",
-                    "error": str(result),
-                }
-            return {
-                "job_id": job_id,
-                "status": "completed",
-                "result": result.model_dump()
-                if hasattr(result, "model_dump")
-                else result,
-            }
-        elif job.is_failed:
-            return {
-                "job_id": job_id,
-                "status": "failed",
-                "error": str(job.exc_info),
-            }
-        elif job.is_started:
-            return {
-                "job_id": job_id,
-                "status": "processing",
-            }
-        else:
-            return {
-                "job_id": job_id,
-                "status": "pending",
-            }
+        return await run_in_threadpool(describe_job, job_id)
     except Exception as e:
         logger.error(f"Error getting audio analysis job {job_id}: {str(e)}")
         raise HTTPException(status_code=404, detail=f"Job not found: {str(e)}")
@@ -108,22 +120,27 @@ async def get_audio_analysis_job(job_id: str):
     summary="Get the result of a completed audio analysis job",
     description="Get the full result of a completed audio analysis job",
 )
-async def get_audio_analysis_result(job_id: str):
+async def get_audio_analysis_result(job_id: str, request: Request):
     """
     Get the result of a completed audio analysis job.
 
     Only returns the result if the job is completed, otherwise raises an error.
+    Results stored as JSON by the worker are sent without deserializing them.
+    Responses carry an ETag; a matching If-None-Match gets a 304.
     """
+    stored = await get_stored_result(job_id)
+    if stored is not None:
+        return finished_result_response(job_id, stored, request)
+
     try:
-        job = Job.fetch(job_id, connection=get_redis_con())
+        outcome, result = await run_in_threadpool(fetch_job_result, job_id)
 
-        if job.is_finished:
-            result = job.result
+        if outcome == "finished":
             if isinstance(result, Exception):
                 raise HTTPException(status_code=500, detail=str(result))
-            return result
-        elif job.is_failed:
-            raise HTTPException(status_code=500, detail=str(job.exc_info))
+            return finished_result_response(job_id, as_stored(result), request)
+        elif outcome == "failed":
+            raise HTTPException(status_code=500, detail=str(result))
         else:
             raise HTTPException(status_code=202, detail="Job is still processing")
     except Exception as e:
@@ -1,29 +1,98 @@
-from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks
-from schemas.jobs import JobId, JobResponse, CreateAnswerJobRequest
+from fastapi import (
+    APIRouter,
+    Depends,
+    HTTPException,
+    BackgroundTasks,
+    Request,
+    Header,
+    Response,
+)
+from schemas.jobs import (
+    BatchId,
+    BatchResponse,
+    JobId,
+    JobResponse,
+    CreateAnswerBatchRequest,
+    CreateAnswerJobRequest,
+)
 from schemas.create_answer import CreateAnswer
 from redisStore.queue import add_task_to_queue
 from tasks.create_answer_task import (
     create_answer,
     start_audio_analysis_job,
+    start_create_answer_batch,
     start_facial_analysis_job,
 )
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from rq.job import Job
+from redisStore.batches import (
+    BATCH_MAX_ITEMS,
+    batch_job_ids,
+    describe_batch,
+    load_batch,
+)
+from redisStore.job_events import job_event_hub
+from redisStore.lanes import queue_for_video
 from redisStore.myconnection import get_redis_con
+from redisStore.idempotency import IdempotencyError, submit_once
+from redisStore.jobs import describe_job, fetch_job_result
+from redisStore.result_store import as_stored
+from routes.jobs import JOB_EVENTS_RECHECK, TERMINAL_STATUSES
 from typing import Optional
+import asyncio
+import json
+from utils.dependencies import admit_client, check_admission, tenant_identity
 from utils.logger_config import get_logger
+from utils.responses import (
+    finished_result_response,
+    get_stored_result,
+    result_view_query,
+)
+from utils.result_views import ResultView
 
 logger = get_logger(__name__)
 
 router = APIRouter(prefix="/api/create_answer", tags=["analysis"])
 
 
+def _start_create_answer_jobs(
+    video_url: str, queue_name: str = "default", tenant: Optional[str] = None
+) -> Job:
+    """
+    Enqueue the audio, facial and create_answer jobs for a video.
+
+    All jobs of the video share `queue_name`, the cost lane of the whole
+    analysis.
+    """
+    # Start the audio and facial analysis jobs
+    audio_job_id = start_audio_analysis_job(video_url, queue_name, tenant)
+    facial_job_id = start_facial_analysis_job(video_url, queue_name, tenant)
+
+    # Start the create_answer job that depends on the first two jobs
+    return add_task_to_queue(
+        create_answer,
+        video_url,
+        audio_job_id,
+        facial_job_id,
+        queue_name=queue_name,
+        tenant=tenant,
+    )
+
+
 @router.post(
     "/",
     response_model=JobId,
     summary="Start an answer generation job for the given video",
     description="Starts a background job to analyze a video and generate an answer",
 )
-async def create_answer_job(request: CreateAnswerJobRequest):
+async def create_answer_job(
+    request: CreateAnswerJobRequest,
+    http_request: Request,
+    response: Response,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
+    tenant: str = Depends(tenant_identity),
+):
     """
     Start a job to generate an answer for the video URL.
 
@@ -31,25 +100,182 @@ async def create_answer_job(request: CreateAnswerJobRequest):
     1. Start an audio analysis job using AssemblyAI
     2. Start a facial analysis job using DeepFace
     3. Start a create_answer job that depends on the first two jobs
+
+    Identical submissions within the dedup window, or with the same
+    Idempotency-Key header, return the existing job instead; only new
+    submissions go through admission control.
     """
     try:
         # Use default video URL for testing if not provided
         video_url = request.video_url or "https://assembly.ai/wildfires.mp3"
 
-        # Start the audio and facial analysis jobs
-        audio_job_id = start_audio_analysis_job(video_url)
-        facial_job_id = start_facial_analysis_job(video_url)
+        # Probe the media before taking the idempotency lock, which may expire
+        # while a slow remote video is opened
+        queue_name = await run_in_threadpool(queue_for_video, video_url)
+
+        def submit() -> str:
+            admit_client(http_request)
+            return _start_create_answer_jobs(video_url, queue_name, tenant).get_id()
 
-        # Start the create_answer job that depends on the first two jobs
-        job = add_task_to_queue(create_answer, video_url, audio_job_id, facial_job_id)
+        job_id, created = await run_in_threadpool(
+            submit_once,
+            "create_answer",
+            {"video_url": video_url},
+            submit,
+            idempotency_key,
+            tenant,
+        )
 
-        logger.info(f"Started create_answer job: {job.get_id()}")
-        return {"job_id": job.get_id()}
+        if created:
+            logger.info(f"Started create_answer job: {job_id}")
+        else:
+            logger.info(f"Returning existing create_answer job: {job_id}")
+            response.headers["Idempotent-Replayed"] = "true"
+        return {"job_id": job_id}
+    except HTTPException:
+        raise
+    except IdempotencyError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
     except Exception as e:
         logger.error(f"Error starting create_answer job: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.post(
+    "/batch",
+    response_model=BatchId,
+    summary="Start answer generation jobs for several videos",
+    description="Enqueues the jobs of every video in one transaction and returns a batch ID",
+)
+async def create_answer_batch(
+    request: CreateAnswerBatchRequest,
+    http_request: Request,
+    tenant: str = Depends(tenant_identity),
+):
+    """
+    Start create_answer jobs for a list of videos.
+
+    The audio, facial and create_answer jobs of all videos are enqueued in a
+    single Redis transaction, in one round trip. The returned job IDs are in
+    the order of the videos. Each video counts as one submission against the
+    client's rate limit.
+    """
+    if len(request.video_urls) > BATCH_MAX_ITEMS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {BATCH_MAX_ITEMS} videos can be submitted at once",
+        )
+    await check_admission(http_request, cost=len(request.video_urls))
+    try:
+        batch_id, items = await run_in_threadpool(
+            start_create_answer_batch, request.video_urls, tenant
+        )
+        return {"batch_id": batch_id, "job_ids": [item["job_id"] for item in items]}
+    except Exception as e:
+        logger.error(f"Error starting create_answer batch: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get(
+    "/batch/{batch_id}",
+    response_model=BatchResponse,
+    response_model_exclude_none=True,
+    summary="Get the progress of a create_answer batch",
+    description="Aggregated status of every video of a batch",
+)
+async def get_create_answer_batch(batch_id: str):
+    """
+    Get the progress of a batch, with the status of each video.
+    """
+    try:
+        batch = await run_in_threadpool(describe_batch, batch_id)
+    except Exception as e:
+        logger.error(f"Error getting create_answer batch {batch_id}: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+    if batch is None:
+        raise HTTPException(status_code=404, detail="Batch not found")
+    return batch
+
+
+async def _batch_updates(batch_id: str, job_ids: list):
+    """
+    Yield the progress of a batch until every video completed or failed.
+
+    Subscribes to all jobs of the batch and re-reads the batch progress when
+    any of them changes. Yields None as a heartbeat when nothing happened
+    for JOB_EVENTS_RECHECK seconds.
+
+    Args:
+        batch_id: The batch ID
+        job_ids: IDs of every job of the batch
+
+    Yields:
+        Optional[Tuple[str, dict]]: Event name and data, or None as a heartbeat
+    """
+    async with job_event_hub.subscribe(*job_ids) as events:
+        reported = set()
+        last_progress = None
+        idle = False
+        while True:
+            batch = await run_in_threadpool(describe_batch, batch_id)
+            if batch is None:
+                yield "error", {"batch_id": batch_id, "error": "Batch not found"}
+                return
+            changed = False
+            for item in batch.pop("items"):
+                if (
+                    item["status"] in TERMINAL_STATUSES
+                    and item["index"] not in reported
+                ):
+                    reported.add(item["index"])
+                    changed = True
+                    yield "item", item
+            if batch != last_progress:
+                changed = True
+                last_progress = batch
+                yield "progress", batch
+            if len(reported) == batch["total"]:
+                return
+            if idle and not changed:
+                yield None
+            try:
+                await asyncio.wait_for(events.get(), timeout=JOB_EVENTS_RECHECK)
+                # A burst of events costs one re-read
+                while not events.empty():
+                    events.get_nowait()
+                idle = False
+            except asyncio.TimeoutError:
+                idle = True
+
+
+@router.get("/batch/{batch_id}/events")
+async def stream_create_answer_batch(batch_id: str):
+    """
+    Push the progress of a batch over Server-Sent Events.
+
+    Sends an `item` event as each video completes or fails and a `progress`
+    event with the aggregated counts whenever they change. Closes once every
+    video has finished.
+    """
+    items = await run_in_threadpool(lambda: load_batch(get_redis_con(), batch_id))
+    if items is None:
+        raise HTTPException(status_code=404, detail="Batch not found")
+
+    async def event_stream():
+        async for update in _batch_updates(batch_id, batch_job_ids(items)):
+            if update is None:
+                yield ": keep-alive\n\n"
+                continue
+            event, data = update
+            yield f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @router.get(
     "/{job_id}",
     response_model=JobResponse,
@@ -63,37 +289,7 @@ async def get_create_answer_job(job_id: str):
     Returns the job status and result if available.
     """
     try:
-        job = Job.fetch(job_id, connection=get_redis_con())
-
-        if job.is_finished:
-            result = job.result
-            if isinstance(result, Exception):
-                return {
-                    "job_id": job_id,
-                    "status": "failed",
-                    "error": str(result),
-                }
-            return {
-                "job_id": job_id,
-                "status": "completed",
-                "result": result.dict() if hasattr(result, "dict") else result,
-            }
-        elif job.is_failed:
-            return {
-                "job_id": job_id,
-                "status": "failed",
-                "error": str(job.exc_info),
-            }
-        elif job.is_started:
-            return {
-                "job_id": job_id,
-                "status": "processing",
-            }
-        else:
-            return {
-                "job_id": job_id,
-                "status": "pending",
-            }
+        return await run_in_threadpool(describe_job, job_id)
     except Exception as e:
         logger.error(f"Error getting create_answer job {job_id}: {str(e)}")
         raise HTTPException(status_code=404, detail=f"Job not found: {str(e)}")
@@ -105,22 +301,35 @@ async def get_create_answer_job(job_id: str):
     summary="Get the result of a completed create_answer job",
     description="Get the full result of a completed create_answer job",
 )
-async def get_create_answer_result(job_id: str):
+async def get_create_answer_result(
+    job_id: str,
+    request: Request,
+    view: ResultView = Depends(
+        result_view_query(CreateAnswer, ("evaluation", "timeline"))
+    ),
+):
     """
     Get the result of a completed create_answer job.
 
     Only returns the result if the job is completed, otherwise raises an error.
+    Results stored as JSON by the worker are sent without deserializing them.
+    Responses carry an ETag; a matching If-None-Match gets a 304.
+    `fields`, `timeline_offset`, `timeline_limit` and `buckets` trim the
+    result, e.g. `?fields=evaluation.aggregateScore` for a summary view.
     """
+    stored = await get_stored_result(job_id)
+    if stored is not None:
+        return finished_result_response(job_id, stored, request, view)
+
     try:
-        job = Job.fetch(job_id, connection=get_redis_con())
+        outcome, result = await run_in_threadpool(fetch_job_result, job_id)
 
-        if job.is_finished:
-            result = job.result
+        if outcome == "finished":
             if isinstance(result, Exception):
                 raise HTTPException(status_code=500, detail=str(result))
-            return result
-        elif job.is_failed:
-            raise HTTPException(status_code=500, detail=str(job.exc_info))
+            return finished_result_response(job_id, as_stored(result), request, view)
+        elif outcome == "failed":
+            raise HTTPException(status_code=500, detail=str(result))
         else:
             raise HTTPException(status_code=202, detail="Job is still processing")
     except Exception as e:
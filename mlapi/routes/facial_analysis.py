@@ -1,11 +1,22 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request, Header, Response
 from schemas.jobs import JobId, JobResponse
 from schemas.create_answer import EmotionDetectionResult, FacialAnalysisJob
 from redisStore.queue import add_task_to_queue
+from redisStore.lanes import queue_for_video
 from tasks.detect_emotions import detect_emotions
-from rq.job import Job
-from redisStore.myconnection import get_redis_con
+from fastapi.concurrency import run_in_threadpool
+from redisStore.idempotency import IdempotencyError, submit_once
+from redisStore.jobs import describe_job, fetch_job_result
+from redisStore.result_store import as_stored
+from typing import Optional
+from utils.dependencies import admit_client, tenant_identity
 from utils.logger_config import get_logger
+from utils.responses import (
+    finished_result_response,
+    get_stored_result,
+    result_view_query,
+)
+from utils.result_views import ResultView
 from pydantic import BaseModel, Field
 
 logger = get_logger(__name__)
@@ -28,7 +39,13 @@ class FacialAnalysisRequest(BaseModel):
     summary="Start a facial emotion analysis job for the given video",
     description="Starts a background job to analyze facial emotions using DeepFace",
 )
-async def start_facial_analysis_job(request: FacialAnalysisRequest):
+async def start_facial_analysis_job(
+    request: FacialAnalysisRequest,
+    http_request: Request,
+    response: Response,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
+    tenant: str = Depends(tenant_identity),
+):
     """
     Start a job to analyze facial emotions from the video URL using DeepFace.
 
@@ -37,16 +54,51 @@ async def start_facial_analysis_job(request: FacialAnalysisRequest):
     - Detect faces in each frame
     - Analyze emotions in detected faces
     - Aggregate results across all frames
+
+    Identical submissions within the dedup window, or with the same
+    Idempotency-Key header, return the existing job instead; only new
+    submissions go through admission control.
     """
     try:
         # Use default video URL for testing if not provided
         video_url = request.video_url or "https://assembly.ai/wildfires.mp3"
 
-        # Start the facial analysis job with the specified sample rate
-        job = add_task_to_queue(detect_emotions, video_url, request.sample_rate)
+        # Probe the media before taking the idempotency lock, which may expire
+        # while a slow remote video is opened
+        queue_name = await run_in_threadpool(
+            queue_for_video, video_url, request.sample_rate, audio=False
+        )
+
+        def submit() -> str:
+            admit_client(http_request)
+            return add_task_to_queue(
+                detect_emotions,
+                video_url,
+                request.sample_rate,
+                queue_name=queue_name,
+                tenant=tenant,
+            ).get_id()
 
-        logger.info(f"Started facial analysis job: {job.get_id()}")
-        return {"job_id": job.get_id()}
+        # Start the facial analysis job with the specified sample rate
+        job_id, created = await run_in_threadpool(
+            submit_once,
+            "facial_analysis",
+            {"video_url": video_url, "sample_rate": request.sample_rate},
+            submit,
+            idempotency_key,
+            tenant,
+        )
+
+        if created:
+            logger.info(f"Started facial analysis job: {job_id}")
+        else:
+            logger.info(f"Returning existing facial analysis job: {job_id}")
+            response.headers["Idempotent-Replayed"] = "true"
+        return {"job_id": job_id}
+    except HTTPException:
+        raise
+    except IdempotencyError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
     except Exception as e:
         logger.error(f"Error starting facial analysis job: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -65,39 +117,7 @@ async def get_facial_analysis_job(job_id: str):
     Returns the job status and result if available.
     """
     try:
-        job = Job.fetch(job_id, connection=get_redis_con())
-
-        if job.is_finished:
-            result = job.result
-            if isinstance(result, Exception):
-                return {
-                    "job_id": job_id,
-                    "status": "failed",
-                    "error": str(result),
-                }
-            return {
-                "job_id": job_id,
-                "status": "completed",
-                "result": result.model_dump()
-                if hasattr(result, "model_dump")
-                else result,
-            }
-        elif job.is_failed:
-            return {
-                "job_id": job_id,
-                "status": "failed",
-                "error": str(job.exc_info),
-            }
-        elif job.is_started:
-            return {
-                "job_id": job_id,
-                "status": "processing",
-            }
-        else:
-            return {
-                "job_id": job_id,
-                "status": "pending",
-            }
+        return await run_in_threadpool(describe_job, job_id)
     except Exception as e:
         logger.error(f"Error getting facial analysis job {job_id}: {str(e)}")
         raise HTTPException(status_code=404, detail=f"Job not found: {str(e)}")
@@ -109,22 +129,35 @@ async def get_facial_analysis_job(job_id: str):
     summary="Get the result of a completed facial analysis job",
     description="Get the full result of a completed facial analysis job",
 )
-async def get_facial_analysis_result(job_id: str):
+async def get_facial_analysis_result(
+    job_id: str,
+    request: Request,
+    view: ResultView = Depends(
+        result_view_query(EmotionDetectionResult, ("timeline",))
+    ),
+):
     """
     Get the result of a completed facial analysis job.
 
     Only returns the result if the job is completed, otherwise raises an error.
+    Results stored as JSON by the worker are sent without deserializing them.
+    Responses carry an ETag; a matching If-None-Match gets a 304.
+    `fields`, `timeline_offset`, `timeline_limit` and `buckets` trim the
+    result, e.g. `?fields=emotion_sums` for a summary view.
     """
+    stored = await get_stored_result(job_id)
+    if stored is not None:
+        return finished_result_response(job_id, stored, request, view)
+
     try:
-        job = Job.fetch(job_id, connection=get_redis_con())
+        outcome, result = await run_in_threadpool(fetch_job_result, job_id)
 
-        if job.is_finished:
-            result = job.result
+        if outcome == "finished":
             if isinstance(result, Exception):
                 raise HTTPException(status_code=500, detail=str(result))
-            return result
-        elif job.is_failed:
-            raise HTTPException(status_code=500, detail=str(job.exc_info))
+            return finished_result_response(job_id, as_stored(result), request, view)
+        elif outcome == "failed":
+            raise HTTPException(status_code=500, detail=str(result))
         else:
             raise HTTPException(status_code=202, detail="Job is still processing")
     except Exception as e:
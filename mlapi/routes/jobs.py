@@ -1,21 +1,51 @@
-from fastapi import APIRouter
-from rq.job import Job
+import asyncio
+import os
+from fastapi import APIRouter, HTTPException, Request, WebSocket, WebSocketDisconnect
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 import json
 from utils.logger_config import get_logger
-from redisStore.queue import get_redis_con
+from utils.responses import get_stored_result, wrapped_result_response
+from redisStore.job_events import job_event_hub
+from redisStore.jobs import (
+    MAX_BULK_JOB_IDS,
+    describe_job,
+    describe_jobs,
+    fetch_job_result,
+    read_job_status,
+)
+from redisStore.myconnection import get_async_redis_con, get_redis_con
+from redisStore.result_store import as_stored
+from redisStore.tenants import describe_tenant, job_position
+from schemas.jobs import (
+    JobPositionResponse,
+    JobResponse,
+    JobStatus,
+    JobsListResponse,
+    JobsStatusRequest,
+    TenantResponse,
+)
 
 logger = get_logger(__name__)
 
+# Seconds between status re-reads while waiting for a pushed event, in case
+# an event was missed (e.g. a worker killed before publishing)
+JOB_EVENTS_RECHECK = float(os.getenv("JOB_EVENTS_RECHECK", 60))
+
+TERMINAL_STATUSES = (JobStatus.COMPLETED, JobStatus.FAILED)
+
 router = APIRouter(prefix="/api/jobs", tags=["jobs"])
 
 
 @router.get("/results/{job_id}")
-async def get_job_results(job_id: str):
+async def get_job_results(job_id: str, request: Request):
     """
     GET route that returns the results of a job.
 
     This endpoint fetches the results of a job from the Redis queue using the job ID.
     It checks the status of the job and returns the result if the job is finished.
+    Results stored as JSON by the worker are returned without deserializing them,
+    with an ETag; a matching If-None-Match gets a 304.
     If the job is not found or not finished, it returns an appropriate message.
 
     Args:
@@ -25,23 +55,22 @@ async def get_job_results(job_id: str):
         Response: A JSON response containing the job result if finished, or a message indicating the job status.
     """
     logger.info(f"Fetching results for job_id: {job_id}")
-    # get connection
-    conn = get_redis_con()
+    stored = await get_stored_result(job_id)
+    if stored is not None:
+        return wrapped_result_response(job_id, stored, request)
     try:
-        job = Job.fetch(job_id, connection=conn)
+        outcome, result = await run_in_threadpool(fetch_job_result, job_id)
     except Exception as e:
         logger.warning(f"Job not found: {job_id}. Error: {str(e)}")
         return ({"message": "Job not found.", "status": "error"}), 404
-    if not job.is_finished:
+    if outcome != "finished":
         logger.info(f"Job is not finished yet: {job_id}")
         return {"message": "Job is not finished yet.", "status": "pending"}
     try:
-        result = job.result
         if "errors" in result:
             return ({"errors": result["errors"]}), 400
-        json_string = json.dumps(result)
         logger.info(f"Job finished successfully: {job_id}")
-        return {"result": json.loads(json_string), "status": "success"}
+        return wrapped_result_response(job_id, as_stored(result), request)
     except Exception as e:
         logger.error(f"Error processing job result for job_id {job_id}: {str(e)}")
         return (
@@ -54,3 +83,205 @@ async def get_job_results(job_id: str):
             ),
             500,
         )
+
+
+@router.get("/status/{job_id}", response_model=JobResponse)
+async def get_job_status(job_id: str):
+    """
+    GET route that returns only the status of a job.
+
+    Reads the status field with a single non-blocking Redis call and never
+    loads the job payload or result, so it is cheap to poll.
+
+    Args:
+        job_id (str): The unique identifier of the job.
+
+    Returns:
+        JobResponse: The job ID and its status.
+    """
+    redis_conn = get_async_redis_con()
+    try:
+        status = await read_job_status(redis_conn, job_id)
+    except Exception as e:
+        logger.error(f"Error reading status of job {job_id}: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        await redis_conn.aclose()
+    if status is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return {"job_id": job_id, "status": status}
+
+
+@router.post(
+    "/status", response_model=JobsListResponse, response_model_exclude_none=True
+)
+async def get_jobs_status(request: JobsStatusRequest):
+    """
+    POST route that returns the status of many jobs at once.
+
+    All jobs are resolved with pipelined Redis reads instead of one round
+    trip per job. Results of finished jobs are only included on request.
+
+    Args:
+        request (JobsStatusRequest): The job IDs and whether to include results.
+
+    Returns:
+        JobsListResponse: One status record per job, plus the unknown job IDs.
+    """
+    if len(request.job_ids) > MAX_BULK_JOB_IDS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {MAX_BULK_JOB_IDS} job IDs can be requested at once",
+        )
+    try:
+        jobs, missing = await run_in_threadpool(
+            describe_jobs, request.job_ids, request.include_results
+        )
+    except Exception as e:
+        logger.error(f"Error reading status of {len(request.job_ids)} jobs: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+    return {"jobs": jobs, "missing": missing}
+
+
+@router.get("/{job_id}/position", response_model=JobPositionResponse)
+async def get_job_position(job_id: str):
+    """
+    GET route that returns where a waiting job is in its tenant's queue.
+
+    With fair share, each tenant with waiting jobs gets an equal share of
+    the workers, so the wait depends on the jobs ahead in the tenant's own
+    queue and the number of tenants waiting.
+
+    Args:
+        job_id (str): The unique identifier of the job.
+
+    Returns:
+        JobPositionResponse: Position, jobs ahead and estimated wait.
+    """
+    try:
+        position = await run_in_threadpool(job_position, get_redis_con(), job_id)
+    except Exception as e:
+        logger.error(f"Error reading queue position of job {job_id}: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+    if position is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return position
+
+
+@router.get("/tenants/{tenant}", response_model=TenantResponse)
+async def get_tenant(tenant: str):
+    """
+    GET route that returns a tenant's waiting and running jobs, and the
+    estimated wait of a job it submits now on each queue.
+
+    Args:
+        tenant (str): The tenant ID.
+
+    Returns:
+        TenantResponse: Concurrency cap, running jobs and per-queue waits.
+    """
+    try:
+        description = await run_in_threadpool(describe_tenant, get_redis_con(), tenant)
+    except Exception as e:
+        logger.error(f"Error describing tenant {tenant}: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+    if description is None:
+        raise HTTPException(status_code=404, detail="Fair share is not enabled")
+    return description
+
+
+async def _read_status(job_id: str):
+    redis_conn = get_async_redis_con()
+    try:
+        return await read_job_status(redis_conn, job_id)
+    finally:
+        await redis_conn.aclose()
+
+
+async def _job_updates(job_id: str):
+    """
+    Yield the status changes of a job until it completes or fails.
+
+    Subscribes before reading the current status so no transition is lost.
+    Yields None as a heartbeat when nothing happened for JOB_EVENTS_RECHECK
+    seconds; the final update is the full `JobResponse` body.
+
+    Args:
+        job_id: The job ID
+
+    Yields:
+        Optional[dict]: Status update, or None as a heartbeat
+    """
+    async with job_event_hub.subscribe(job_id) as events:
+        status = await _read_status(job_id)
+        last_sent = None
+        while True:
+            if status is None:
+                yield {"job_id": job_id, "status": "error", "error": "Job not found"}
+                return
+            if status in TERMINAL_STATUSES:
+                yield await run_in_threadpool(describe_job, job_id)
+                return
+            if status != last_sent:
+                yield {"job_id": job_id, "status": status.value}
+                last_sent = status
+            try:
+                _, status = await asyncio.wait_for(
+                    events.get(), timeout=JOB_EVENTS_RECHECK
+                )
+            except asyncio.TimeoutError:
+                status = await _read_status(job_id)
+                if status == last_sent:
+                    yield None
+
+
+@router.get("/{job_id}/events")
+async def stream_job_events(job_id: str):
+    """
+    GET route that pushes the status of a job over Server-Sent Events.
+
+    Sends a `status` event for every transition and closes after the
+    final event, which carries the result or error. Replaces polling the
+    status endpoint.
+
+    Args:
+        job_id (str): The unique identifier of the job.
+
+    Returns:
+        StreamingResponse: text/event-stream of job updates.
+    """
+
+    async def event_stream():
+        async for update in _job_updates(job_id):
+            if update is None:
+                yield ": keep-alive\n\n"
+                continue
+            yield f"event: status\ndata: {json.dumps(update, default=str)}\n\n"
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.websocket("/{job_id}/ws")
+async def job_events_websocket(websocket: WebSocket, job_id: str):
+    """
+    WebSocket route that pushes the status of a job.
+
+    Sends one JSON message per transition and closes after the final
+    message, which carries the result or error.
+
+    Args:
+        websocket (WebSocket): The client connection.
+        job_id (str): The unique identifier of the job.
+    """
+    await websocket.accept()
+    try:
+        async for update in _job_updates(job_id):
+            if update is not None:
+                await websocket.send_text(json.dumps(update, default=str))
+        await websocket.close()
+    except WebSocketDisconnect:
+        logger.info(f"Job event subscriber disconnected: {job_id}")
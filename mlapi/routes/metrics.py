@@ -0,0 +1,28 @@
+from fastapi import APIRouter
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import PlainTextResponse
+from redisStore.metrics import render_metrics
+from redisStore.myconnection import get_redis_con
+from utils.logger_config import get_logger
+
+logger = get_logger(__name__)
+
+router = APIRouter(tags=["metrics"])
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """
+    GET route that exports queue, worker and job telemetry for Prometheus.
+
+    Reports queue depths and registry counts, queue wait and run time
+    histograms per task, worker busy ratio, model load times, cache hit
+    rates and facial analysis frames per second.
+
+    Returns:
+        PlainTextResponse: Metrics in the Prometheus text exposition format.
+    """
+    body = await run_in_threadpool(lambda: render_metrics(get_redis_con()))
+    return PlainTextResponse(
+        body, media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
@@ -1,17 +1,93 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from typing import List
-from rq.job import Job
-from redisStore.myconnection import get_redis_con
+from typing import Any, Dict, List, Literal, Optional
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import os
+import threading
+import uuid
+from fastapi.concurrency import run_in_threadpool
+from redisStore.jobs import fetch_job_result
+from redisStore.myconnection import get_redis_con, get_async_redis_con
+from redisStore.result_store import as_stored, store_result
+from utils.dependencies import admit_submission, tenant_identity
 from utils.logger_config import get_logger
-from tasks.starscores import predict_star_scores
+from utils.responses import get_stored_result, wrapped_result_response
+from tasks.starscores import predict_star_scores, stream_star_scores
+from tasks.helpers.star_cache import get_star_cache_stats
+from tasks.helpers.star_classifier import warmup_star_classifier
 from redisStore.queue import add_task_to_queue
+from rq.defaults import DEFAULT_RESULT_TTL
 import json
 
 logger = get_logger(__name__)
 
 router = APIRouter(prefix="/api/star_feedback", tags=["star_feedback"])
 
+# Texts up to this many characters are classified inside the API process
+# instead of going through the queue. 0 disables inline analysis.
+STAR_INLINE_MAX_CHARS = int(os.getenv("STAR_INLINE_MAX_CHARS", 300))
+# Number of inline analyses that may run at once; extra requests are queued
+STAR_INLINE_WORKERS = int(os.getenv("STAR_INLINE_WORKERS", 2))
+
+# Seconds a STAR stream may go without an event before it is closed
+STAR_STREAM_TIMEOUT = float(os.getenv("STAR_STREAM_TIMEOUT", 120))
+# Interval of SSE keep-alive comments while waiting for the worker
+STAR_STREAM_KEEPALIVE = 15.0
+
+_inline_pool: Optional[ThreadPoolExecutor] = None
+_inline_slots = threading.BoundedSemaphore(max(STAR_INLINE_WORKERS, 1))
+
+
+def _get_inline_pool() -> ThreadPoolExecutor:
+    global _inline_pool
+    if _inline_pool is None:
+        _inline_pool = ThreadPoolExecutor(
+            max_workers=max(STAR_INLINE_WORKERS, 1), thread_name_prefix="star-inline"
+        )
+    return _inline_pool
+
+
+async def _analyze_inline(data: dict) -> Optional[dict]:
+    """
+    Run the STAR analysis in the bounded inline pool.
+
+    Returns None when every inline slot is busy, so the caller can fall back
+    to the queue instead of piling up work in the API process.
+    """
+    if not _inline_slots.acquire(blocking=False):
+        return None
+    try:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_get_inline_pool(), predict_star_scores, data)
+    finally:
+        _inline_slots.release()
+
+
+def _store_inline_result(result: dict) -> str:
+    """
+    Keep an inline result under a new job ID, so `/result/{job_id}` serves
+    it like the result of a queued analysis.
+    """
+    job_id = str(uuid.uuid4())
+    store_result(get_redis_con(), job_id, result, DEFAULT_RESULT_TTL)
+    return job_id
+
+
+async def warmup_inline_classifier():
+    """
+    Load the STAR classifier at API start when short texts are analyzed
+    inline, so the first inline request does not pay for loading it.
+    """
+    if STAR_INLINE_MAX_CHARS <= 0:
+        return
+    try:
+        stats = await run_in_threadpool(warmup_star_classifier)
+        logger.info(f"STAR classifier ready for inline analysis: {stats}")
+    except Exception as e:
+        logger.error(f"Failed to warm up STAR classifier: {str(e)}")
+
 
 class StarFeedbackRequest(BaseModel):
     """
@@ -52,8 +128,29 @@ class StarFeedbackResponse(BaseModel):
     feedback: List[str]
 
 
-@router.post("/analyze", response_model=dict)
-async def analyze_star_method(request: StarFeedbackRequest):
+class StarAnalyzeResponse(BaseModel):
+    """
+    Response of `/analyze`, for both inline and queued analyses
+
+    Both carry a `job_id` for `/result/{job_id}`. Inline analyses have
+    status "success" and also carry the `result`; queued ones have status
+    "queued".
+    """
+
+    status: Literal["success", "queued"]
+    job_id: str
+    result: Optional[Dict[str, Any]] = None
+
+
+@router.post(
+    "/analyze",
+    response_model=StarAnalyzeResponse,
+    response_model_exclude_none=True,
+    dependencies=[Depends(admit_submission)],
+)
+async def analyze_star_method(
+    request: StarFeedbackRequest, tenant: str = Depends(tenant_identity)
+):
     """
     Analyze text using the STAR method (Situation, Task, Action, Result)
 
@@ -63,8 +160,11 @@ async def analyze_star_method(request: StarFeedbackRequest):
     This endpoint analyzes text to determine how well it follows the STAR structure
     and provides feedback on improving the response.
 
-    Returns a job ID that can be used to track the status of the analysis.
-    The results will be processed by success or failure handlers.
+    Short texts (up to `STAR_INLINE_MAX_CHARS` characters) are analyzed
+    immediately and returned with status "success", a `job_id` and the same
+    `result` as `/result/{job_id}`. Longer texts, or short ones while the
+    inline pool is busy, return status "queued" and a `job_id` that can be
+    used to track the analysis.
     """
     try:
         if not request.text or len(request.text.strip()) < 10:
@@ -74,10 +174,20 @@ async def analyze_star_method(request: StarFeedbackRequest):
             )
         data = {"text": request.text}
 
+        if len(request.text) <= STAR_INLINE_MAX_CHARS:
+            result = await _analyze_inline(data)
+            if result is not None:
+                job_id = await run_in_threadpool(_store_inline_result, result)
+                return StarAnalyzeResponse(
+                    status="success", job_id=job_id, result=result
+                )
+
         # Enqueue task with success and failure handlers
-        job = add_task_to_queue(predict_star_scores, data)
+        job = await run_in_threadpool(
+            add_task_to_queue, predict_star_scores, data, tenant=tenant
+        )
 
-        return {"job_id": job.id, "status": "queued"}
+        return StarAnalyzeResponse(status="queued", job_id=job.id)
 
     except HTTPException:
         raise
@@ -89,33 +199,133 @@ async def analyze_star_method(request: StarFeedbackRequest):
         )
 
 
+def _sse_event(event: str, data: dict) -> str:
+    """
+    Format a Server-Sent Event.
+    """
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@router.post("/analyze/stream", dependencies=[Depends(admit_submission)])
+async def stream_star_method(request: StarFeedbackRequest):
+    """
+    Analyze text using the STAR method, streaming results as Server-Sent Events.
+
+    Emits a "queued" event with the job ID, one "classification" event per
+    sentence (`index`, `sentence`, `category`) as soon as it is classified,
+    and finally a "result" event with `fufilledStar`, `percentages` and
+    `percentageFeedback`. An "error" event ends the stream on failure.
+    """
+    if not request.text or len(request.text.strip()) < 10:
+        raise HTTPException(
+            status_code=400,
+            detail="Text is too short for analysis. Please provide a more detailed response.",
+        )
+
+    # Subscribe before enqueueing so no event published by the worker is missed
+    channel = f"star:stream:{uuid.uuid4().hex}"
+    redis_conn = get_async_redis_con()
+    pubsub = redis_conn.pubsub()
+
+    async def close():
+        await pubsub.unsubscribe(channel)
+        await pubsub.aclose()
+        await redis_conn.aclose()
+
+    try:
+        await pubsub.subscribe(channel)
+        job = await run_in_threadpool(
+            add_task_to_queue, stream_star_scores, {"text": request.text}, channel
+        )
+    except Exception as e:
+        await close()
+        logger.error(f"Error starting STAR stream: {str(e)}")
+        raise HTTPException(
+            status_code=500,
+            detail=f"Failed to analyze text using STAR method: {str(e)}",
+        )
+
+    async def events():
+        loop = asyncio.get_running_loop()
+        try:
+            yield _sse_event("queued", {"job_id": job.id})
+            last_event = loop.time()
+            last_sent = last_event
+            while True:
+                now = loop.time()
+                remaining = last_event + STAR_STREAM_TIMEOUT - now
+                if remaining <= 0:
+                    yield _sse_event(
+                        "error", {"detail": "Timed out waiting for STAR analysis"}
+                    )
+                    break
+                if now - last_sent >= STAR_STREAM_KEEPALIVE:
+                    yield ": keep-alive\n\n"
+                    last_sent = now
+
+                message = await pubsub.get_message(
+                    ignore_subscribe_messages=True,
+                    timeout=min(remaining, STAR_STREAM_KEEPALIVE),
+                )
+                if message is None:
+                    continue
+
+                payload = json.loads(message["data"])
+                yield _sse_event(payload["event"], payload["data"])
+                if payload["event"] in ("result", "error"):
+                    break
+                last_event = last_sent = loop.time()
+        finally:
+            await close()
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @router.get("/result/{job_id}", response_model=dict)
-async def get_star_feedback_result(job_id: str):
+async def get_star_feedback_result(job_id: str, request: Request):
     """
     Get the result of a completed STAR feedback analysis job.
 
     Only returns the result if the job is completed, otherwise raises an error.
+    Finished results carry an ETag; a matching If-None-Match gets a 304.
     """
     logger.info(f"Fetching results for job_id: {job_id}")
-    # get connection
-    conn = get_redis_con()
+    stored = await get_stored_result(job_id)
+    if stored is not None:
+        return wrapped_result_response(job_id, stored, request)
     try:
-        job = Job.fetch(job_id, connection=conn)
+        outcome, result = await run_in_threadpool(fetch_job_result, job_id)
     except Exception as e:
         logger.warning(f"Job not found: {job_id}. Error: {str(e)}")
         return HTTPException(status_code=404, detail=f"Job not found: {str(e)}")
-    if not job.is_finished:
+    if outcome != "finished":
         logger.info(f"Job is not finished yet: {job_id}")
         return HTTPException(status_code=202, detail="Job is still processing")
     try:
-        result = job.result
         if "errors" in result:
             return HTTPException(status_code=400, detail=result["errors"])
-        json_string = json.dumps(result)
         logger.info(f"Job finished successfully: {job_id}")
-        return {"result": json.loads(json_string), "status": "success"}
+        return wrapped_result_response(job_id, as_stored(result), request)
     except Exception as e:
         logger.error(f"Error processing job result for job_id {job_id}: {str(e)}")
         return HTTPException(
             status_code=500, detail=f"Error processing job result: {str(e)}"
         )
+
+
+@router.get("/cache/stats", response_model=dict)
+async def get_star_cache_statistics():
+    """
+    Get hit rates and the inference time saved by the STAR sentence cache.
+    """
+    try:
+        return await run_in_threadpool(get_star_cache_stats, get_redis_con())
+    except Exception as e:
+        logger.error(f"Error getting STAR cache stats: {str(e)}")
+        raise HTTPException(
+            status_code=500, detail=f"Failed to get STAR cache stats: {str(e)}"
+        )
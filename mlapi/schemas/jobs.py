@@ -41,9 +41,105 @@ class CreateAnswerJobRequest(BaseModel):
     video_url: str
 
 
+class JobsStatusRequest(BaseModel):
+    """
+    Request for the status of several jobs
+    """
+
+    job_ids: List[str] = Field(..., min_length=1)
+    include_results: bool = False
+
+
 class JobsListResponse(BaseModel):
     """
     Response model for listing jobs
     """
 
     jobs: List[JobResponse] = Field(default_factory=list)
+    missing: List[str] = Field(default_factory=list)
+
+
+class CreateAnswerBatchRequest(BaseModel):
+    """
+    Request to create answer jobs for several videos
+    """
+
+    video_urls: List[str] = Field(..., min_length=1)
+
+
+class BatchId(BaseModel):
+    """
+    Batch ID response model, with the create_answer job of each video
+    """
+
+    batch_id: str
+    job_ids: List[str]
+
+
+class BatchItem(BaseModel):
+    """
+    Status of one video of a batch
+    """
+
+    index: int
+    video_url: str
+    job_id: str
+    status: JobStatus
+    error: Optional[str] = None
+
+
+class BatchResponse(BaseModel):
+    """
+    Aggregated progress of a batch
+    """
+
+    batch_id: str
+    total: int
+    pending: int
+    processing: int
+    completed: int
+    failed: int
+    progress: float = Field(
+        ..., description="Fraction of the batch's jobs that finished"
+    )
+    items: List[BatchItem] = Field(default_factory=list)
+
+
+class JobPositionResponse(BaseModel):
+    """
+    Place of a waiting job in its tenant's queue
+    """
+
+    job_id: str
+    tenant: Optional[str] = None
+    queue: str
+    position: Optional[int] = Field(
+        None, description="1 for the tenant's next job, None unless waiting"
+    )
+    jobs_ahead: Optional[int] = None
+    active_tenants: int
+    estimated_wait_seconds: Optional[float] = None
+
+
+class TenantQueueStats(BaseModel):
+    """
+    Waiting jobs of a tenant on one queue
+    """
+
+    queue: str
+    waiting: int
+    active_tenants: int
+    estimated_wait_seconds: float = Field(
+        ..., description="Estimated wait of a job submitted now"
+    )
+
+
+class TenantResponse(BaseModel):
+    """
+    Share of the workers used by a tenant
+    """
+
+    tenant: str
+    concurrency_cap: Optional[int] = None
+    running: int
+    queues: List[TenantQueueStats] = Field(default_factory=list)
@@ -1,5 +1,6 @@
 from rq.decorators import job
-from typing import List, Optional
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
 from schemas.create_answer import (
     CreateAnswer,
     TextStructureResult,
@@ -12,7 +13,12 @@ from schemas.create_answer import (
 
 # Redis
 from redisStore.myconnection import get_redis_con
-from redisStore.queue import add_task_to_queue
+from redisStore.queue import add_task_to_queue, get_queue
+from redisStore.batches import new_batch_id, save_batch
+from redisStore.lanes import queues_for_videos
+from redisStore.reaper import last_sign_of_life
+from redisStore.serializer import get_serializer
+from redisStore.tenants import register_tenant_queue, tenant_queue_name
 
 # Functions
 from tasks.assemblyai_api import detect_audio_sentiment
@@ -31,56 +37,139 @@ from tasks.helpers.av_processing import (
 from tasks.helpers.competency_feedback import generate_competency_feedback
 from utils.logger_config import get_logger
 import time
+import uuid
 from rq.job import Job
+from rq.queue import Queue
 
 
 logger = get_logger(__name__)
 
 
-def start_audio_analysis_job(video_url: str) -> str:
+def start_audio_analysis_job(
+    video_url: str, queue_name: str = "default", tenant: Optional[str] = None
+) -> str:
     """
     Start the audio analysis job
 
     Args:
         video_url: URL or path to the video file
+        queue_name: Queue to start the job on
+        tenant: Tenant submitting the job
 
     Returns:
         str: Job ID
     """
-    job = add_task_to_queue(detect_audio_sentiment, video_url)
+    job = add_task_to_queue(
+        detect_audio_sentiment, video_url, queue_name=queue_name, tenant=tenant
+    )
     logger.info(f"Started audio analysis job: {job.get_id()}")
     return job.get_id()
 
 
-def start_facial_analysis_job(video_url: str) -> str:
+def start_facial_analysis_job(
+    video_url: str, queue_name: str = "default", tenant: Optional[str] = None
+) -> str:
     """
     Start the facial analysis job
 
     Args:
         video_url: URL or path to the video file
+        queue_name: Queue to start the job on
+        tenant: Tenant submitting the job
 
     Returns:
         str: Job ID
     """
-    job = add_task_to_queue(detect_emotions, video_url)
+    job = add_task_to_queue(
+        detect_emotions, video_url, queue_name=queue_name, tenant=tenant
+    )
     logger.info(f"Started facial analysis job: {job.get_id()}")
     return job.get_id()
 
 
+def start_create_answer_batch(
+    video_urls: List[str], tenant: Optional[str] = None
+) -> Tuple[str, List[dict]]:
+    """
+    Start the audio, facial and create_answer jobs of many videos at once
+
+    Every job and the batch record are written in a single Redis transaction,
+    so a batch is either fully enqueued or not at all. Each video's jobs go
+    to the cost lane of that video.
+
+    Args:
+        video_urls: URLs or paths of the video files
+        tenant: Tenant submitting the batch
+
+    Returns:
+        Tuple: The batch ID, and one dict per video with the IDs of its jobs
+    """
+    batch_id = new_batch_id()
+    items = []
+    job_datas: Dict[str, list] = defaultdict(list)
+    # Probing the media can be slow, so every video is probed at once
+    for video_url, lane_queue in zip(video_urls, queues_for_videos(video_urls)):
+        # The create_answer job needs the analysis job IDs up front
+        item = {
+            "video_url": video_url,
+            "audio_job_id": str(uuid.uuid4()),
+            "facial_job_id": str(uuid.uuid4()),
+            "job_id": str(uuid.uuid4()),
+        }
+        queue_name = tenant_queue_name(lane_queue, tenant)
+        job_datas[queue_name].extend(
+            [
+                Queue.prepare_data(
+                    detect_audio_sentiment, (video_url,), job_id=item["audio_job_id"]
+                ),
+                Queue.prepare_data(
+                    detect_emotions, (video_url,), job_id=item["facial_job_id"]
+                ),
+                Queue.prepare_data(
+                    create_answer,
+                    (video_url, item["audio_job_id"], item["facial_job_id"]),
+                    job_id=item["job_id"],
+                ),
+            ]
+        )
+        items.append(item)
+
+    queues = {queue_name: get_queue(queue_name) for queue_name in job_datas}
+    with next(iter(queues.values())).connection.pipeline() as pipe:
+        for queue_name, queue_job_datas in job_datas.items():
+            queues[queue_name].enqueue_many(queue_job_datas, pipeline=pipe)
+            register_tenant_queue(pipe, queue_name)
+        save_batch(pipe, batch_id, items)
+        pipe.execute()
+    logger.info(f"Started create_answer batch {batch_id} with {len(items)} videos")
+    return batch_id, items
+
+
 def await_job_result(job_id, timeout=30):
-    job = Job.fetch(job_id, connection=get_redis_con())
+    """
+    Wait for the result of a job, as long as it shows signs of life.
+
+    The timeout counts from the job's latest heartbeat or enqueue time, so
+    long-running jobs, and jobs requeued after losing their worker, are
+    waited for. Jobs that failed or were canceled raise immediately.
+    """
+    redis_conn = get_redis_con()
+    job = Job.fetch(job_id, connection=redis_conn, serializer=get_serializer())
     start_time = time.time()
 
-    while job.result is None and time.time() - start_time < timeout:
+    while job.result is None:
+        alive_at = max(last_sign_of_life(redis_conn, job) or 0.0, start_time)
+        if time.time() - alive_at >= timeout:
+            break
         time.sleep(0.1)  # Small sleep to avoid hogging CPU
-        job = Job.fetch(job_id, connection=get_redis_con())
+        job = Job.fetch(job_id, connection=redis_conn, serializer=get_serializer())
 
         # Check if job failed
-        if job.is_failed:
+        if job.is_failed or job.is_canceled:
             raise Exception(f"Job failed: {job.exc_info}")
 
     if job.result is None:
-        raise TimeoutError(f"Job didn't complete within {timeout} seconds")
+        raise TimeoutError(f"Job showed no progress for {timeout} seconds")
 
     return job.result
 
@@ -112,8 +201,12 @@ def create_answer(
         facial_job_id = start_facial_analysis_job(video_url)
 
     # Get the job results
-    audio_job = Job.fetch(audio_job_id, connection=get_redis_con())
-    facial_job = Job.fetch(facial_job_id, connection=get_redis_con())
+    audio_job = Job.fetch(
+        audio_job_id, connection=get_redis_con(), serializer=get_serializer()
+    )
+    facial_job = Job.fetch(
+        facial_job_id, connection=get_redis_con(), serializer=get_serializer()
+    )
 
     audio_result = await_job_result(audio_job.id)
     facial_result = await_job_result(facial_job.id)
@@ -10,7 +10,10 @@ from tqdm import tqdm
 import time
 from utils.logger_config import get_logger
 from rq.decorators import job
+from redisStore.checkpoints import Checkpoint
 from redisStore.myconnection import get_redis_con
+from redisStore.metrics import record_facial_frames
+from redisStore.reaper import job_heartbeat
 import nltk
 
 logger = get_logger(__name__)
@@ -64,13 +67,36 @@ def detect_emotions(video_url: str, sample_rate=30) -> EmotionDetectionResult:
         processed_frames = 0
         frame_idx = 0
         total_inference_time = 0.0
+        processing_start = time.time()
 
         # Initialize timeline arrays with zeros for each frame we'll process
         frames_to_process = frame_count // sample_rate + 1
 
+        # Resume from the checkpoint of a previous attempt of this job
+        checkpoint = Checkpoint.for_current_job(
+            list(EmotionTimelines.model_fields),
+            params={"video_url": video_url, "sample_rate": sample_rate},
+        )
+        saved = checkpoint.load() if checkpoint is not None else None
+        if saved is not None:
+            state, timelines = saved
+            frame_idx = state["frame_idx"]
+            processed_frames = state["processed_frames"]
+            total_inference_time = state["total_inference_time"]
+            result.emotion_sums = EmotionTotals(**state["emotion_sums"])
+            result.timeline = EmotionTimelines(**timelines)
+            if not video.set(cv2.CAP_PROP_POS_FRAMES, frame_idx):
+                # Not seekable: decode up to the checkpoint instead
+                for _ in range(frame_idx):
+                    video.grab()
+            logger.info(f"Resuming from frame {frame_idx} of {frame_count}")
+        resumed_frames = processed_frames
+
         # Process the video
         logger.info(f"Processing video with sample rate: {sample_rate}")
-        with tqdm(total=frames_to_process, desc="Processing frames") as pbar:
+        with tqdm(
+            total=frames_to_process, initial=processed_frames, desc="Processing frames"
+        ) as pbar:
             while video.isOpened():
                 ret, frame = video.read()
                 if not ret:
@@ -144,9 +170,23 @@ def detect_emotions(video_url: str, sample_rate=30) -> EmotionDetectionResult:
 
                     processed_frames += 1
                     pbar.update(1)
+                    # Lets the reaper tell a slow video from a stalled job
+                    job_heartbeat(processed_frames / frames_to_process)
 
                 frame_idx += 1
 
+                if checkpoint is not None and frame_idx % sample_rate == 0:
+                    checkpoint.save(
+                        {
+                            "frame_idx": frame_idx,
+                            "processed_frames": processed_frames,
+                            "total_inference_time": total_inference_time,
+                            "emotion_sums": dict(result.emotion_sums),
+                        },
+                        # The timelines themselves, not copies
+                        dict(result.timeline),
+                    )
+
         # Update the result with total processed frames
         result.total_frames = processed_frames
 
@@ -157,6 +197,16 @@ def detect_emotions(video_url: str, sample_rate=30) -> EmotionDetectionResult:
         # Release video capture
         video.release()
 
+        if checkpoint is not None:
+            checkpoint.clear()
+
+        # Feeds the frames/sec metric
+        record_facial_frames(
+            get_redis_con(),
+            processed_frames - resumed_frames,
+            time.time() - processing_start,
+        )
+
         logger.info(f"Video processing completed: {processed_frames} frames processed")
 
     except Exception as e:
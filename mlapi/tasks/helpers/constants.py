@@ -27,3 +27,59 @@ OVERAL_FACIAL_POINTS = {
     "disgust": 0,
     "sad": 3,
 }
+
+# Rhetorical markers used by the rule-based text structure analysis.
+# Overridable through the JSON file named by `STRUCTURE_PHRASES_FILE`.
+TRANSITION_PHRASES = [
+    "first",
+    "second",
+    "third",
+    "finally",
+    "consequently",
+    "in conclusion",
+    "for example",
+    "moreover",
+    "however",
+    "therefore",
+    "in addition",
+    "furthermore",
+    "thus",
+    "meanwhile",
+    "nevertheless",
+    "subsequently",
+]
+
+# Phrases match whole words only, so each word is listed with its inflections
+INTRO_PHRASES = [
+    "introduce",
+    "introduces",
+    "introduced",
+    "introducing",
+    "introduction",
+    "begin",
+    "begins",
+    "began",
+    "begun",
+    "beginning",
+    "start",
+    "starts",
+    "started",
+    "starting",
+    "first",
+    "today",
+    "topic",
+    "topics",
+]
+
+CONCLUSION_PHRASES = [
+    "conclude",
+    "concludes",
+    "concluded",
+    "concluding",
+    "conclusion",
+    "conclusions",
+    "summary",
+    "finally",
+    "in summary",
+    "to sum up",
+]
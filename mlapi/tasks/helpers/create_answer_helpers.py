@@ -15,6 +15,7 @@ from schemas.create_answer import (
 )
 from tasks.helpers.analyze_text_structure_ml import analyze_text_structure_ml
 from tasks.helpers.text_preprocessing import clean_text
+from tasks.helpers.phrase_matcher import structure_matcher
 from tasks.helpers.av_processing import (
     calculate_overall_audio_sentiment,
     grab_top_five_keywords,
@@ -178,6 +179,31 @@ def score_text_structure(audio_answer: AudioSentimentResult) -> TextStructureRes
     )
 
 
+def _paragraph_spans(text: str) -> List[Tuple[int, int]]:
+    """
+    Find the character spans of the non-empty paragraphs in the text.
+
+    Args:
+        text: The text to split
+
+    Returns:
+        List[Tuple[int, int]]: (start, end) of each stripped paragraph
+    """
+    bounds = [0]
+    for separator in re.finditer(r"\n\s*\n|\r\n\s*\r\n", text):
+        bounds.extend(separator.span())
+    bounds.append(len(text))
+
+    spans = []
+    for start, end in zip(bounds[::2], bounds[1::2]):
+        chunk = text[start:end]
+        stripped = chunk.strip()
+        if stripped:
+            start += chunk.index(stripped)
+            spans.append((start, start + len(stripped)))
+    return spans
+
+
 def _analyze_text_structure(text: str) -> Tuple[float, StructureDetails]:
     """
     Analyzes text structure using rule-based heuristics.
@@ -200,9 +226,9 @@ def _analyze_text_structure(text: str) -> Tuple[float, StructureDetails]:
         sentence_variety=0,
     )
 
-    # Split into paragraphs
-    paragraphs = re.split(r"\n\s*\n|\r\n\s*\r\n", text)
-    paragraphs = [p.strip() for p in paragraphs if p.strip()]
+    # Split into paragraphs, keeping their spans for phrase lookups
+    spans = _paragraph_spans(text)
+    paragraphs = [text[start:end] for start, end in spans]
     metrics.paragraph_count = len(paragraphs)
 
     # Calculate average paragraph length
@@ -218,48 +244,22 @@ def _analyze_text_structure(text: str) -> Tuple[float, StructureDetails]:
             else 0
         )
 
-    # Check for transition words/phrases
-    transition_words = [
-        "first",
-        "second",
-        "third",
-        "finally",
-        "consequently",
-        "in conclusion",
-        "for example",
-        "moreover",
-        "however",
-        "therefore",
-        "in addition",
-        "furthermore",
-        "thus",
-        "meanwhile",
-        "nevertheless",
-        "subsequently",
-    ]
-    lower_text = text.lower()
-    for word in transition_words:
-        if word in lower_text:
-            metrics.transition_words += 1
-
-    # Check for introduction and conclusion
-    intro_patterns = ["introduce", "begin", "start", "first", "today", "topic"]
-    conclusion_patterns = [
-        "conclude",
-        "conclusion",
-        "summary",
-        "finally",
-        "in summary",
-        "to sum up",
-    ]
+    # Find transition words and intro/conclusion phrases in a single pass
+    matches = structure_matcher.scan(text)
+    metrics.transition_words = len(structure_matcher.counts(matches, "transition"))
 
     # Check first and last paragraphs
-    first_para = paragraphs[0].lower() if paragraphs else ""
-    last_para = paragraphs[-1].lower() if paragraphs else ""
-    metrics.has_intro = any(pattern in first_para for pattern in intro_patterns)
-    metrics.has_conclusion = any(
-        pattern in last_para for pattern in conclusion_patterns
-    )
+    if spans:
+        first_start, first_end = spans[0]
+        last_start, last_end = spans[-1]
+        metrics.has_intro = any(
+            m.category == "intro" and first_start <= m.start and m.end <= first_end
+            for m in matches
+        )
+        metrics.has_conclusion = any(
+            m.category == "conclusion" and last_start <= m.start and m.end <= last_end
+            for m in matches
+        )
 
     # Calculate overall structure score (weighted components)
     score = 0
@@ -0,0 +1,151 @@
+"""
+Single-pass multi-phrase matcher used by the text structure analysis.
+
+All phrases of every category are compiled into one alternation regex with
+word boundaries, so a text is scanned once no matter how many rhetorical
+markers are configured.
+"""
+
+import json
+import os
+import re
+from collections import Counter
+from typing import Dict, Iterable, List, Mapping, NamedTuple, Optional, Tuple
+
+from tasks.helpers.constants import (
+    TRANSITION_PHRASES,
+    INTRO_PHRASES,
+    CONCLUSION_PHRASES,
+)
+from utils.logger_config import get_logger
+
+logger = get_logger(__name__)
+
+STRUCTURE_PHRASES_FILE = os.getenv("STRUCTURE_PHRASES_FILE")
+
+
+class PhraseMatch(NamedTuple):
+    """A phrase found in the text, with its category and character span"""
+
+    phrase: str
+    category: str
+    start: int
+    end: int
+
+
+def _normalize_phrase(phrase: str) -> str:
+    return " ".join(phrase.lower().split())
+
+
+class PhraseMatcher:
+    """
+    Finds every configured phrase in a text in one linear pass.
+    """
+
+    def __init__(self, phrases: Mapping[str, Iterable[str]]):
+        """
+        Compile the matcher.
+
+        Args:
+            phrases: Mapping of category name to the phrases of that category
+        """
+        self.categories: Dict[str, List[str]] = {}
+        owners: Dict[str, List[str]] = {}
+        for category, category_phrases in phrases.items():
+            normalized = []
+            for phrase in category_phrases:
+                phrase = _normalize_phrase(phrase)
+                if phrase and phrase not in normalized:
+                    normalized.append(phrase)
+                    owners.setdefault(phrase, []).append(category)
+            self.categories[category] = normalized
+
+        # A longer phrase hides the phrases it contains ("in conclusion"
+        # hides "conclusion"), so each phrase also credits its sub-phrases.
+        self._hits: Dict[str, List[Tuple[str, str]]] = {}
+        for phrase in owners:
+            hits: List[Tuple[str, str]] = []
+            for other, other_categories in owners.items():
+                if re.search(rf"\b{re.escape(other)}\b", phrase):
+                    hits.extend((other, category) for category in other_categories)
+            self._hits[phrase] = hits
+
+        # Longest first so the alternation prefers the longest phrase
+        alternatives = [
+            r"\s+".join(re.escape(word) for word in phrase.split())
+            for phrase in sorted(owners, key=len, reverse=True)
+        ]
+        self._pattern: Optional[re.Pattern] = (
+            re.compile(rf"\b(?:{'|'.join(alternatives)})\b", re.IGNORECASE)
+            if alternatives
+            else None
+        )
+
+    def scan(self, text: str) -> List[PhraseMatch]:
+        """
+        Find all phrase occurrences in the text.
+
+        Args:
+            text: The text to scan
+
+        Returns:
+            List[PhraseMatch]: Matches in order of position
+        """
+        if self._pattern is None or not text:
+            return []
+
+        matches = []
+        for found in self._pattern.finditer(text):
+            phrase = _normalize_phrase(found.group(0))
+            for hit, category in self._hits[phrase]:
+                matches.append(PhraseMatch(hit, category, found.start(), found.end()))
+        return matches
+
+    @staticmethod
+    def counts(matches: Iterable[PhraseMatch], category: str) -> Dict[str, int]:
+        """
+        Count occurrences per phrase for a single category.
+
+        Args:
+            matches: Result of `scan`
+            category: Category to count
+
+        Returns:
+            Dict[str, int]: Number of occurrences of each matched phrase
+        """
+        return dict(Counter(m.phrase for m in matches if m.category == category))
+
+
+def load_structure_phrases(path: Optional[str] = None) -> Dict[str, List[str]]:
+    """
+    Load the structure phrase lists, applying overrides from a JSON file.
+
+    The file may contain any of the keys "transition", "intro" and
+    "conclusion", each mapping to a list of phrases.
+
+    Args:
+        path: Path to the JSON overrides (default: `STRUCTURE_PHRASES_FILE`)
+
+    Returns:
+        Dict[str, List[str]]: Phrases per category
+    """
+    phrases = {
+        "transition": list(TRANSITION_PHRASES),
+        "intro": list(INTRO_PHRASES),
+        "conclusion": list(CONCLUSION_PHRASES),
+    }
+    path = path or STRUCTURE_PHRASES_FILE
+    if path:
+        try:
+            with open(path) as f:
+                overrides = json.load(f)
+            for category in phrases:
+                if category in overrides:
+                    phrases[category] = list(overrides[category])
+        except Exception as e:
+            logger.error(f"Could not load structure phrases from {path}: {str(e)}")
+    return phrases
+
+
+# Create a singleton instance
+structure_matcher = PhraseMatcher(load_structure_phrases())
@@ -0,0 +1,193 @@
+"""
+Two-tier cache of STAR sentence labels.
+
+Practice answers are resubmitted many times and sentences recur word for word,
+so labels are cached by normalized sentence text and model version: first in a
+per-process LRU, then in Redis with a TTL so every worker shares them. Hit and
+inference counters are kept in Redis so the API can report them.
+"""
+
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+from redisStore.myconnection import get_redis_con
+from utils.logger_config import get_logger
+
+logger = get_logger(__name__)
+
+STAR_CACHE_ENABLED = os.getenv("STAR_CACHE_ENABLED", "true").lower() in (
+    "1",
+    "true",
+    "yes",
+)
+STAR_CACHE_SIZE = int(os.getenv("STAR_CACHE_SIZE", 10000))
+STAR_CACHE_TTL = int(os.getenv("STAR_CACHE_TTL", 7 * 24 * 60 * 60))
+
+CACHE_KEY_PREFIX = "star:label"
+STATS_KEY = "star:cache:stats"
+
+
+def normalize_sentence(sentence: str) -> str:
+    """
+    Normalize a sentence so trivially different copies share a cache entry.
+    """
+    return " ".join(sentence.lower().split())
+
+
+class StarLabelCache:
+    """
+    In-process LRU in front of a shared Redis tier.
+
+    The LRU only pays off in a process that outlives its lookups: the API
+    classifying answers inline, or a SimpleWorker. RQ's default worker runs
+    each job in a forked work horse, so entries added there are lost when
+    the job ends and queued jobs are served by the Redis tier; `local_hits`
+    stays near zero for them.
+    """
+
+    def __init__(self, max_size: int = STAR_CACHE_SIZE, ttl: int = STAR_CACHE_TTL):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._local: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._redis = None
+
+    def _get_redis(self):
+        if self._redis is None:
+            self._redis = get_redis_con()
+        return self._redis
+
+    @staticmethod
+    def key(sentence: str, model_version: str) -> str:
+        digest = hashlib.sha1(normalize_sentence(sentence).encode("utf-8")).hexdigest()
+        return f"{CACHE_KEY_PREFIX}:{model_version}:{digest}"
+
+    def _remember(self, key: str, label: str):
+        with self._lock:
+            self._local[key] = label
+            self._local.move_to_end(key)
+            while len(self._local) > self.max_size:
+                self._local.popitem(last=False)
+
+    def get_many(self, sentences: List[str], model_version: str) -> List[Optional[str]]:
+        """
+        Look up cached labels.
+
+        Args:
+            sentences: Sentences to look up
+            model_version: Model name and revision the labels belong to
+
+        Returns:
+            List[Optional[str]]: Cached label per sentence, None on a miss
+        """
+        keys = [self.key(sentence, model_version) for sentence in sentences]
+        labels: List[Optional[str]] = [None] * len(keys)
+        local_hits = 0
+
+        with self._lock:
+            for i, key in enumerate(keys):
+                label = self._local.get(key)
+                if label is not None:
+                    self._local.move_to_end(key)
+                    labels[i] = label
+                    local_hits += 1
+
+        missing = [i for i, label in enumerate(labels) if label is None]
+        redis_hits = 0
+        try:
+            redis_conn = self._get_redis()
+            if missing:
+                for i, value in zip(
+                    missing, redis_conn.mget([keys[i] for i in missing])
+                ):
+                    if value is not None:
+                        label = value.decode("utf-8")
+                        labels[i] = label
+                        self._remember(keys[i], label)
+                        redis_hits += 1
+
+            pipe = redis_conn.pipeline(transaction=False)
+            pipe.hincrby(STATS_KEY, "local_hits", local_hits)
+            pipe.hincrby(STATS_KEY, "redis_hits", redis_hits)
+            pipe.hincrby(STATS_KEY, "misses", len(missing) - redis_hits)
+            pipe.execute()
+        except Exception as e:
+            logger.warning(f"STAR label cache unavailable: {str(e)}")
+
+        return labels
+
+    def set_many(
+        self,
+        labels: Dict[str, str],
+        model_version: str,
+        inference_seconds: float = 0.0,
+    ):
+        """
+        Store freshly computed labels in both tiers.
+
+        Args:
+            labels: Mapping of sentence to label
+            model_version: Model name and revision the labels belong to
+            inference_seconds: Time spent computing these labels
+        """
+        keys = {
+            self.key(sentence, model_version): label
+            for sentence, label in labels.items()
+        }
+        for key, label in keys.items():
+            self._remember(key, label)
+
+        try:
+            pipe = self._get_redis().pipeline(transaction=False)
+            for key, label in keys.items():
+                pipe.set(key, label, ex=self.ttl)
+            pipe.hincrby(STATS_KEY, "inferred", len(keys))
+            pipe.hincrbyfloat(STATS_KEY, "inference_seconds", inference_seconds)
+            pipe.execute()
+        except Exception as e:
+            logger.warning(f"STAR label cache unavailable: {str(e)}")
+
+    def clear_local(self):
+        with self._lock:
+            self._local.clear()
+
+
+def get_star_cache_stats(redis_conn=None) -> Dict[str, float]:
+    """
+    Hit rates and estimated inference time saved by the STAR label cache.
+
+    Args:
+        redis_conn: Redis connection (default: a new connection)
+
+    Returns:
+        dict: Counters, hit rate and saved inference seconds
+    """
+    redis_conn = redis_conn or get_redis_con()
+    raw = redis_conn.hgetall(STATS_KEY)
+    counters = {k.decode("utf-8"): float(v) for k, v in raw.items()}
+
+    local_hits = counters.get("local_hits", 0.0)
+    redis_hits = counters.get("redis_hits", 0.0)
+    misses = counters.get("misses", 0.0)
+    inferred = counters.get("inferred", 0.0)
+    inference_seconds = counters.get("inference_seconds", 0.0)
+
+    hits = local_hits + redis_hits
+    lookups = hits + misses
+    avg_inference = inference_seconds / inferred if inferred else 0.0
+    return {
+        "local_hits": int(local_hits),
+        "redis_hits": int(redis_hits),
+        "misses": int(misses),
+        "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+        "inferred_sentences": int(inferred),
+        "avg_inference_seconds": avg_inference,
+        "saved_inference_seconds": round(hits * avg_inference, 3),
+    }
+
+
+# Create a singleton instance
+star_label_cache = StarLabelCache()
@@ -0,0 +1,364 @@
+"""
+Process-wide registry of STAR sentence classifiers.
+
+Loading the tokenizer and BERT weights is by far the most expensive part of a
+STAR request, so each model is loaded once per process and kept warm. RQ
+workers fork a work horse per job, so the worker warms the model up in the
+parent process before it starts listening; every job then inherits the loaded
+weights instead of reading them from disk again.
+"""
+
+import os
+import resource
+import threading
+import time
+from concurrent.futures import Future
+from queue import Empty, Queue
+from typing import Any, Dict, List, Optional, Tuple
+
+from tasks.helpers.star_cache import STAR_CACHE_ENABLED, star_label_cache
+from utils.logger_config import get_logger
+
+logger = get_logger(__name__)
+
+STAR_MODEL_NAME = os.getenv("STAR_MODEL_NAME", "dnttestmee/starclass_bert")
+
+# Model revision, part of the label cache key so retrained models miss
+STAR_MODEL_REVISION = os.getenv("STAR_MODEL_REVISION", "main")
+
+# Inference backend: "pytorch" (transformers pipeline) or "onnx" (exported,
+# dynamically quantized copy, see `tasks.helpers.star_onnx`)
+STAR_BACKEND = os.getenv("STAR_BACKEND", "pytorch").lower()
+STAR_ONNX_PATH = os.getenv("STAR_ONNX_PATH", "data/star_onnx")
+
+# Sentences per forward pass
+STAR_BATCH_SIZE = int(os.getenv("STAR_BATCH_SIZE", 16))
+
+# How long to wait for sentences from other concurrent jobs before running a
+# batch. 0 disables cross-job micro-batching.
+STAR_MICROBATCH_WAIT_MS = float(os.getenv("STAR_MICROBATCH_WAIT_MS", 0))
+
+STAR_LABELS = {
+    "LABEL_0": "Action",
+    "LABEL_1": "Result",
+    "LABEL_2": "Situation",
+    "LABEL_3": "Task",
+}
+
+
+def _rss_bytes() -> int:
+    """
+    Current resident set size of this process in bytes.
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        # Peak RSS is the best we can do without procfs (KB on Linux)
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class StarClassifier:
+    """
+    Lazily loaded text-classification pipeline for STAR labels.
+    """
+
+    def __init__(self, model_name: str = STAR_MODEL_NAME, backend: str = STAR_BACKEND):
+        """
+        Create the classifier. The model is not loaded until first use.
+
+        Args:
+            model_name: Hugging Face model to load
+            backend: "pytorch" or "onnx"
+        """
+        if backend not in ("pytorch", "onnx"):
+            raise ValueError(f"Unknown STAR backend: {backend}")
+        self.model_name = model_name
+        self.backend = backend
+        self.load_time_seconds: Optional[float] = None
+        self.memory_bytes: Optional[int] = None
+        self._pipeline: Any = None
+        self._lock = threading.Lock()
+
+    @property
+    def is_loaded(self) -> bool:
+        return self._pipeline is not None
+
+    def _load(self) -> Any:
+        """
+        Load the pipeline once, recording load time and memory growth.
+        """
+        with self._lock:
+            if self._pipeline is None:
+                logger.info(
+                    f"Loading STAR classifier: {self.model_name} ({self.backend})"
+                )
+                rss_before = _rss_bytes()
+                start_time = time.perf_counter()
+                if self.backend == "onnx":
+                    from tasks.helpers.star_onnx import OnnxStarModel
+
+                    self._pipeline = OnnxStarModel(STAR_ONNX_PATH)
+                else:
+                    from transformers.pipelines import pipeline
+
+                    self._pipeline = pipeline(
+                        "text-classification",
+                        model=self.model_name,
+                        revision=STAR_MODEL_REVISION,
+                    )  # type: ignore
+                self.load_time_seconds = time.perf_counter() - start_time
+                self.memory_bytes = max(_rss_bytes() - rss_before, 0)
+                logger.info(
+                    f"Loaded STAR classifier {self.model_name} in "
+                    f"{self.load_time_seconds:.2f}s "
+                    f"({self.memory_bytes / 1024 / 1024:.1f} MiB)"
+                )
+        return self._pipeline
+
+    def warmup(self) -> "StarClassifier":
+        """
+        Load the model and run one inference so the first request is fast.
+        """
+        self.classify("Warming up the STAR classifier")
+        return self
+
+    def classify(self, sentence: str) -> str:
+        """
+        Predict the STAR label of a single sentence.
+
+        Args:
+            sentence: The sentence to classify
+
+        Returns:
+            str: One of "Action", "Result", "Situation" or "Task"
+        """
+        return self.classify_batch([sentence])[0]
+
+    def classify_batch(
+        self, sentences: List[str], batch_size: int = STAR_BATCH_SIZE
+    ) -> List[str]:
+        """
+        Predict the STAR labels of many sentences with batched inference.
+
+        Sentences are sorted by length before batching so that dynamic
+        padding adds as few tokens as possible; labels are returned in the
+        original order.
+
+        Args:
+            sentences: The sentences to classify
+            batch_size: Number of sentences per forward pass
+
+        Returns:
+            List[str]: One label per sentence, in input order
+        """
+        if not sentences:
+            return []
+
+        order = sorted(range(len(sentences)), key=lambda i: len(sentences[i]))
+        model_output: Any = self._load()(
+            [sentences[i] for i in order], batch_size=max(batch_size, 1)
+        )
+
+        labels: List[str] = [""] * len(sentences)
+        for i, output in zip(order, model_output):
+            # Single Label output, possibly wrapped in a list
+            if isinstance(output, list):
+                output = output[0]
+            labels[i] = STAR_LABELS[str(output["label"])]
+        return labels
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Load statistics for monitoring.
+        """
+        return {
+            "model_name": self.model_name,
+            "backend": self.backend,
+            "loaded": self.is_loaded,
+            "load_time_seconds": self.load_time_seconds,
+            "memory_bytes": self.memory_bytes,
+        }
+
+
+class StarMicroBatcher:
+    """
+    Combines sentences from concurrent callers into shared forward passes.
+
+    Callers block in `classify` while a single background thread collects
+    pending requests for up to `max_wait_ms` (or until a full batch is
+    queued), runs one batched inference and hands each caller its labels.
+    """
+
+    def __init__(
+        self,
+        classifier: StarClassifier,
+        max_wait_ms: float = STAR_MICROBATCH_WAIT_MS,
+        batch_size: int = STAR_BATCH_SIZE,
+    ):
+        self.classifier = classifier
+        self.max_wait = max_wait_ms / 1000
+        self.batch_size = max(batch_size, 1)
+        self._pending: "Queue[Tuple[List[str], Future]]" = Queue()
+        self._thread = threading.Thread(
+            target=self._run, name="star-microbatcher", daemon=True
+        )
+        self._thread.start()
+
+    def classify(self, sentences: List[str]) -> List[str]:
+        """
+        Classify sentences, sharing the forward pass with concurrent callers.
+
+        Args:
+            sentences: The sentences to classify
+
+        Returns:
+            List[str]: One label per sentence, in input order
+        """
+        if not sentences:
+            return []
+        future: Future = Future()
+        self._pending.put((sentences, future))
+        return future.result()
+
+    def _collect(self) -> List[Tuple[List[str], Future]]:
+        """
+        Block for the first request, then gather more until the wait runs out.
+        """
+        requests = [self._pending.get()]
+        queued = len(requests[0][0])
+        deadline = time.monotonic() + self.max_wait
+        while queued < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                request = self._pending.get(timeout=remaining)
+            except Empty:
+                break
+            requests.append(request)
+            queued += len(request[0])
+        return requests
+
+    def _run(self):
+        while True:
+            requests = self._collect()
+            sentences = [
+                sentence
+                for request_sentences, _ in requests
+                for sentence in request_sentences
+            ]
+            try:
+                labels = self.classifier.classify_batch(sentences, self.batch_size)
+            except Exception as e:
+                for _, future in requests:
+                    future.set_exception(e)
+                continue
+
+            offset = 0
+            for request_sentences, future in requests:
+                future.set_result(labels[offset : offset + len(request_sentences)])
+                offset += len(request_sentences)
+
+
+_registry: Dict[str, StarClassifier] = {}
+_batchers: Dict[str, StarMicroBatcher] = {}
+_registry_lock = threading.Lock()
+
+# Batcher threads do not survive a fork; forked work horses start their own
+os.register_at_fork(after_in_child=_batchers.clear)
+
+
+def get_star_classifier(model_name: str = STAR_MODEL_NAME) -> StarClassifier:
+    """
+    Get the process-wide classifier for the given model.
+
+    Args:
+        model_name: Hugging Face model to load
+
+    Returns:
+        StarClassifier: Shared (lazily loaded) classifier instance
+    """
+    classifier = _registry.get(model_name)
+    if classifier is None:
+        with _registry_lock:
+            classifier = _registry.setdefault(model_name, StarClassifier(model_name))
+    return classifier
+
+
+def _infer(sentences: List[str], model_name: str) -> List[str]:
+    """
+    Run sentences through the model, micro-batching across concurrent jobs
+    when `STAR_MICROBATCH_WAIT_MS` is set.
+    """
+    if STAR_MICROBATCH_WAIT_MS <= 0:
+        return get_star_classifier(model_name).classify_batch(sentences)
+
+    batcher = _batchers.get(model_name)
+    if batcher is None:
+        classifier = get_star_classifier(model_name)
+        with _registry_lock:
+            batcher = _batchers.get(model_name)
+            if batcher is None:
+                batcher = _batchers[model_name] = StarMicroBatcher(classifier)
+    return batcher.classify(sentences)
+
+
+def classify_sentences(
+    sentences: List[str], model_name: str = STAR_MODEL_NAME
+) -> List[str]:
+    """
+    Classify the sentences of a response in batches.
+
+    Labels are looked up in the STAR label cache first so only unseen
+    sentences reach the model.
+
+    Args:
+        sentences: The sentences to classify
+        model_name: Hugging Face model to use
+
+    Returns:
+        List[str]: One label per sentence, in input order
+    """
+    if not STAR_CACHE_ENABLED:
+        return _infer(sentences, model_name)
+
+    # Quantized labels can differ slightly, so backends do not share entries
+    model_version = f"{model_name}@{STAR_MODEL_REVISION}:{STAR_BACKEND}"
+    labels = star_label_cache.get_many(sentences, model_version)
+
+    # Each distinct unseen sentence goes through the model once
+    missing = list(
+        dict.fromkeys(s for s, label in zip(sentences, labels) if label is None)
+    )
+    computed: Dict[str, str] = {}
+    if missing:
+        start_time = time.perf_counter()
+        computed = dict(zip(missing, _infer(missing, model_name)))
+        star_label_cache.set_many(
+            computed, model_version, time.perf_counter() - start_time
+        )
+    return [
+        label if label is not None else computed[sentence]
+        for sentence, label in zip(sentences, labels)
+    ]
+
+
+def warmup_star_classifier(model_name: str = STAR_MODEL_NAME) -> Dict[str, Any]:
+    """
+    Eagerly load the classifier, e.g. at worker start.
+
+    Args:
+        model_name: Hugging Face model to load
+
+    Returns:
+        dict: Load statistics of the warmed up classifier
+    """
+    return get_star_classifier(model_name).warmup().stats()
+
+
+def star_classifier_stats() -> Dict[str, Dict[str, Any]]:
+    """
+    Load statistics of every classifier created in this process.
+    """
+    return {name: classifier.stats() for name, classifier in _registry.items()}
@@ -0,0 +1,255 @@
+"""
+ONNX Runtime backend for the STAR sentence classifier.
+
+The PyTorch pipeline runs `starclass_bert` in full precision, which is slow and
+memory-heavy on CPU-only workers. This module exports the same model to ONNX,
+applies dynamic int8 quantization, and serves it with ONNX Runtime. Select it
+with `STAR_BACKEND=onnx`.
+
+Requires the optional `onnxruntime` and `onnx` packages.
+
+Usage:
+    python -m tasks.helpers.star_onnx export [--output DIR] [--no-quantize]
+    python -m tasks.helpers.star_onnx parity [--corpus FILE]
+    python -m tasks.helpers.star_onnx benchmark [--corpus FILE] [--repeats N]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import time
+from typing import Any, Dict, List
+
+from tasks.helpers.star_classifier import (
+    STAR_BATCH_SIZE,
+    STAR_MODEL_NAME,
+    STAR_MODEL_REVISION,
+    STAR_ONNX_PATH,
+    StarClassifier,
+)
+from utils.logger_config import get_logger
+
+logger = get_logger(__name__)
+
+FP32_MODEL_FILE = "model.onnx"
+QUANTIZED_MODEL_FILE = "model.quant.onnx"
+DEFAULT_CORPUS = os.path.join(
+    os.path.dirname(__file__), "..", "..", "tests", "star_parity_corpus.json"
+)
+
+
+def export_star_model(
+    output_dir: str = STAR_ONNX_PATH,
+    model_name: str = STAR_MODEL_NAME,
+    quantize: bool = True,
+) -> str:
+    """
+    Export the STAR classifier to ONNX, optionally with dynamic quantization.
+
+    The tokenizer and model config are saved next to the graph so the
+    directory is self-contained.
+
+    Args:
+        output_dir: Directory to write the model to
+        model_name: Hugging Face model to export
+        quantize: Also write a dynamically quantized (int8 weights) copy
+
+    Returns:
+        str: Path of the model the ONNX backend will load
+    """
+    import torch
+    from transformers import AutoModelForSequenceClassification, AutoTokenizer
+
+    os.makedirs(output_dir, exist_ok=True)
+    tokenizer = AutoTokenizer.from_pretrained(model_name, revision=STAR_MODEL_REVISION)
+    model = AutoModelForSequenceClassification.from_pretrained(
+        model_name, revision=STAR_MODEL_REVISION
+    )
+    model.eval()
+    tokenizer.save_pretrained(output_dir)
+    model.config.save_pretrained(output_dir)
+
+    sample = tokenizer(["I was asked to lead the migration."], return_tensors="pt")
+    input_names = list(sample.keys())
+    fp32_path = os.path.join(output_dir, FP32_MODEL_FILE)
+    with torch.no_grad():
+        torch.onnx.export(
+            model,
+            tuple(sample[name] for name in input_names),
+            fp32_path,
+            input_names=input_names,
+            output_names=["logits"],
+            dynamic_axes={
+                **{name: {0: "batch", 1: "sequence"} for name in input_names},
+                "logits": {0: "batch"},
+            },
+            opset_version=17,
+            dynamo=False,
+        )
+    logger.info(f"Exported {model_name} to {fp32_path}")
+
+    if not quantize:
+        return fp32_path
+
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    quantized_path = os.path.join(output_dir, QUANTIZED_MODEL_FILE)
+    quantize_dynamic(fp32_path, quantized_path, weight_type=QuantType.QInt8)
+    logger.info(f"Quantized {model_name} to {quantized_path}")
+    return quantized_path
+
+
+class OnnxStarModel:
+    """
+    Drop-in replacement for the text-classification pipeline.
+
+    Called with a list of sentences, it returns one `{"label": ...}` dict per
+    sentence, tokenizing each batch with dynamic padding.
+    """
+
+    def __init__(self, model_dir: str = STAR_ONNX_PATH):
+        """
+        Load an exported model, preferring the quantized graph.
+
+        Args:
+            model_dir: Directory written by `export_star_model`
+        """
+        import onnxruntime as ort
+        from transformers import AutoConfig, AutoTokenizer
+
+        model_path = os.path.join(model_dir, QUANTIZED_MODEL_FILE)
+        if not os.path.exists(model_path):
+            model_path = os.path.join(model_dir, FP32_MODEL_FILE)
+        if not os.path.exists(model_path):
+            raise FileNotFoundError(
+                f"No ONNX STAR model in {model_dir}; "
+                "run `python -m tasks.helpers.star_onnx export` first"
+            )
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.model_path = model_path
+        self.session = ort.InferenceSession(
+            model_path, options, providers=["CPUExecutionProvider"]
+        )
+        self.input_names = {node.name for node in self.session.get_inputs()}
+        self.tokenizer = AutoTokenizer.from_pretrained(model_dir)
+        self.id2label = AutoConfig.from_pretrained(model_dir).id2label
+
+    def __call__(
+        self, sentences: List[str], batch_size: int = STAR_BATCH_SIZE, **kwargs
+    ) -> List[Dict[str, Any]]:
+        if isinstance(sentences, str):
+            sentences = [sentences]
+
+        outputs = []
+        for start in range(0, len(sentences), max(batch_size, 1)):
+            batch = sentences[start : start + batch_size]
+            encoded = self.tokenizer(
+                batch, padding=True, truncation=True, return_tensors="np"
+            )
+            feeds = {
+                name: values.astype("int64")
+                for name, values in encoded.items()
+                if name in self.input_names
+            }
+            logits = self.session.run(["logits"], feeds)[0]
+            for label_id in logits.argmax(axis=-1):
+                outputs.append({"label": self.id2label[int(label_id)]})
+        return outputs
+
+
+def load_corpus(path: str = DEFAULT_CORPUS) -> List[str]:
+    """
+    Load the fixture sentences used for parity checks and benchmarks.
+    """
+    with open(path) as f:
+        return json.load(f)["sentences"]
+
+
+def compare_backends(
+    reference: StarClassifier, candidate: StarClassifier, sentences: List[str]
+) -> Dict[str, Any]:
+    """
+    Compare the labels of two classifiers on the same sentences.
+
+    Args:
+        reference: Classifier whose labels are treated as correct
+        candidate: Classifier under test
+        sentences: Sentences to classify
+
+    Returns:
+        dict: Agreement ratio and the sentences whose labels differ
+    """
+    expected = reference.classify_batch(sentences)
+    actual = candidate.classify_batch(sentences)
+    mismatches = [
+        {"sentence": sentence, "reference": want, "candidate": got}
+        for sentence, want, got in zip(sentences, expected, actual)
+        if want != got
+    ]
+    return {
+        "sentences": len(sentences),
+        "agreement": 1 - len(mismatches) / len(sentences) if sentences else 1.0,
+        "mismatches": mismatches,
+    }
+
+
+def benchmark_backend(
+    classifier: StarClassifier, sentences: List[str], repeats: int = 5
+) -> Dict[str, Any]:
+    """
+    Measure load time, memory and batch latency of a classifier.
+
+    Args:
+        classifier: Classifier to measure (loaded on first use)
+        sentences: Sentences classified in each repeat
+        repeats: Number of timed runs after a warmup run
+
+    Returns:
+        dict: Load statistics plus median/p95 latency and throughput
+    """
+    classifier.classify_batch(sentences)
+    timings = []
+    for _ in range(repeats):
+        start_time = time.perf_counter()
+        classifier.classify_batch(sentences)
+        timings.append(time.perf_counter() - start_time)
+
+    timings.sort()
+    median = statistics.median(timings)
+    return {
+        **classifier.stats(),
+        "sentences": len(sentences),
+        "median_seconds": round(median, 4),
+        "p95_seconds": round(
+            timings[min(len(timings) - 1, int(len(timings) * 0.95))], 4
+        ),
+        "sentences_per_second": round(len(sentences) / median, 1) if median else None,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("command", choices=["export", "parity", "benchmark"])
+    parser.add_argument("--output", default=STAR_ONNX_PATH)
+    parser.add_argument("--no-quantize", action="store_true")
+    parser.add_argument("--corpus", default=DEFAULT_CORPUS)
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    if args.command == "export":
+        print(export_star_model(args.output, quantize=not args.no_quantize))
+    else:
+        corpus = load_corpus(args.corpus)
+        pytorch = StarClassifier(STAR_MODEL_NAME, backend="pytorch")
+        onnx = StarClassifier(STAR_MODEL_NAME, backend="onnx")
+        if args.command == "parity":
+            report = compare_backends(pytorch, onnx, corpus)
+        else:
+            report = {
+                "pytorch": benchmark_backend(pytorch, corpus, args.repeats),
+                "onnx": benchmark_backend(onnx, corpus, args.repeats),
+            }
+        print(json.dumps(report, indent=2))
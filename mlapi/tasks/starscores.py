@@ -1,5 +1,7 @@
-from transformers.pipelines import pipeline
+import json
 from typing import Any, TypedDict
+from redisStore.myconnection import get_redis_con
+from tasks.helpers.star_classifier import STAR_BATCH_SIZE, classify_sentences
 
 
 # Percentage of the total response that is Action, Result, Situation, Task
@@ -29,36 +31,29 @@ def predict_star_scores(*args) -> dict[str, Any]:
     str: The predicted star label
     """
 
-    def predict(sentence) -> str:
-        """
-        Predicts the star label
-        Parameters:
-        sentence (str): The single sentence to be predicted
-        Returns:
-        str: The predicted star label
-        """
-        labels = {
-            "LABEL_0": "Action",
-            "LABEL_1": "Result",
-            "LABEL_2": "Situation",
-            "LABEL_3": "Task",
-        }
-        classifier = pipeline("text-classification", model="dnttestmee/starclass_bert")  # type: ignore
-        model_output: Any = classifier(sentence)
-        # Single Label output.
-        result: str = labels[str(model_output[0]["label"])]
-        return result
-
     # Get the text from the data.
     data = args[0]["text"]
     # Split the text into sentences.
-    sentences: list = data.split(".")
-    classifications: list[list[str]] = []
-    # Classify each sentence
-    for sentence in sentences:
-        if sentence == "":
-            continue
-        classifications.append([sentence, (predict(sentence))])
+    sentences = _split_sentences(data)
+    # Classify all sentences together in batches
+    labels = classify_sentences(sentences)
+    classifications: list[list[str]] = [
+        [sentence, label] for sentence, label in zip(sentences, labels)
+    ]
+    return _score_classifications(classifications)
+
+
+def _split_sentences(text: str) -> list[str]:
+    """
+    Split a response into the sentences that get classified.
+    """
+    return [sentence for sentence in text.split(".") if sentence != ""]
+
+
+def _score_classifications(classifications: list[list[str]]) -> dict[str, Any]:
+    """
+    Compute the STAR percentages of classified sentences.
+    """
     # Figure out what percentage of the total text is Action, Result, Situation, Task
     action = 0
     result = 0
@@ -144,3 +139,60 @@ def percentageFeedback(percentages):
         )
 
     return feedback
+
+
+def stream_star_scores(data: dict, channel: str) -> dict[str, Any]:
+    """
+    Predict STAR scores, publishing each sentence's classification as soon as
+    it is available.
+
+    Events are published as JSON on the Redis channel `channel`:
+    one "classification" event per sentence in order, then a "result" event
+    with `fufilledStar`, `percentages` and `percentageFeedback`, or an
+    "error" event if the analysis fails.
+
+    Args:
+        data: {"text": The response to analyze}
+        channel: Redis pub/sub channel to publish to
+
+    Returns:
+        dict: The same result as `predict_star_scores`
+    """
+    redis_conn = get_redis_con()
+
+    def publish(event: str, payload: dict):
+        redis_conn.publish(channel, json.dumps({"event": event, "data": payload}))
+
+    try:
+        sentences = _split_sentences(data["text"])
+        classifications: list[list[str]] = []
+        # The first sentence goes alone so the client sees it right away
+        chunks = [sentences[:1]] + [
+            sentences[i : i + STAR_BATCH_SIZE]
+            for i in range(1, len(sentences), STAR_BATCH_SIZE)
+        ]
+        for chunk in chunks:
+            for sentence, label in zip(chunk, classify_sentences(chunk)):
+                publish(
+                    "classification",
+                    {
+                        "index": len(classifications),
+                        "sentence": sentence,
+                        "category": label,
+                    },
+                )
+                classifications.append([sentence, label])
+
+        result = _score_classifications(classifications)
+        publish(
+            "result",
+            {
+                "fufilledStar": result["fufilledStar"],
+                "percentages": result["percentages"],
+                "percentageFeedback": percentageFeedback(result["percentages"]),
+            },
+        )
+        return result
+    except Exception as e:
+        publish("error", {"detail": str(e)})
+        raise
@@ -0,0 +1,155 @@
+import operator
+import fakeredis
+import pytest
+from fastapi.testclient import TestClient
+from rq import Queue
+from unittest.mock import MagicMock, patch
+from main import app
+from redisStore.admission import ADMITTED, AdmissionController, AdmissionDecision
+from redisStore.monitor import get_queue_stats, record_job_duration
+
+client = TestClient(app)
+
+
+@pytest.fixture
+def redis_conn():
+    conn = fakeredis.FakeRedis()
+    with patch("redisStore.admission.get_redis_con", return_value=conn):
+        yield conn
+
+
+def _enqueue(redis_conn, count):
+    queue = Queue("default", connection=redis_conn)
+    for i in range(count):
+        queue.enqueue(operator.add, i, i)
+
+
+def test_backlog_estimate(redis_conn):
+    """Backlog is queued jobs times the moving average run time"""
+    record_job_duration(redis_conn, "default", 10)
+    record_job_duration(redis_conn, "default", 20)
+    _enqueue(redis_conn, 3)
+    stats = get_queue_stats(redis_conn)["default"]
+    assert stats["avg_job_seconds"] == 12.0
+    assert stats["backlog_seconds"] == 36.0
+
+
+def test_rejects_deep_queue(redis_conn):
+    record_job_duration(redis_conn, "default", 10)
+    _enqueue(redis_conn, 4)
+    controller = AdmissionController(max_queue_depth=3, max_backlog_seconds=0)
+    assert controller.admit("client") == AdmissionDecision(False, 20, "queue_depth")
+
+
+def test_rejects_long_backlog(redis_conn):
+    record_job_duration(redis_conn, "default", 60)
+    _enqueue(redis_conn, 2)
+    controller = AdmissionController(max_queue_depth=0, max_backlog_seconds=100)
+    assert controller.admit("client") == AdmissionDecision(False, 20, "backlog")
+
+
+def test_token_bucket_per_client(redis_conn):
+    controller = AdmissionController(
+        max_queue_depth=0, max_backlog_seconds=0, rate=0.5, burst=2
+    )
+    assert controller.admit("a").allowed
+    assert controller.admit("a").allowed
+    rejected = controller.admit("a")
+    assert not rejected.allowed and rejected.retry_after == 2
+    assert controller.admit("b").allowed
+
+
+def test_route_returns_429():
+    decision = AdmissionDecision(False, 30, "backlog")
+    with (
+        patch("utils.dependencies.admission_controller.admit", return_value=decision),
+        patch("routes.create_answer._start_create_answer_jobs") as start,
+    ):
+        response = client.post(
+            "/api/create_answer/", json={"video_url": "https://x/a.mp4"}
+        )
+    assert response.status_code == 429
+    assert response.headers["retry-after"] == "30"
+    start.assert_not_called()
+
+
+def test_star_routes_admitted():
+    decision = AdmissionDecision(False, 30, "rate_limit")
+    with patch("utils.dependencies.admission_controller.admit", return_value=decision):
+        for path in ("/api/star_feedback/analyze", "/api/star_feedback/analyze/stream"):
+            response = client.post(path, json={"text": "I fixed the outage."})
+            assert response.status_code == 429
+
+
+def test_forwarded_header_ignored_unless_configured():
+    """Clients cannot pick a fresh identity by sending their own header"""
+    with patch(
+        "utils.dependencies.admission_controller.admit", return_value=ADMITTED
+    ) as admit:
+        client.post(
+            "/api/star_feedback/analyze",
+            json={"text": "short"},
+            headers={"X-Forwarded-For": "10.1.2.3"},
+        )
+        with patch("utils.dependencies.RATE_LIMIT_CLIENT_HEADER", "X-Forwarded-For"):
+            client.post(
+                "/api/star_feedback/analyze",
+                json={"text": "short"},
+                headers={"X-Forwarded-For": "10.1.2.3, 10.0.0.1"},
+            )
+    assert [call.args[0] for call in admit.call_args_list] == ["testclient", "10.1.2.3"]
+
+
+def test_batch_pays_for_every_video(redis_conn):
+    """A batch takes one token per video, going into debt above the burst"""
+    controller = AdmissionController(
+        max_queue_depth=0, max_backlog_seconds=0, rate=0.5, burst=2
+    )
+    assert controller.admit("a", cost=5).allowed
+    rejected = controller.admit("a")
+    # Three tokens of debt and one to spend: eight seconds at 0.5 per second
+    assert not rejected.allowed and rejected.retry_after == 8
+
+
+def test_batch_route_charges_per_video():
+    with (
+        patch(
+            "utils.dependencies.admission_controller.admit", return_value=ADMITTED
+        ) as admit,
+        patch(
+            "routes.create_answer.start_create_answer_batch",
+            return_value=("batch-1", [{"job_id": "a"}, {"job_id": "b"}]),
+        ),
+    ):
+        response = client.post(
+            "/api/create_answer/batch", json={"video_urls": ["a.mp4", "b.mp4"]}
+        )
+    assert response.status_code == 200
+    admit.assert_called_once_with("testclient", 2)
+
+
+def test_replay_not_admitted_again():
+    """Replays of an accepted submission get its job, uncharged, under load"""
+    idempotency_conn = fakeredis.FakeRedis()
+    job = MagicMock()
+    job.get_id.return_value = "job-1"
+    rejected = AdmissionDecision(False, 30, "rate_limit")
+    with (
+        patch("redisStore.idempotency.get_redis_con", return_value=idempotency_conn),
+        patch("routes.create_answer._start_create_answer_jobs", return_value=job),
+        patch(
+            "utils.dependencies.admission_controller.admit",
+            side_effect=[ADMITTED, rejected],
+        ) as admit,
+    ):
+        first = client.post(
+            "/api/create_answer/", json={"video_url": "https://x/a.mp4"}
+        )
+        idempotency_conn.hset("rq:job:job-1", "status", "queued")
+        replay = client.post(
+            "/api/create_answer/", json={"video_url": "https://x/a.mp4"}
+        )
+
+    assert first.json() == replay.json() == {"job_id": "job-1"}
+    assert replay.headers["idempotent-replayed"] == "true"
+    assert admit.call_count == 1
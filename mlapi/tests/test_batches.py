@@ -0,0 +1,128 @@
+import json
+import fakeredis
+import pytest
+from fastapi.testclient import TestClient
+from unittest.mock import patch
+from main import app
+
+client = TestClient(app)
+
+
+@pytest.fixture(autouse=True)
+def no_model_warmup():
+    """Tests entering the app lifespan must not load the STAR classifier"""
+    with patch("routes.star_feedback.warmup_star_classifier"):
+        yield
+
+
+@pytest.fixture
+def fake_server():
+    """Shared fake Redis server for sync and async clients"""
+    return fakeredis.FakeServer()
+
+
+@pytest.fixture
+def redis_conn(fake_server):
+    redis_conn = fakeredis.FakeRedis(server=fake_server)
+    with (
+        patch("redisStore.queue.get_redis_con", return_value=redis_conn),
+        patch("redisStore.batches.get_redis_con", return_value=redis_conn),
+        patch("redisStore.jobs.get_redis_con", return_value=redis_conn),
+        patch("routes.create_answer.get_redis_con", return_value=redis_conn),
+    ):
+        yield redis_conn
+
+
+def _submit(video_urls):
+    response = client.post("/api/create_answer/batch", json={"video_urls": video_urls})
+    assert response.status_code == 200
+    return response.json()
+
+
+def _set_status(redis_conn, job_id, status):
+    redis_conn.hset(f"rq:job:{job_id}", "status", status)
+
+
+def test_batch_enqueues_all_jobs(redis_conn):
+    """Every video gets its audio, facial and create_answer jobs"""
+    from rq import Queue
+
+    body = _submit(["a.mp4", "b.mp4"])
+
+    assert len(body["job_ids"]) == 2
+    queue = Queue("default", connection=redis_conn)
+    jobs = queue.get_jobs()
+    assert [job.func_name.rsplit(".", 1)[-1] for job in jobs] == [
+        "detect_audio_sentiment",
+        "detect_emotions",
+        "create_answer",
+    ] * 2
+    assert jobs[2].id == body["job_ids"][0]
+    assert jobs[2].args == ("a.mp4", jobs[0].id, jobs[1].id)
+
+
+def test_batch_too_large(redis_conn):
+    """Batches over BATCH_MAX_ITEMS are rejected before enqueuing"""
+    with patch("routes.create_answer.BATCH_MAX_ITEMS", 1):
+        response = client.post(
+            "/api/create_answer/batch", json={"video_urls": ["a.mp4", "b.mp4"]}
+        )
+    assert response.status_code == 400
+    assert not redis_conn.keys("rq:job:*")
+
+
+def test_batch_progress(redis_conn):
+    """Progress counts finished jobs of every stage"""
+    from redisStore.batches import load_batch
+
+    body = _submit(["a.mp4", "b.mp4"])
+    first = load_batch(redis_conn, body["batch_id"])[0]
+    _set_status(redis_conn, first["audio_job_id"], "finished")
+    _set_status(redis_conn, first["facial_job_id"], "finished")
+    _set_status(redis_conn, first["job_id"], "started")
+
+    response = client.get(f"/api/create_answer/batch/{body['batch_id']}")
+
+    assert response.status_code == 200
+    progress = response.json()
+    assert progress["total"] == 2
+    assert progress["processing"] == 1
+    assert progress["pending"] == 1
+    assert progress["progress"] == pytest.approx(2 / 6, abs=1e-4)
+    assert [item["video_url"] for item in progress["items"]] == ["a.mp4", "b.mp4"]
+
+
+def test_batch_not_found(redis_conn):
+    assert client.get("/api/create_answer/batch/missing").status_code == 404
+    assert client.get("/api/create_answer/batch/missing/events").status_code == 404
+
+
+def test_batch_events_finished(fake_server, redis_conn):
+    """A finished batch streams one event per video, then its progress"""
+    from redisStore.batches import batch_job_ids, load_batch
+
+    body = _submit(["a.mp4", "b.mp4"])
+    items = load_batch(redis_conn, body["batch_id"])
+    for job_id in batch_job_ids(items):
+        _set_status(redis_conn, job_id, "finished")
+    _set_status(redis_conn, items[1]["job_id"], "failed")
+
+    def async_con():
+        return fakeredis.aioredis.FakeRedis(server=fake_server)
+
+    with patch("redisStore.job_events.get_async_redis_con", side_effect=async_con):
+        with TestClient(app) as stream_client:
+            response = stream_client.get(
+                f"/api/create_answer/batch/{body['batch_id']}/events"
+            )
+
+    blocks = [block.split("\n") for block in response.text.strip().split("\n\n")]
+    events = [
+        (lines[0].removeprefix("event: "), json.loads(lines[1].removeprefix("data: ")))
+        for lines in blocks
+    ]
+    assert [name for name, _ in events] == ["item", "item", "progress"]
+    assert [data["status"] for _, data in events[:2]] == ["completed", "failed"]
+    assert events[-1][1]["completed"] == 1
+    assert events[-1][1]["failed"] == 1
+    assert events[-1][1]["progress"] == 1.0
@@ -0,0 +1,115 @@
+import fakeredis
+import pytest
+from unittest.mock import MagicMock, patch
+from redisStore.checkpoints import Checkpoint, checkpoint_keys
+from schemas.create_answer import EmotionTimelines
+from tasks.detect_emotions import detect_emotions
+
+COLUMNS = ["happy", "sad"]
+
+
+class WorkHorseKilled(BaseException):
+    """Ends a job mid-video, past its `except Exception` handlers"""
+
+
+class FakeVideo:
+    """A 10 frame video whose frames are their index"""
+
+    def __init__(self, url):
+        self.position = 0
+
+    def isOpened(self):
+        return True
+
+    def get(self, prop):
+        return 30.0 if prop == 5 else 10  # CAP_PROP_FPS, CAP_PROP_FRAME_COUNT
+
+    def set(self, prop, value):
+        self.position = value
+        return True
+
+    def read(self):
+        if self.position >= 10:
+            return False, None
+        self.position += 1
+        return True, self.position - 1
+
+    def release(self):
+        pass
+
+
+def analyze(img_path, **kwargs):
+    """Scores every emotion, as DeepFace does"""
+    emotion = dict.fromkeys(EmotionTimelines.model_fields, 0.0)
+    emotion["happy"] = 50.0 if img_path % 4 == 0 else 25.0
+    emotion["neutral"] = 100.0 - emotion["happy"]
+    return {"emotion": emotion}
+
+
+@pytest.fixture
+def redis_conn():
+    return fakeredis.FakeRedis()
+
+
+def test_rows_appended_incrementally(redis_conn):
+    checkpoint = Checkpoint(redis_conn, "job-1", COLUMNS, params={"url": "a.mp4"})
+    table = {"happy": [0.5, 0.25], "sad": [0.125, 0.0]}
+
+    assert checkpoint.save({"frame_idx": 60}, table, force=True)
+    # Each row is one float32 per column
+    assert redis_conn.strlen(checkpoint.rows_key) == 2 * 2 * 4
+    table["happy"].append(0.75)
+    assert not checkpoint.save({"frame_idx": 90}, table)
+    assert checkpoint.save({"frame_idx": 90}, table, force=True)
+    assert redis_conn.strlen(checkpoint.rows_key) == 3 * 2 * 4
+
+    state, loaded = Checkpoint(redis_conn, "job-1", COLUMNS, {"url": "a.mp4"}).load()
+    assert state == {"frame_idx": 90}
+    # Shorter columns are padded with zeros
+    assert loaded == {"happy": [0.5, 0.25, 0.75], "sad": [0.125, 0.0, 0.0]}
+
+
+def test_checkpoint_of_other_params_discarded(redis_conn):
+    Checkpoint(redis_conn, "job-1", COLUMNS, {"url": "a.mp4"}).save(
+        {"frame_idx": 60}, {"happy": [0.5]}, force=True
+    )
+
+    assert Checkpoint(redis_conn, "job-1", COLUMNS, {"url": "b.mp4"}).load() is None
+    assert not any(redis_conn.exists(key) for key in checkpoint_keys("job-1"))
+
+
+def test_detect_emotions_resumes_from_checkpoint(redis_conn):
+    """A retried job analyzes only the frames after its last checkpoint"""
+    job = MagicMock(connection=redis_conn, id="job-1")
+    with (
+        patch("redisStore.checkpoints.get_current_job", return_value=job),
+        patch("redisStore.checkpoints.CHECKPOINT_INTERVAL", 1e-9),
+        patch("tasks.detect_emotions.cv2.VideoCapture", FakeVideo),
+        patch("tasks.detect_emotions.record_facial_frames"),
+    ):
+        with patch("tasks.detect_emotions.DeepFace.analyze", wraps=analyze) as mock:
+            expected = detect_emotions("talk.mp4", sample_rate=2)
+        assert mock.call_count == 5
+        assert not redis_conn.exists(*checkpoint_keys("job-1"))
+
+        # The work horse dies on frame 4
+        with patch(
+            "tasks.detect_emotions.DeepFace.analyze",
+            side_effect=[analyze(0), analyze(2), WorkHorseKilled()],
+        ):
+            with pytest.raises(WorkHorseKilled):
+                detect_emotions("talk.mp4", sample_rate=2)
+
+        with patch("tasks.detect_emotions.DeepFace.analyze", wraps=analyze) as mock:
+            result = detect_emotions("talk.mp4", sample_rate=2)
+
+    assert [call.kwargs["img_path"] for call in mock.call_args_list] == [4, 6, 8]
+    timing = {"avg_inference_time"}
+    assert result.model_dump(exclude=timing) == expected.model_dump(exclude=timing)
+    assert result.timeline.happy == [0.5, 0.25, 0.5, 0.25, 0.5]
+    assert not redis_conn.exists(*checkpoint_keys("job-1"))
+
+
+def test_no_checkpoint_outside_job():
+    with patch("redisStore.checkpoints.get_current_job", return_value=None):
+        assert Checkpoint.for_current_job(list(EmotionTimelines.model_fields)) is None
@@ -0,0 +1,113 @@
+import threading
+import time
+import fakeredis
+import pytest
+from fastapi.testclient import TestClient
+from unittest.mock import MagicMock, patch
+from main import app
+from redisStore.idempotency import IdempotencyError, submit_once
+
+client = TestClient(app)
+
+
+@pytest.fixture
+def redis_conn():
+    conn = fakeredis.FakeRedis()
+    with patch("redisStore.idempotency.get_redis_con", return_value=conn):
+        yield conn
+
+
+def _job(job_id):
+    job = MagicMock()
+    job.get_id.return_value = job_id
+    return job
+
+
+def test_create_answer_deduplicated(redis_conn):
+    """A repeated submission returns the first job without enqueuing"""
+    with patch(
+        "routes.create_answer._start_create_answer_jobs",
+        side_effect=[_job("job-1"), _job("job-2")],
+    ) as start:
+        first = client.post(
+            "/api/create_answer/", json={"video_url": "https://x/a.mp4"}
+        )
+        redis_conn.hset("rq:job:job-1", "status", "queued")
+        second = client.post(
+            "/api/create_answer/", json={"video_url": "https://x/a.mp4"}
+        )
+
+    assert first.json() == second.json() == {"job_id": "job-1"}
+    assert second.headers["idempotent-replayed"] == "true"
+    assert start.call_count == 1
+
+
+def test_failed_job_is_submitted_again(redis_conn):
+    submit = MagicMock(side_effect=["job-1", "job-2"])
+    submit_once("audio_analysis", {"video_url": "a"}, submit)
+    redis_conn.hset("rq:job:job-1", "status", "failed")
+    assert submit_once("audio_analysis", {"video_url": "a"}, submit) == ("job-2", True)
+
+
+def test_client_key_reused_with_other_parameters(redis_conn):
+    submit_once("audio_analysis", {"video_url": "a"}, lambda: "job-1", client_key="k")
+    redis_conn.hset("rq:job:job-1", "status", "started")
+    with pytest.raises(IdempotencyError) as error:
+        submit_once(
+            "audio_analysis", {"video_url": "b"}, lambda: "job-2", client_key="k"
+        )
+    assert error.value.status_code == 422
+
+
+def test_client_keys_scoped_to_tenant(redis_conn):
+    """Two tenants picking the same key get their own jobs"""
+    submit_once("audio_analysis", {"video_url": "a"}, lambda: "job-1", "k", "acme")
+    redis_conn.hset("rq:job:job-1", "status", "started")
+
+    assert submit_once(
+        "audio_analysis", {"video_url": "b"}, lambda: "job-2", "k", "other"
+    ) == ("job-2", True)
+    assert submit_once(
+        "audio_analysis", {"video_url": "a"}, lambda: "job-3", "k", "acme"
+    ) == ("job-1", False)
+
+
+def test_identical_submissions_scoped_to_tenant(redis_conn):
+    """Tenants sending the same parameters without a key get their own jobs"""
+    submit_once("audio_analysis", {"video_url": "a"}, lambda: "job-1", owner="acme")
+    redis_conn.hset("rq:job:job-1", "status", "started")
+
+    assert submit_once(
+        "audio_analysis", {"video_url": "a"}, lambda: "job-2", owner="other"
+    ) == ("job-2", True)
+    assert submit_once(
+        "audio_analysis", {"video_url": "a"}, lambda: "job-3", owner="acme"
+    ) == ("job-1", False)
+
+
+def test_concurrent_submissions_enqueue_once(redis_conn):
+    """Identical submissions racing each other share one job"""
+    calls = []
+
+    def submit():
+        calls.append(1)
+        time.sleep(0.2)
+        redis_conn.hset(f"rq:job:job-{len(calls)}", "status", "queued")
+        return f"job-{len(calls)}"
+
+    results = []
+    threads = [
+        threading.Thread(
+            target=lambda: results.append(
+                submit_once("create_answer", {"video_url": "a"}, submit)[0]
+            )
+        )
+        for _ in range(5)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+    assert results == ["job-1"] * 5
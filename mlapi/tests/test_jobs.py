@@ -0,0 +1,150 @@
+import json
+import fakeredis
+import pytest
+from fastapi.testclient import TestClient
+from unittest.mock import patch
+from main import app
+
+client = TestClient(app)
+
+
+@pytest.fixture(autouse=True)
+def no_model_warmup():
+    """Tests entering the app lifespan must not load the STAR classifier"""
+    with patch("routes.star_feedback.warmup_star_classifier"):
+        yield
+
+
+@pytest.fixture
+def fake_server():
+    """Shared fake Redis server for sync seeding and async reads"""
+    return fakeredis.FakeServer()
+
+
+def test_get_job_status(fake_server):
+    """Status is read from the job hash without loading the job"""
+    fakeredis.FakeRedis(server=fake_server).hset(
+        "rq:job:test-job-id", mapping={"status": "started", "data": b"\x00"}
+    )
+    with patch(
+        "routes.jobs.get_async_redis_con",
+        return_value=fakeredis.aioredis.FakeRedis(server=fake_server),
+    ):
+        response = client.get("/api/jobs/status/test-job-id")
+    assert response.status_code == 200
+    assert response.json() == {
+        "job_id": "test-job-id",
+        "status": "processing",
+        "result": None,
+        "error": None,
+    }
+
+
+def test_get_job_status_not_found(fake_server):
+    """Unknown job IDs return 404"""
+    with patch(
+        "routes.jobs.get_async_redis_con",
+        return_value=fakeredis.aioredis.FakeRedis(server=fake_server),
+    ):
+        response = client.get("/api/jobs/status/missing-job")
+    assert response.status_code == 404
+
+
+def _seed_job(server, job_id, status):
+    fakeredis.FakeRedis(server=server).hset(
+        f"rq:job:{job_id}", mapping={"status": status, "data": b"\x00"}
+    )
+
+
+def test_job_events_stream(fake_server):
+    """Pushed transitions are relayed until the job reaches a final status"""
+    import threading
+    import time
+    from redisStore.job_events import job_event_hub, publish_job_status
+    from schemas.jobs import JobStatus
+
+    _seed_job(fake_server, "stream-job", "queued")
+    final = {"job_id": "stream-job", "status": "completed", "result": {"score": 1}}
+
+    def async_con():
+        return fakeredis.aioredis.FakeRedis(server=fake_server)
+
+    def run_job():
+        # Act as the worker once the route has subscribed
+        while job_event_hub.subscriber_count == 0:
+            time.sleep(0.01)
+        time.sleep(0.1)
+        publisher = fakeredis.FakeRedis(server=fake_server)
+        publish_job_status(publisher, "stream-job", JobStatus.PROCESSING)
+        _seed_job(fake_server, "stream-job", "finished")
+        publish_job_status(publisher, "stream-job", JobStatus.COMPLETED)
+
+    worker = threading.Thread(target=run_job, daemon=True)
+    with (
+        patch("routes.jobs.get_async_redis_con", side_effect=async_con),
+        patch("redisStore.job_events.get_async_redis_con", side_effect=async_con),
+        patch("routes.jobs.describe_job", return_value=final),
+    ):
+        with TestClient(app) as stream_client:
+            worker.start()
+            response = stream_client.get("/api/jobs/stream-job/events")
+
+    assert response.status_code == 200
+    events = [
+        json.loads(block.split("\n")[1].removeprefix("data: "))
+        for block in response.text.strip().split("\n\n")
+    ]
+    assert [event["status"] for event in events] == [
+        "pending",
+        "processing",
+        "completed",
+    ]
+    assert events[-1] == final
+    assert job_event_hub.subscriber_count == 0
+
+
+def test_job_events_websocket_finished_job(fake_server):
+    """A job that already finished gets its final message straight away"""
+    _seed_job(fake_server, "done-job", "finished")
+    final = {"job_id": "done-job", "status": "completed", "result": {"score": 2}}
+
+    def async_con():
+        return fakeredis.aioredis.FakeRedis(server=fake_server)
+
+    with (
+        patch("routes.jobs.get_async_redis_con", side_effect=async_con),
+        patch("redisStore.job_events.get_async_redis_con", side_effect=async_con),
+        patch("routes.jobs.describe_job", return_value=final),
+    ):
+        with TestClient(app) as ws_client:
+            with ws_client.websocket_connect("/api/jobs/done-job/ws") as websocket:
+                assert websocket.receive_json() == final
+
+
+def test_bulk_job_status(fake_server):
+    """Many jobs are resolved at once, with results only when requested"""
+    import operator
+    from rq import Queue, SimpleWorker
+
+    redis_conn = fakeredis.FakeRedis(server=fake_server)
+    queue = Queue(connection=redis_conn)
+    finished = queue.enqueue("builtins.dict", score=3)
+    failed = queue.enqueue(operator.truediv, 1, 0)
+    SimpleWorker([queue], connection=redis_conn).work(burst=True)
+    pending = queue.enqueue(operator.add, 3, 4)
+
+    job_ids = [finished.id, failed.id, pending.id, "missing-job", finished.id]
+    with patch("redisStore.jobs.get_redis_con", return_value=redis_conn):
+        response = client.post("/api/jobs/status", json={"job_ids": job_ids})
+        with_results = client.post(
+            "/api/jobs/status", json={"job_ids": job_ids, "include_results": True}
+        )
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["missing"] == ["missing-job"]
+    assert [job["status"] for job in body["jobs"]] == ["completed", "failed", "pending"]
+    assert "result" not in body["jobs"][0]
+    assert "ZeroDivisionError" in body["jobs"][1]["error"]
+
+    assert with_results.json()["jobs"][0]["result"] == {"score": 3}
@@ -0,0 +1,161 @@
+import random
+import threading
+from collections import Counter
+import fakeredis
+import pytest
+from fastapi.testclient import TestClient
+from unittest.mock import patch
+from main import app
+from redisStore import lanes
+from redisStore.lanes import (
+    estimate_cost,
+    expand_queues,
+    lane_for_cost,
+    parse_lanes,
+    probe_media,
+    queue_for_video,
+    queues_for_videos,
+    weighted_order,
+)
+
+client = TestClient(app)
+
+
+@pytest.fixture
+def cost_scheduling():
+    with patch("redisStore.lanes.COST_SCHEDULING", True):
+        yield
+
+
+def test_parse_lanes():
+    assert parse_lanes("short:120:6,long::1") == [
+        lanes.Lane("short", 120.0, 6.0),
+        lanes.Lane("long", None, 1.0),
+    ]
+    with pytest.raises(ValueError):
+        parse_lanes("long:900:1,short:120:6,rest::1")
+    with pytest.raises(ValueError):
+        parse_lanes("short:120:6,medium::3,long::1")
+
+
+def test_cost_picks_lane():
+    # A 30s answer: 30 frames at 0.05s plus 7.5s of audio analysis
+    assert estimate_cost(30, fps=30, sample_rate=30) == pytest.approx(9.0)
+    assert lane_for_cost(9.0).name == "short"
+    assert lane_for_cost(estimate_cost(3600)).name == "long"
+    assert lane_for_cost(None).name == "long"
+
+
+def test_queue_for_video(cost_scheduling):
+    # 460s: 23s of facial and 115s of audio analysis
+    with patch("redisStore.lanes.probe_media", return_value=(460.0, 30.0)):
+        assert queue_for_video("talk.mp4") == "lane:medium"
+        assert queue_for_video("talk.mp4", facial=False) == "lane:short"
+    with patch("redisStore.lanes.probe_media", side_effect=OSError("unreachable")):
+        assert queue_for_video("talk.mp4") == "lane:long"
+
+
+def test_probe_media_times_out():
+    """Remote media that does not answer cannot hold up the submission"""
+    import cv2
+
+    with (
+        patch("redisStore.lanes.MEDIA_PROBE_TIMEOUT", 2.5),
+        patch("cv2.VideoCapture") as capture,
+    ):
+        capture.return_value.isOpened.return_value = False
+        assert probe_media("https://x/a.mp4") is None
+
+    params = capture.call_args.args[2]
+    assert params[params.index(cv2.CAP_PROP_OPEN_TIMEOUT_MSEC) + 1] == 2500
+    assert params[params.index(cv2.CAP_PROP_READ_TIMEOUT_MSEC) + 1] == 2500
+
+
+def test_batch_videos_probed_concurrently(cost_scheduling):
+    both_probing = threading.Barrier(2, timeout=5)
+
+    def probe(video_url):
+        # Fails with BrokenBarrierError unless both probes run at once
+        both_probing.wait()
+        return (30.0, 30.0) if video_url == "answer.mp4" else (3600.0, 30.0)
+
+    with patch("redisStore.lanes.probe_media", side_effect=probe):
+        assert queues_for_videos(["answer.mp4", "lecture.mp4"]) == [
+            "lane:short",
+            "lane:long",
+        ]
+
+
+def test_lane_resolved_before_idempotency_lock(cost_scheduling):
+    """Probing runs before the lock is taken, so it cannot outlast it"""
+    redis_conn = fakeredis.FakeRedis()
+
+    def probe(video_url):
+        assert not redis_conn.keys("mlapi:idempotency:*")
+        return (30.0, 30.0)
+
+    with (
+        patch("redisStore.idempotency.get_redis_con", return_value=redis_conn),
+        patch("redisStore.lanes.probe_media", side_effect=probe) as mock_probe,
+        patch("routes.audio_analysis.add_task_to_queue") as enqueue,
+    ):
+        enqueue.return_value.get_id.return_value = "job-1"
+        response = client.post(
+            "/api/audio_analysis/", json={"video_url": "https://x/a.mp4"}
+        )
+
+    assert response.status_code == 200
+    mock_probe.assert_called_once()
+    assert enqueue.call_args.kwargs["queue_name"] == "lane:short"
+
+
+def test_disabled_scheduling_uses_default():
+    with patch("redisStore.lanes.probe_media") as probe:
+        assert queue_for_video("talk.mp4") == "default"
+    probe.assert_not_called()
+    assert expand_queues(["high", "default"]) == ["high", "default"]
+
+
+def test_workers_serve_lanes(cost_scheduling):
+    assert expand_queues(["high", "default"]) == [
+        "high",
+        "lane:short",
+        "lane:medium",
+        "lane:long",
+        "default",
+    ]
+
+
+def test_weighted_order_favors_cheap_lanes(cost_scheduling):
+    """Lanes lead in proportion to their weight; other queues keep their place"""
+    random.seed(7)
+    queues = ["high", "lane:short", "lane:medium", "lane:long", "default"]
+    firsts = Counter()
+    for _ in range(2000):
+        ordered = weighted_order(queues, name=lambda queue: queue)
+        assert ordered[0] == "high" and ordered[-1] == "default"
+        firsts[ordered[1]] += 1
+    assert firsts["lane:short"] > firsts["lane:medium"] > firsts["lane:long"] > 0
+    assert firsts["lane:short"] / 2000 == pytest.approx(0.6, abs=0.05)
+
+
+def test_batch_routes_videos_to_lanes(cost_scheduling):
+    """Each video's jobs go to the lane of its estimated cost"""
+    from rq import Queue
+
+    redis_conn = fakeredis.FakeRedis()
+    durations = {"answer.mp4": (30.0, 30.0), "lecture.mp4": (3600.0, 30.0)}
+    with (
+        patch("redisStore.queue.get_redis_con", return_value=redis_conn),
+        patch("redisStore.batches.get_redis_con", return_value=redis_conn),
+        patch("redisStore.lanes.probe_media", side_effect=durations.get),
+    ):
+        response = client.post(
+            "/api/create_answer/batch",
+            json={"video_urls": ["lecture.mp4", "answer.mp4"]},
+        )
+
+    assert response.status_code == 200
+    assert Queue("lane:short", connection=redis_conn).count == 3
+    assert Queue("lane:long", connection=redis_conn).count == 3
+    assert Queue("default", connection=redis_conn).count == 0
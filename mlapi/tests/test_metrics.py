@@ -0,0 +1,92 @@
+import fakeredis
+from fastapi.testclient import TestClient
+from unittest.mock import patch
+from main import app
+from redisStore.metrics import (
+    observe,
+    record_facial_frames,
+    record_job_timings,
+    record_model_load,
+    render_metrics,
+)
+
+client = TestClient(app)
+
+
+def _samples(text):
+    """Metric lines of an exposition, keyed by name and labels"""
+    samples = {}
+    for line in text.splitlines():
+        if line and not line.startswith("#"):
+            name, value = line.rsplit(" ", 1)
+            samples[name] = float(value)
+    return samples
+
+
+def test_histogram_buckets_are_cumulative():
+    redis_conn = fakeredis.FakeRedis()
+    for seconds in (0.2, 3, 3, 1000):
+        observe(redis_conn, "job_run_seconds", "tasks.detect_emotions", seconds)
+
+    samples = _samples(render_metrics(redis_conn))
+
+    prefix = 'mlapi_job_run_seconds_bucket{task="tasks.detect_emotions",le='
+    assert samples[prefix + '"0.5"}'] == 1
+    assert samples[prefix + '"5.0"}'] == 3
+    assert samples[prefix + '"600.0"}'] == 3
+    assert samples[prefix + '"+Inf"}'] == 4
+    assert samples['mlapi_job_run_seconds_count{task="tasks.detect_emotions"}'] == 4
+    assert samples['mlapi_job_run_seconds_sum{task="tasks.detect_emotions"}'] == 1006.2
+
+
+def test_worker_metrics_are_exported():
+    """Timings, model loads, facial throughput and queue depths are reported"""
+    from rq import Queue, SimpleWorker
+
+    redis_conn = fakeredis.FakeRedis()
+    queue = Queue(connection=redis_conn)
+    job = queue.enqueue("builtins.dict", score=1)
+    SimpleWorker([queue], connection=redis_conn).work(burst=True)
+    queue.enqueue("builtins.dict", score=2)
+
+    record_job_timings(redis_conn, job.fetch(job.id, connection=redis_conn))
+    record_model_load(redis_conn, "star:test", 1.5)
+    record_facial_frames(redis_conn, 120, 4.0)
+
+    text = render_metrics(redis_conn)
+    samples = _samples(text)
+
+    assert "# TYPE mlapi_job_wait_seconds histogram" in text
+    assert samples['mlapi_job_wait_seconds_count{task="builtins.dict"}'] == 1
+    assert samples['mlapi_job_run_seconds_count{task="builtins.dict"}'] == 1
+    assert samples['mlapi_model_load_seconds{model="star:test"}'] == 1.5
+    assert samples["mlapi_facial_frames_total"] == 120
+    assert samples["mlapi_facial_frames_per_second"] == 30
+    assert samples['mlapi_queue_jobs{queue="default"}'] == 1
+    assert samples["mlapi_worker_busy_ratio"] == 0
+
+
+def test_metric_families_are_contiguous():
+    """Strict parsers reject a family split by samples of another"""
+    from rq import Queue
+
+    redis_conn = fakeredis.FakeRedis()
+    for name in ("high", "default"):
+        Queue(name, connection=redis_conn).enqueue("builtins.dict")
+
+    families = []
+    for line in render_metrics(redis_conn).splitlines():
+        if line.startswith("# TYPE "):
+            families.append(line.split()[2])
+        elif line and not line.startswith("#"):
+            assert line.startswith(families[-1]), line
+    assert len(families) == len(set(families))
+
+
+def test_metrics_endpoint():
+    redis_conn = fakeredis.FakeRedis()
+    with patch("routes.metrics.get_redis_con", return_value=redis_conn):
+        response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    assert "mlapi_result_cache_lookups_total" in response.text
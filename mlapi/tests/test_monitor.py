@@ -0,0 +1,40 @@
+import fakeredis
+from redisStore.job_events import publish_job_status
+from redisStore.monitor import JobTracker
+from schemas.jobs import JobStatus
+
+
+def test_tracker_reads_only_new_transitions():
+    """Each poll returns the transitions since the previous one"""
+    redis_conn = fakeredis.FakeRedis()
+    tracker = JobTracker(redis_conn, batch_size=2)
+
+    publish_job_status(redis_conn, "job-1", JobStatus.PROCESSING)
+    publish_job_status(redis_conn, "job-1", JobStatus.COMPLETED)
+    publish_job_status(redis_conn, "job-2", JobStatus.PROCESSING)
+    publish_job_status(redis_conn, "job-2", JobStatus.FAILED)
+    publish_job_status(redis_conn, "job-3", JobStatus.COMPLETED)
+
+    assert tracker.poll() == {
+        "processing": ["job-1", "job-2"],
+        "completed": ["job-1", "job-3"],
+        "failed": ["job-2"],
+    }
+    assert tracker.poll() == {}
+
+    publish_job_status(redis_conn, "job-4", JobStatus.COMPLETED)
+    assert tracker.poll() == {"completed": ["job-4"]}
+    assert tracker.counters() == {"processing": 2, "completed": 3, "failed": 1}
+
+
+def test_tracker_resumes_from_stored_cursor():
+    """A restarted monitor does not count transitions twice"""
+    redis_conn = fakeredis.FakeRedis()
+    publish_job_status(redis_conn, "job-1", JobStatus.COMPLETED)
+    JobTracker(redis_conn).poll()
+
+    publish_job_status(redis_conn, "job-2", JobStatus.COMPLETED)
+    restarted = JobTracker(redis_conn)
+
+    assert restarted.poll() == {"completed": ["job-2"]}
+    assert restarted.counters() == {"completed": 2}
@@ -0,0 +1,144 @@
+import os
+import signal
+import time
+from datetime import datetime, timedelta, timezone
+import fakeredis
+import pytest
+from unittest.mock import patch
+from rq import Queue
+from rq.executions import Execution
+from rq.utils import utcformat
+from redisStore import reaper
+from redisStore.metrics import render_metrics
+from redisStore.reaper import (
+    LOST_SINCE_KEY,
+    Reaper,
+    find_lost_jobs,
+    job_finished,
+    job_heartbeat,
+)
+from redisStore.worker import AnalysisWorker
+
+
+def kill_work_horse():
+    """A job whose work horse dies, like one killed for running out of memory"""
+    os.kill(os.getpid(), signal.SIGKILL)
+
+
+@pytest.fixture
+def redis_conn():
+    return fakeredis.FakeRedis()
+
+
+def _start(redis_conn, queue, heartbeat_age=0.0, worker_name="worker-1"):
+    """Enqueue a job and mark it running on a worker, as RQ does"""
+    return _run(
+        redis_conn, queue, queue.enqueue(len, "abc"), heartbeat_age, worker_name
+    )
+
+
+def _run(redis_conn, queue, job, heartbeat_age=0.0, worker_name="worker-1"):
+    queue.remove(job)
+    beat = datetime.now(timezone.utc) - timedelta(seconds=heartbeat_age)
+    with redis_conn.pipeline() as pipe:
+        Execution.create(job, ttl=600, pipeline=pipe, worker_name=worker_name)
+        pipe.hset(
+            job.key,
+            mapping={
+                "status": "started",
+                "worker_name": worker_name,
+                "last_heartbeat": utcformat(beat),
+                "started_at": utcformat(beat),
+            },
+        )
+        pipe.execute()
+    return job
+
+
+def test_job_heartbeat_is_throttled(redis_conn):
+    job = Queue(connection=redis_conn).enqueue(len, "abc")
+    with patch("redisStore.reaper.get_current_job", return_value=job):
+        job_heartbeat(0.25)
+        first = redis_conn.zscore(reaper.HEARTBEATS_KEY, job.id)
+        job_heartbeat(0.5)
+
+    assert redis_conn.zscore(reaper.HEARTBEATS_KEY, job.id) == first
+    assert float(redis_conn.hget(reaper.PROGRESS_KEY, job.id)) == 0.25
+
+
+def test_find_lost_jobs(redis_conn):
+    queue = Queue("high", connection=redis_conn)
+    dead = _start(redis_conn, queue, heartbeat_age=120)
+    stalled = _start(redis_conn, queue)
+    healthy = _start(redis_conn, queue)
+    redis_conn.zadd(
+        reaper.HEARTBEATS_KEY, {stalled.id: time.time() - 300, healthy.id: time.time()}
+    )
+
+    lost = find_lost_jobs(redis_conn, ["high"], dead_seconds=35, stall_seconds=120)
+
+    assert {(job.job_id, job.reason) for job in lost} == {
+        (dead.id, "dead"),
+        (stalled.id, "stalled"),
+    }
+
+
+def test_dead_jobs_requeued_then_abandoned(redis_conn):
+    """Lost jobs go back to the front of the queue, then fail with their dependents"""
+    queue = Queue("high", connection=redis_conn)
+    job = _start(redis_conn, queue, heartbeat_age=120)
+    dependent = queue.enqueue(len, "abc", depends_on=job)
+    queue.enqueue(len, "other")
+
+    Reaper(dead_seconds=35).tick(redis_conn)
+
+    assert job.get_status(refresh=True) == "queued"
+    assert queue.job_ids[0] == job.id
+    assert redis_conn.hexists(LOST_SINCE_KEY, job.id)
+
+    with patch("redisStore.reaper.REAPER_MAX_RETRIES", 1):
+        _run(redis_conn, queue, job, heartbeat_age=120)
+        Reaper(dead_seconds=35).tick(redis_conn)
+
+    assert job.get_status(refresh=True) == "failed"
+    assert job.id in queue.failed_job_registry.get_job_ids()
+    assert dependent.get_status(refresh=True) == "canceled"
+    assert not redis_conn.hexists(LOST_SINCE_KEY, job.id)
+
+
+def test_stalled_job_horse_killed_once(redis_conn):
+    queue = Queue("high", connection=redis_conn)
+    job = _start(redis_conn, queue)
+    redis_conn.zadd(reaper.HEARTBEATS_KEY, {job.id: time.time() - 300})
+
+    with patch("redisStore.reaper.send_kill_horse_command") as kill:
+        Reaper(stall_seconds=120).tick(redis_conn)
+        Reaper(stall_seconds=120).tick(redis_conn)
+
+    kill.assert_called_once_with(redis_conn, "worker-1")
+
+
+def test_killed_work_horse_requeued(redis_conn):
+    """The worker retries a job whose work horse died, up to the limit"""
+    queue = Queue("high", connection=redis_conn)
+    job = queue.enqueue(kill_work_horse)
+
+    AnalysisWorker([queue], connection=redis_conn).work(burst=True)
+
+    assert job.get_status(refresh=True) == "failed"
+    lost = redis_conn.hgetall("mlapi:metrics:lost_jobs")
+    assert lost == {b"requeued": b"2", b"abandoned": b"1"}
+
+
+def test_recovery_time_in_metrics(redis_conn):
+    job = Queue(connection=redis_conn).enqueue(len, "abc")
+    redis_conn.hset(LOST_SINCE_KEY, job.id, time.time() - 42)
+
+    job_finished(redis_conn, job, succeeded=True)
+
+    text = render_metrics(redis_conn)
+    assert 'mlapi_job_recovery_seconds_count{task="builtins.len"} 1.0' in text
+    assert (
+        'mlapi_job_recovery_seconds_bucket{task="builtins.len",le="60.0"} 1.0' in text
+    )
+    assert not redis_conn.hexists(LOST_SINCE_KEY, job.id)
@@ -0,0 +1,175 @@
+import fakeredis
+import pytest
+from fastapi.testclient import TestClient
+from unittest.mock import patch
+from main import app
+from redisStore.result_store import (
+    ResultBytesCache,
+    compress,
+    decompress,
+    encode_json,
+    result_bytes_cache,
+    result_key,
+    store_result,
+)
+
+client = TestClient(app)
+
+
+@pytest.fixture(autouse=True)
+def clear_result_cache():
+    """Job IDs are reused across tests, so start without cached results"""
+    result_bytes_cache.clear()
+
+
+LARGE_RESULT = {"timeline": [{"time": i, "score": i / 10} for i in range(500)]}
+
+
+@pytest.fixture
+def fake_server():
+    return fakeredis.FakeServer()
+
+
+@pytest.fixture
+def stored_results(fake_server):
+    """Route reads of stored results go to the fake server"""
+    with patch(
+        "utils.responses.get_async_redis_con",
+        side_effect=lambda: fakeredis.aioredis.FakeRedis(server=fake_server),
+    ):
+        yield fakeredis.FakeRedis(server=fake_server)
+
+
+def test_compress_round_trip():
+    """Large bodies are compressed, small ones are kept as they are"""
+    body = encode_json(LARGE_RESULT)
+    stored = compress(body, "gzip")
+    assert stored.encoding == "gzip"
+    assert len(stored.body) < len(body)
+    assert decompress(stored) == body
+    assert compress(b"{}", "gzip").encoding == "identity"
+
+
+def test_result_cache_evicts_by_size():
+    cache = ResultBytesCache(max_bytes=10)
+    cache.put("a", compress(b"[1,2,3]"))
+    cache.put("b", compress(b"[4,5,6]"))
+    assert cache.get("a") is None
+    assert cache.get("b") is not None
+
+
+def test_result_cache_expires_with_redis_ttl():
+    cache = ResultBytesCache(max_bytes=1024)
+    cache.put("a", compress(b"[1,2,3]"), ttl=60)
+    cache.put("b", compress(b"[4,5,6]"))
+    with patch("redisStore.result_store.time.monotonic", return_value=1e12):
+        assert cache.get("a") is None
+        assert cache.get("b") is not None
+
+
+def test_cached_result_expires_with_job(stored_results):
+    """Results are not served from the process cache after they expire"""
+    store_result(stored_results, "job-1", {"score": 1}, 500)
+    client.get("/api/facial_analysis/job-1/result")
+    stored_results.flushall()
+
+    with patch("redisStore.result_store.time.monotonic", return_value=1e12):
+        assert result_bytes_cache.get("job-1") is None
+
+
+def test_results_with_errors_are_not_stored(fake_server):
+    """Error results keep going through the pickled RQ result"""
+    redis_conn = fakeredis.FakeRedis(server=fake_server)
+    assert not store_result(redis_conn, "job-1", {"errors": "boom"}, 500)
+    assert not redis_conn.exists(result_key("job-1"))
+
+
+def test_stored_result_sent_compressed(stored_results):
+    """Clients accepting gzip get the stored bytes with Content-Encoding"""
+    assert store_result(stored_results, "job-1", LARGE_RESULT, 500)
+    assert stored_results.ttl(result_key("job-1")) == 500
+
+    with patch("rq.job.Job.fetch") as fetch:
+        response = client.get(
+            "/api/facial_analysis/job-1/result", headers={"Accept-Encoding": "gzip"}
+        )
+    fetch.assert_not_called()
+    assert response.status_code == 200
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.json() == LARGE_RESULT
+
+
+def test_stored_result_sent_decompressed(stored_results):
+    """Clients that do not accept gzip get plain JSON"""
+    store_result(stored_results, "job-1", LARGE_RESULT, 500)
+    response = client.get(
+        "/api/create_answer/job-1/result", headers={"Accept-Encoding": "identity"}
+    )
+    assert "content-encoding" not in response.headers
+    assert response.json() == LARGE_RESULT
+
+
+def test_job_results_wraps_stored_result(stored_results):
+    store_result(stored_results, "job-1", {"score": 1}, 500)
+    response = client.get("/api/jobs/results/job-1")
+    assert response.json() == {"result": {"score": 1}, "status": "success"}
+
+
+def test_finished_result_not_modified(stored_results):
+    """A matching If-None-Match gets an empty 304"""
+    store_result(stored_results, "job-1", LARGE_RESULT, 500)
+    response = client.get("/api/facial_analysis/job-1/result")
+    etag = response.headers["etag"]
+    assert "immutable" in response.headers["cache-control"]
+
+    # Served from the in-process cache once the result is gone from Redis
+    stored_results.flushall()
+    cached = client.get(
+        "/api/facial_analysis/job-1/result", headers={"If-None-Match": etag}
+    )
+    assert cached.status_code == 304
+    assert cached.content == b""
+    assert cached.headers["etag"] == etag
+    assert "Accept-Encoding" in cached.headers["vary"]
+
+    identity = client.get(
+        "/api/facial_analysis/job-1/result", headers={"Accept-Encoding": "identity"}
+    )
+    assert identity.status_code == 200
+    assert identity.headers["etag"] != etag
+
+
+def test_unstored_result_has_etag():
+    """Results loaded from RQ get the same caching headers"""
+    with patch(
+        "routes.audio_analysis.fetch_job_result",
+        return_value=("finished", {"score": 1}),
+    ):
+        response = client.get("/api/audio_analysis/old-job/result")
+        not_modified = client.get(
+            "/api/audio_analysis/old-job/result",
+            headers={"If-None-Match": response.headers["etag"]},
+        )
+    assert response.json() == {"score": 1}
+    assert not_modified.status_code == 304
+
+
+def test_worker_stores_result_with_job_result_ttl():
+    """The stored result expires with the RQ result, including worker defaults"""
+    from rq import Queue, SimpleWorker
+    from redisStore.worker import AnalysisWorker
+
+    class InProcessWorker(SimpleWorker, AnalysisWorker):
+        """Runs jobs without forking, so they write to the same fake Redis"""
+
+    redis_conn = fakeredis.FakeRedis()
+    queue = Queue(connection=redis_conn)
+    kept = queue.enqueue(len, "abc", result_ttl=-1)
+    default = queue.enqueue(len, "abcd")
+
+    InProcessWorker([queue], connection=redis_conn, default_result_ttl=60).work(
+        burst=True
+    )
+
+    assert redis_conn.ttl(result_key(kept.id)) == -1
+    assert 0 < redis_conn.ttl(result_key(default.id)) <= 60
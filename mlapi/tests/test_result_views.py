@@ -0,0 +1,133 @@
+import fakeredis
+import pytest
+from fastapi.testclient import TestClient
+from unittest.mock import patch
+from main import app
+from redisStore.result_store import result_bytes_cache, store_result
+from schemas.create_answer import (
+    CreateAnswer,
+    EmotionDetectionResult,
+    EmotionTimelines,
+    EmotionTotals,
+)
+from utils.result_views import ResultView, bucket_intervals, bucket_series
+
+client = TestClient(app)
+
+
+@pytest.fixture(autouse=True)
+def clear_result_cache():
+    """Job IDs are reused across tests, so start without cached results"""
+    result_bytes_cache.clear()
+
+
+FACIAL_RESULT = EmotionDetectionResult(
+    total_frames=6,
+    emotion_sums=EmotionTotals(happy=3.0, sad=1.0),
+    timeline=EmotionTimelines(
+        happy=[1.0, 0.0, 1.0, 1.0, 0.0, 0.0], sad=[0.0, 0.0, 0.0, 0.0, 1.0, 1.0]
+    ),
+    clip_length_seconds=6.0,
+)
+
+
+def test_unknown_fields_are_rejected():
+    with pytest.raises(ValueError):
+        ResultView(CreateAnswer, ("evaluation", "timeline"), fields="evaluation.nope")
+    with pytest.raises(ValueError):
+        # Scalars have no sub-fields
+        ResultView(
+            CreateAnswer,
+            ("evaluation", "timeline"),
+            fields="evaluation.aggregateScore.x",
+        )
+
+
+def test_bucket_series():
+    assert bucket_series([1.0, 3.0, 2.0, 4.0], 2) == [2.0, 3.0]
+    assert bucket_series([1.0, 2.0], 4) == [1.0, 2.0]
+
+
+def test_bucket_intervals():
+    """Intervals are aggregated per time window"""
+    timeline = [
+        {
+            "start": 0,
+            "end": 1000,
+            "audioSentiment": "POSITIVE",
+            "facialEmotion": ["happy"],
+        },
+        {
+            "start": 1000,
+            "end": 2000,
+            "audioSentiment": "POSITIVE",
+            "facialEmotion": ["happy", "sad"],
+        },
+        {"start": 2000, "end": 3000, "audioSentiment": "NEUTRAL", "facialEmotion": []},
+        {
+            "start": 3000,
+            "end": 4000,
+            "audioSentiment": "NEGATIVE",
+            "facialEmotion": ["sad"],
+        },
+    ]
+    assert bucket_intervals(timeline, 2) == [
+        {
+            "start": 0,
+            "end": 2000,
+            "audioSentiment": "POSITIVE",
+            "facialEmotion": ["happy", "sad"],
+        },
+        {
+            "start": 2000,
+            "end": 4000,
+            "audioSentiment": "NEUTRAL",
+            "facialEmotion": ["sad"],
+        },
+    ]
+
+
+def test_view_does_not_modify_result():
+    data = FACIAL_RESULT.model_dump(mode="json")
+    view = ResultView(
+        EmotionDetectionResult, ("timeline",), timeline_offset=2, timeline_limit=2
+    )
+    trimmed, total = view.apply(data)
+    assert total == 6
+    assert trimmed["timeline"]["happy"] == [1.0, 1.0]
+    assert len(data["timeline"]["happy"]) == 6
+
+
+@pytest.mark.parametrize("stored", [True, False])
+def test_facial_result_view(stored):
+    """Projection and downsampling work on stored and pickled results"""
+    server = fakeredis.FakeServer()
+    if stored:
+        store_result(fakeredis.FakeRedis(server=server), "job-1", FACIAL_RESULT, 500)
+
+    with (
+        patch(
+            "utils.responses.get_async_redis_con",
+            side_effect=lambda: fakeredis.aioredis.FakeRedis(server=server),
+        ),
+        patch(
+            "routes.facial_analysis.fetch_job_result",
+            return_value=("finished", FACIAL_RESULT),
+        ),
+    ):
+        response = client.get(
+            "/api/facial_analysis/job-1/result",
+            params={"fields": "timeline,total_frames", "buckets": 3},
+        )
+
+    assert response.status_code == 200
+    assert response.headers["x-timeline-total"] == "3"
+    body = response.json()
+    assert body["total_frames"] == 6
+    assert body["timeline"]["happy"] == [0.5, 1.0, 0.0]
+    assert "emotion_sums" not in body
+
+
+def test_result_view_unknown_field():
+    response = client.get("/api/create_answer/job-1/result", params={"fields": "nope"})
+    assert response.status_code == 400
@@ -0,0 +1,83 @@
+import pickle
+import zlib
+from datetime import datetime, timezone
+import pytest
+
+pytest.importorskip("msgpack")
+
+from redisStore.serializer import CompactSerializer  # noqa: E402
+from schemas.create_answer import (  # noqa: E402
+    EmotionDetectionResult,
+    EmotionTimelines,
+    FER_Emotions,
+)
+
+
+@pytest.fixture
+def emotion_result():
+    timeline = [i / 1000 for i in range(600)]
+    return EmotionDetectionResult(
+        total_frames=600,
+        timeline=EmotionTimelines(happy=timeline, sad=[0.25] * 3),
+        clip_length_seconds=600.0,
+    )
+
+
+def test_models_round_trip(emotion_result):
+    """Models come back as models, timelines within float32 precision"""
+    payload = CompactSerializer.dumps(emotion_result)
+    restored = CompactSerializer.loads(payload)
+
+    assert isinstance(restored, EmotionDetectionResult)
+    assert restored.total_frames == 600
+    assert restored.timeline.sad == [0.25] * 3
+    assert restored.timeline.happy == pytest.approx(
+        emotion_result.timeline.happy, rel=1e-6
+    )
+    assert len(payload) < len(pickle.dumps(emotion_result)) / 2
+
+
+def test_job_tuples_round_trip():
+    """RQ's job data keeps its tuples, enums and other Python values"""
+    when = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    data = (
+        "tasks.create_answer",
+        None,
+        ("a.mp4", None),
+        {"emotion": FER_Emotions.HAPPY, "at": when},
+    )
+
+    restored = CompactSerializer.loads(CompactSerializer.dumps(data))
+
+    assert restored == data
+    assert restored[3]["emotion"] is FER_Emotions.HAPPY
+
+
+def test_large_payloads_are_compressed():
+    pytest.importorskip("zstandard")
+    payload = CompactSerializer.dumps({"text": "word " * 5000})
+    assert payload[3:4] == b"\x01"
+    assert CompactSerializer.loads(payload) == {"text": "word " * 5000}
+
+
+def test_reads_pickled_payloads():
+    """Jobs enqueued before switching serializer stay readable"""
+    assert CompactSerializer.loads(pickle.dumps({"score": 1})) == {"score": 1}
+
+
+def test_rq_jobs_use_the_serializer(emotion_result):
+    import fakeredis
+    from rq import Queue, SimpleWorker
+    from rq.job import Job
+
+    redis_conn = fakeredis.FakeRedis()
+    queue = Queue(connection=redis_conn, serializer=CompactSerializer)
+    job = queue.enqueue("builtins.dict", total_frames=emotion_result.total_frames)
+    SimpleWorker([queue], connection=redis_conn, serializer=CompactSerializer).work(
+        burst=True
+    )
+
+    fetched = Job.fetch(job.id, connection=redis_conn, serializer=CompactSerializer)
+    assert fetched.return_value() == {"total_frames": 600}
+    # RQ zlib-compresses the job data around the serializer's payload
+    assert zlib.decompress(redis_conn.hget(job.key, "data")).startswith(b"\x00MJ")
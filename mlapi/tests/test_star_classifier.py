@@ -0,0 +1,164 @@
+import sys
+import time
+import types
+import fakeredis
+import pytest
+from tasks.helpers import star_classifier
+from tasks.helpers.star_cache import StarLabelCache, get_star_cache_stats
+from concurrent.futures import ThreadPoolExecutor
+from tasks.helpers.star_classifier import (
+    StarClassifier,
+    StarMicroBatcher,
+    get_star_classifier,
+)
+
+
+@pytest.fixture
+def fake_pipeline(monkeypatch):
+    """Replace the transformers pipeline factory with a counting fake"""
+    calls = {"loads": 0, "batches": []}
+
+    def pipeline(task, model, **kwargs):
+        calls["loads"] += 1
+
+        def classify(sentences, batch_size=1):
+            calls["batches"].append(list(sentences))
+            return [
+                {"label": "LABEL_1" if "result" in s.lower() else "LABEL_0"}
+                for s in sentences
+            ]
+
+        return classify
+
+    module = types.ModuleType("transformers.pipelines")
+    module.pipeline = pipeline
+    monkeypatch.setitem(sys.modules, "transformers.pipelines", module)
+    monkeypatch.setattr(star_classifier, "_registry", {})
+    return calls
+
+
+def test_classifier_loads_model_once(fake_pipeline):
+    """The pipeline is built on first use and reused afterwards"""
+    classifier = StarClassifier("test-model")
+    assert not classifier.is_loaded
+
+    assert classifier.classify("I fixed the bug") == "Action"
+    assert classifier.classify("As a result we shipped") == "Result"
+    assert fake_pipeline["loads"] == 1
+
+    stats = classifier.stats()
+    assert stats["loaded"] is True
+    assert stats["load_time_seconds"] is not None
+    assert stats["memory_bytes"] is not None
+
+
+def test_registry_returns_shared_instance(fake_pipeline):
+    """One classifier per model name per process"""
+    assert get_star_classifier("test-model") is get_star_classifier("test-model")
+    assert get_star_classifier("other-model") is not get_star_classifier("test-model")
+
+    stats = star_classifier.warmup_star_classifier("test-model")
+    assert stats["loaded"] is True
+    assert fake_pipeline["loads"] == 1
+
+
+def test_classify_batch_keeps_sentence_order(fake_pipeline):
+    """Sentences are length-sorted for padding but labels come back in order"""
+    classifier = StarClassifier("test-model")
+    sentences = ["As a result, sales grew by a lot", "I led it", "Result: done"]
+
+    assert classifier.classify_batch(sentences) == ["Result", "Action", "Result"]
+    assert fake_pipeline["batches"] == [
+        ["I led it", "Result: done", "As a result, sales grew by a lot"]
+    ]
+
+
+def test_microbatcher_combines_concurrent_requests(fake_pipeline):
+    """Concurrent callers share a forward pass and get their own labels"""
+    batcher = StarMicroBatcher(
+        StarClassifier("test-model"), max_wait_ms=200, batch_size=64
+    )
+    requests = [["I acted", "The result was good"], ["Result one"], ["I did it"]]
+
+    with ThreadPoolExecutor(max_workers=3) as pool:
+        futures = []
+        for sentences in requests:
+            futures.append(pool.submit(batcher.classify, sentences))
+            time.sleep(0.01)
+        results = [future.result() for future in futures]
+
+    assert results == [["Action", "Result"], ["Result"], ["Action"]]
+    assert len(fake_pipeline["batches"]) == 1
+
+
+@pytest.fixture
+def label_cache(monkeypatch):
+    """Fresh two-tier label cache backed by a fake Redis"""
+    cache = StarLabelCache(max_size=2, ttl=60)
+    cache._redis = fakeredis.FakeRedis()
+    monkeypatch.setattr(star_classifier, "star_label_cache", cache)
+    monkeypatch.setattr(star_classifier, "STAR_CACHE_ENABLED", True)
+    monkeypatch.setattr(star_classifier, "STAR_MICROBATCH_WAIT_MS", 0)
+    return cache
+
+
+def test_classify_sentences_only_infers_uncached(fake_pipeline, label_cache):
+    """Cached and repeated sentences never reach the model"""
+    first = star_classifier.classify_sentences(
+        ["I fixed it", "The result was good", "I fixed it"], "test-model"
+    )
+    assert first == ["Action", "Result", "Action"]
+    assert fake_pipeline["batches"] == [["I fixed it", "The result was good"]]
+
+    # Normalized text hits the cache, only the new sentence is classified
+    second = star_classifier.classify_sentences(
+        ["  i FIXED it ", "Result achieved"], "test-model"
+    )
+    assert second == ["Action", "Result"]
+    assert fake_pipeline["batches"][-1] == ["Result achieved"]
+
+
+def test_label_cache_falls_back_to_redis(fake_pipeline, label_cache):
+    """Labels evicted from the local LRU are served from Redis"""
+    star_classifier.classify_sentences(["One", "Two", "Three"], "test-model")
+    label_cache.clear_local()
+
+    assert star_classifier.classify_sentences(["One"], "test-model") == ["Action"]
+    assert len(fake_pipeline["batches"]) == 1
+
+    stats = get_star_cache_stats(label_cache._redis)
+    assert stats["redis_hits"] == 1
+    assert stats["misses"] == 3
+    assert stats["inferred_sentences"] == 3
+    assert stats["hit_rate"] == 0.25
+
+
+def test_unknown_backend_is_rejected():
+    """Only the PyTorch and ONNX backends are supported"""
+    with pytest.raises(ValueError):
+        StarClassifier("test-model", backend="tensorrt")
+
+
+def test_compare_backends_reports_mismatches():
+    """The parity harness lists sentences whose labels differ"""
+    from tasks.helpers.star_onnx import compare_backends, load_corpus
+
+    class FixedClassifier:
+        def __init__(self, labels):
+            self.labels = labels
+
+        def classify_batch(self, sentences):
+            return self.labels[: len(sentences)]
+
+    corpus = load_corpus()[:4]
+    report = compare_backends(
+        FixedClassifier(["Situation", "Task", "Action", "Result"]),
+        FixedClassifier(["Situation", "Task", "Action", "Action"]),
+        corpus,
+    )
+
+    assert report["sentences"] == 4
+    assert report["agreement"] == 0.75
+    assert report["mismatches"] == [
+        {"sentence": corpus[3], "reference": "Result", "candidate": "Action"}
+    ]
@@ -3,8 +3,10 @@ Start the worker in a daemon process. This is required for the tests to work. Th
 Wait for the job to complete then. Get the result using the `api/jobs/results/{job_id}` route
 """
 
+import json
 import pytest
 import time
+from unittest.mock import patch, MagicMock
 from fastapi.testclient import TestClient
 from main import app
 from tasks.starscores import percentageFeedback
@@ -81,3 +83,131 @@ def test_star_scores():
     # Verify all feedback messages are strings
     for msg in feedback:
         assert isinstance(msg, str)
+
+
+def test_star_cache_stats():
+    """The cache statistics route reports hit rates from Redis"""
+    stats = {"local_hits": 3, "redis_hits": 1, "misses": 4, "hit_rate": 0.5}
+    with patch("routes.star_feedback.get_redis_con"):
+        with patch("routes.star_feedback.get_star_cache_stats", return_value=stats):
+            response = client.get("/api/star_feedback/cache/stats")
+    assert response.status_code == 200
+    assert response.json()["hit_rate"] == 0.5
+
+
+def test_star_analyze_inline_for_short_text():
+    """Short texts are classified in the API and stored under a job ID"""
+    import fakeredis
+
+    star_result = {
+        "fufilledStar": False,
+        "percentages": {"action": 100.0, "result": 0.0, "situation": 0.0, "task": 0.0},
+        "classifications": [["I fixed the outage", "Action"]],
+    }
+    server = fakeredis.FakeServer()
+    with (
+        patch(
+            "routes.star_feedback.get_redis_con",
+            return_value=fakeredis.FakeRedis(server=server),
+        ),
+        patch(
+            "utils.responses.get_async_redis_con",
+            side_effect=lambda: fakeredis.aioredis.FakeRedis(server=server),
+        ),
+        patch("routes.star_feedback.predict_star_scores", return_value=star_result),
+        patch("routes.star_feedback.add_task_to_queue") as mock_enqueue,
+    ):
+        response = client.post(
+            "/api/star_feedback/analyze", json={"text": "I fixed the outage."}
+        )
+        assert response.status_code == 200
+        body = response.json()
+        assert body["status"] == "success"
+        assert body["result"] == star_result
+
+        fetched = client.get(f"/api/star_feedback/result/{body['job_id']}")
+    assert fetched.status_code == 200
+    assert fetched.json()["result"] == star_result
+    mock_enqueue.assert_not_called()
+
+
+def test_star_analyze_queues_long_text():
+    """Texts above the inline threshold still go through the queue"""
+    mock_job = MagicMock()
+    mock_job.id = "test-job-id"
+    with patch("routes.star_feedback.STAR_INLINE_MAX_CHARS", 20):
+        with patch("routes.star_feedback.add_task_to_queue", return_value=mock_job):
+            response = client.post(
+                "/api/star_feedback/analyze",
+                json={"text": "I fixed the outage during the launch."},
+            )
+    assert response.status_code == 200
+    assert response.json() == {"job_id": "test-job-id", "status": "queued"}
+
+
+def test_star_analyze_stream():
+    """Classifications are streamed as SSE events, followed by the result"""
+    import fakeredis
+    import tasks.starscores
+    from tasks.starscores import stream_star_scores
+
+    server = fakeredis.FakeServer()
+
+    def run_job(task, data, channel):
+        # Run the worker side synchronously once the route has subscribed
+        stream_star_scores(data, channel)
+        job = MagicMock()
+        job.id = "test-job-id"
+        return job
+
+    labels = iter(["Situation", "Task", "Action", "Result"])
+    with (
+        patch(
+            "routes.star_feedback.get_async_redis_con",
+            return_value=fakeredis.aioredis.FakeRedis(server=server),
+        ),
+        patch.object(
+            tasks.starscores,
+            "get_redis_con",
+            return_value=fakeredis.FakeRedis(server=server),
+        ),
+        patch.object(
+            tasks.starscores,
+            "classify_sentences",
+            side_effect=lambda chunk: [next(labels) for _ in chunk],
+        ),
+        patch("routes.star_feedback.add_task_to_queue", side_effect=run_job),
+    ):
+        response = client.post(
+            "/api/star_feedback/analyze/stream",
+            json={"text": "We had an outage. I owned it. I fixed it. It worked."},
+        )
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    events = [block.split("\n") for block in response.text.strip().split("\n\n")]
+    names = [lines[0].removeprefix("event: ") for lines in events]
+    assert names == ["queued"] + ["classification"] * 4 + ["result"]
+
+    first = json.loads(events[1][1].removeprefix("data: "))
+    assert first == {
+        "index": 0,
+        "sentence": "We had an outage",
+        "category": "Situation",
+    }
+    result = json.loads(events[-1][1].removeprefix("data: "))
+    assert result["fufilledStar"] is True
+    assert result["percentages"]["action"] == 25.0
+    assert isinstance(result["percentageFeedback"], list)
+
+
+def test_classifier_warmed_for_inline_analysis():
+    """The API loads the classifier at start only when analyzing inline"""
+    import asyncio
+    from routes.star_feedback import warmup_inline_classifier
+
+    with patch("routes.star_feedback.warmup_star_classifier") as warmup:
+        asyncio.run(warmup_inline_classifier())
+        with patch("routes.star_feedback.STAR_INLINE_MAX_CHARS", 0):
+            asyncio.run(warmup_inline_classifier())
+    warmup.assert_called_once_with()
@@ -0,0 +1,83 @@
+import os
+import signal
+import sys
+import time
+import fakeredis
+from unittest.mock import MagicMock, patch
+from rq import Queue
+from redisStore.supervisor import (
+    QueueLoad,
+    ScalingPolicy,
+    Supervisor,
+    desired_workers,
+    oldest_job_age,
+    read_load,
+)
+
+POLICY = ScalingPolicy(
+    min_workers=1, max_workers=8, cpu_budget=4, cpus_per_worker=1, target_wait=60
+)
+
+
+def test_desired_workers_follows_backlog():
+    assert desired_workers(QueueLoad(0, 0, 30), 3, POLICY) == 1
+    # 4 jobs of 30s must all start within 60s
+    assert desired_workers(QueueLoad(4, 5, 30), 1, POLICY) == 2
+    # Bounded by the CPU budget, not just max_workers
+    assert desired_workers(QueueLoad(100, 5, 30), 1, POLICY) == 4
+
+
+def test_desired_workers_reacts_to_old_jobs():
+    """Jobs waiting past the target add a worker even if the estimate says no"""
+    assert desired_workers(QueueLoad(1, 90, 1), 2, POLICY) == 3
+
+
+def test_queue_load():
+    redis_conn = fakeredis.FakeRedis()
+    queue = Queue("high", connection=redis_conn)
+    assert oldest_job_age(redis_conn, queue) == 0
+
+    queue.enqueue("builtins.dict")
+    queue.enqueue("builtins.dict")
+    time.sleep(0.05)
+
+    load = read_load(redis_conn, ["high", "low"])
+    assert load.depth == 2
+    assert 0 < load.oldest_age < 10
+
+
+def test_scale_up_and_drain():
+    """Workers start at once and are retired one at a time after the delay"""
+    supervisor = Supervisor(
+        ["default"],
+        POLICY,
+        command=[sys.executable, "-c", "import time; time.sleep(30)"],
+    )
+    try:
+        supervisor.scale_to(2)
+        assert len(supervisor.workers) == 2
+        # Signals for the supervisor's process group do not reach the workers
+        for worker in supervisor.workers:
+            assert os.getpgid(worker.pid) == worker.pid != os.getpgrp()
+
+        with patch("redisStore.supervisor.SUPERVISOR_SCALE_DOWN_DELAY", 0):
+            supervisor.scale_to(1)
+        assert len(supervisor.workers) == 1
+        drained = next(iter(supervisor.draining))
+        assert drained.wait(timeout=10) is not None
+    finally:
+        supervisor.drain()
+    assert not supervisor.workers and not supervisor.draining
+
+
+def test_stop_leaves_workers_to_run_loop():
+    """The signal handler must not touch the worker list the loop iterates"""
+    supervisor = Supervisor(["default"], POLICY)
+    worker = MagicMock()
+    supervisor.workers.append(worker)
+
+    supervisor.stop(signal.SIGTERM, None)
+
+    assert supervisor._stopping
+    assert supervisor.workers == [worker]
+    worker.send_signal.assert_not_called()
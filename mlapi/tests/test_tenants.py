@@ -0,0 +1,181 @@
+import time
+import fakeredis
+import pytest
+from fastapi.testclient import TestClient
+from unittest.mock import patch
+from rq import Queue, SimpleWorker
+from rq.registry import FinishedJobRegistry, StartedJobRegistry
+from main import app
+from redisStore.queue import add_task_to_queue
+from redisStore.tenants import (
+    FairQueue,
+    estimate_wait,
+    parse_caps,
+    split_queue_name,
+    tenant_queue_name,
+    tenant_queues,
+)
+
+client = TestClient(app)
+
+
+@pytest.fixture
+def redis_conn():
+    redis_conn = fakeredis.FakeRedis()
+    with (
+        patch("redisStore.tenants.FAIR_SHARE", True),
+        patch("redisStore.queue.get_redis_con", return_value=redis_conn),
+    ):
+        yield redis_conn
+
+
+def _submit(tenant, count):
+    return [add_task_to_queue(len, "abc", tenant=tenant) for _ in range(count)]
+
+
+def _dequeue_tenants(redis_conn):
+    """Dequeue every waiting job and return the tenant of each"""
+    tenants = []
+    while True:
+        result = FairQueue.dequeue_any(
+            [FairQueue("default", connection=redis_conn)], None, connection=redis_conn
+        )
+        if result is None:
+            return tenants
+        tenants.append(split_queue_name(result[1].name)[0])
+
+
+def test_queue_names():
+    assert tenant_queue_name("lane:short", "acme") == "lane:short"
+    with patch("redisStore.tenants.FAIR_SHARE", True):
+        assert tenant_queue_name("lane:short", "acme") == "tenant:acme:lane:short"
+        assert tenant_queue_name("default", "::1") == "tenant:__1:default"
+        assert tenant_queue_name("default", None) == "default"
+    assert split_queue_name("tenant:acme:lane:short") == ("acme", "lane:short")
+    assert split_queue_name("default") == (None, "default")
+    assert parse_caps("acme:8, trial:1") == {"acme": 8, "trial": 1}
+
+
+def test_tenant_jobs_use_own_queue(redis_conn):
+    job = add_task_to_queue(len, "abc", tenant="acme")
+
+    assert job.origin == "tenant:acme:default"
+    assert tenant_queues(redis_conn, "default") == ["tenant:acme:default"]
+    assert Queue("default", connection=redis_conn).count == 0
+
+
+def test_round_robin_across_tenants(redis_conn):
+    """A tenant's batch does not hold up another tenant's jobs"""
+    _submit("bulk", 4)
+    _submit("solo", 2)
+
+    assert _dequeue_tenants(redis_conn) == [
+        "bulk",
+        "solo",
+        "bulk",
+        "solo",
+        "bulk",
+        "bulk",
+    ]
+    # Emptied tenant queues are forgotten
+    _dequeue_tenants(redis_conn)
+    assert tenant_queues(redis_conn, "default") == []
+
+
+def test_concurrency_cap(redis_conn):
+    """Tenants running their cap are skipped until a job finishes"""
+    _submit("bulk", 2)
+    _submit("solo", 1)
+    started = StartedJobRegistry("tenant:bulk:default", connection=redis_conn)
+    redis_conn.zadd(started.key, {"running-job": time.time() + 60})
+
+    with patch("redisStore.tenants.TENANT_CAPS", {"bulk": 1}):
+        assert _dequeue_tenants(redis_conn) == ["solo"]
+        redis_conn.zrem(started.key, "running-job")
+        assert _dequeue_tenants(redis_conn) == ["bulk", "bulk"]
+
+
+def test_worker_runs_tenant_jobs(redis_conn):
+    jobs = _submit("bulk", 2) + _submit("solo", 1)
+    SimpleWorker(["default"], connection=redis_conn, queue_class=FairQueue).work(
+        burst=True
+    )
+
+    for job in jobs:
+        assert job.get_status(refresh=True) == "finished"
+    assert FinishedJobRegistry("tenant:solo:default", connection=redis_conn).count == 1
+
+
+def test_estimate_wait():
+    # Two tenants share four workers: two each
+    assert estimate_wait(4, 30.0, workers=4, active_tenants=2, cap=0) == 60.0
+    # A cap of one limits the tenant to one worker
+    assert estimate_wait(4, 30.0, workers=4, active_tenants=2, cap=1) == 120.0
+
+
+def test_job_position_endpoint(redis_conn):
+    jobs = _submit("bulk", 3)
+    _submit("solo", 1)
+
+    with patch("routes.jobs.get_redis_con", return_value=redis_conn):
+        response = client.get(f"/api/jobs/{jobs[2].id}/position")
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["tenant"] == "bulk"
+    assert body["queue"] == "default"
+    assert body["position"] == 3
+    assert body["active_tenants"] == 2
+    # Two jobs ahead, half of one worker, 30s per job by default
+    assert body["estimated_wait_seconds"] == 120.0
+
+
+def test_tenant_endpoint(redis_conn):
+    _submit("bulk", 2)
+
+    with (
+        patch("routes.jobs.get_redis_con", return_value=redis_conn),
+        patch("redisStore.tenants.TENANT_CAPS", {"bulk": 1}),
+    ):
+        response = client.get("/api/jobs/tenants/bulk")
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["concurrency_cap"] == 1
+    default = next(q for q in body["queues"] if q["queue"] == "default")
+    assert default["waiting"] == 2
+    assert default["estimated_wait_seconds"] == 60.0
+
+
+def test_tenant_endpoint_requires_fair_share():
+    response = client.get("/api/jobs/tenants/bulk")
+    assert response.status_code == 404
+
+
+def test_submission_uses_tenant_header(redis_conn):
+    with (
+        patch("utils.dependencies.TENANT_HEADER", "X-Tenant-ID"),
+        patch("routes.star_feedback.STAR_INLINE_MAX_CHARS", 0),
+    ):
+        response = client.post(
+            "/api/star_feedback/analyze",
+            json={"text": "I led the migration of our billing system."},
+            headers={"X-Tenant-ID": "acme"},
+        )
+
+    assert response.status_code == 200
+    assert Queue("tenant:acme:default", connection=redis_conn).count == 1
+
+
+def test_tenant_header_ignored_unless_configured(redis_conn):
+    """Clients cannot pick their tenant without a trusted proxy"""
+    with patch("routes.star_feedback.STAR_INLINE_MAX_CHARS", 0):
+        response = client.post(
+            "/api/star_feedback/analyze",
+            json={"text": "I led the migration of our billing system."},
+            headers={"X-Tenant-ID": "acme"},
+        )
+
+    assert response.status_code == 200
+    assert Queue("tenant:acme:default", connection=redis_conn).count == 0
+    assert Queue("tenant:testclient:default", connection=redis_conn).count == 1
@@ -0,0 +1,54 @@
+import json
+from tasks.helpers.phrase_matcher import PhraseMatcher, load_structure_phrases
+
+
+def test_phrase_matcher_uses_word_boundaries():
+    """Phrases should not match inside longer words"""
+    matcher = PhraseMatcher({"transition": ["first", "thus"]})
+    matches = matcher.scan("I have firsthand experience, thusly. First, I listened.")
+
+    assert [m.phrase for m in matches] == ["first"]
+    assert matches[0].start == 37
+
+
+def test_inflected_intro_and_conclusion_words():
+    """Intro and conclusion words match in any of their forms"""
+    matcher = PhraseMatcher(load_structure_phrases())
+    matches = matcher.scan(
+        "I started by introducing the team. Beginning with the audit...\n\n"
+        "In the end we concluded the migration."
+    )
+
+    assert matcher.counts(matches, "intro") == {
+        "started": 1,
+        "introducing": 1,
+        "beginning": 1,
+    }
+    assert matcher.counts(matches, "conclusion") == {"concluded": 1}
+
+
+def test_phrase_matcher_counts_and_positions():
+    """Every occurrence is reported with its span and category"""
+    matcher = PhraseMatcher(
+        {"transition": ["however", "in conclusion"], "conclusion": ["conclusion"]}
+    )
+    text = "However it rained. However we went.\n\nIn  conclusion it was fine."
+    matches = matcher.scan(text)
+
+    assert matcher.counts(matches, "transition") == {"however": 2, "in conclusion": 1}
+    # The longer phrase also credits the phrase it contains
+    assert matcher.counts(matches, "conclusion") == {"conclusion": 1}
+    conclusion = [m for m in matches if m.category == "conclusion"][0]
+    assert text[conclusion.start : conclusion.end] == "In  conclusion"
+
+
+def test_load_structure_phrases_overrides(tmp_path):
+    """Phrase lists can be replaced per category from a JSON file"""
+    path = tmp_path / "phrases.json"
+    path.write_text(json.dumps({"intro": ["to begin with"]}))
+
+    phrases = load_structure_phrases(str(path))
+
+    assert phrases["intro"] == ["to begin with"]
+    assert "however" in phrases["transition"]
+    assert "to sum up" in phrases["conclusion"]
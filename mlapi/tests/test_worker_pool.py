@@ -0,0 +1,59 @@
+import os
+import signal
+import time
+import pytest
+from unittest.mock import patch
+from redisStore.worker import WorkerPool, pool_memory_report, process_memory
+
+
+@pytest.mark.skipif(not os.path.exists("/proc/self/smaps_rollup"), reason="Linux only")
+def test_memory_report():
+    """A single process shares nothing, so nothing is saved"""
+    usage = process_memory(os.getpid())
+    assert usage["rss"] >= usage["pss"] > 0
+
+    report = pool_memory_report([os.getpid(), -1])
+    assert report["processes"] == 1
+    assert report["saved_bytes"] == report["rss_bytes"] - report["pss_bytes"]
+
+
+def test_pool_restarts_exited_workers():
+    """Workers that exit are rescheduled, with a delay once they fail fast"""
+    pool = WorkerPool(1, ["default"])
+    with patch("redisStore.worker.get_worker"):
+        pool._spawn(0)
+        deadline = time.monotonic() + 10
+        while pool._children and time.monotonic() < deadline:
+            pool._reap()
+            time.sleep(0.05)
+
+    assert not pool._children
+    assert pool._failures[0] == 1
+    assert pool._restart_at[0] >= time.monotonic()
+
+
+def test_pool_needs_a_worker():
+    with pytest.raises(ValueError):
+        WorkerPool(0)
+
+
+def test_pool_workers_signalled_once():
+    """Workers run in their own session and get a single warm shutdown"""
+    pool = WorkerPool(1, ["default"])
+    with patch("redisStore.worker.get_worker") as get_worker:
+        get_worker.return_value.work.side_effect = lambda **kwargs: time.sleep(30)
+        pool._spawn(0)
+    (pid,) = pool._children
+    try:
+        deadline = time.monotonic() + 10
+        while os.getpgid(pid) != pid and time.monotonic() < deadline:
+            time.sleep(0.05)
+        assert os.getpgid(pid) == pid != os.getpgrp()
+
+        with patch("redisStore.worker.os.kill") as kill:
+            pool._stop(signal.SIGINT, None)
+            pool._stop(signal.SIGINT, None)
+        kill.assert_called_once_with(pid, signal.SIGINT)
+    finally:
+        os.kill(pid, signal.SIGKILL)
+        os.waitpid(pid, 0)
@@ -0,0 +1,78 @@
+"""
+Dependencies shared by the submission routes.
+"""
+
+import os
+from typing import Optional
+
+from fastapi import HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+
+from redisStore.admission import admission_controller
+from redisStore.tenants import TENANT_HEADER
+
+# Header naming the client, set by a trusted proxy in front of the API. Unset,
+# the peer address is used: clients could otherwise pick their own identity.
+RATE_LIMIT_CLIENT_HEADER: Optional[str] = os.getenv("RATE_LIMIT_CLIENT_HEADER") or None
+
+
+def client_identity(request: Request) -> str:
+    """
+    Identify the client of a request: the peer address, or the first entry
+    of the proxy's header when one is configured.
+    """
+    if RATE_LIMIT_CLIENT_HEADER:
+        forwarded = request.headers.get(RATE_LIMIT_CLIENT_HEADER)
+        if forwarded:
+            return forwarded.split(",")[0].strip()
+    return request.client.host if request.client else "unknown"
+
+
+def tenant_identity(request: Request) -> str:
+    """
+    Identify the tenant of a submission, which owns its fair-share queues,
+    concurrency cap and idempotency keys: the proxy's tenant header when one
+    is configured, otherwise the client.
+    """
+    if TENANT_HEADER:
+        tenant = request.headers.get(TENANT_HEADER)
+        if tenant:
+            return tenant
+    return client_identity(request)
+
+
+def admit_client(request: Request, cost: int = 1):
+    """
+    Reject the submission with 429 and Retry-After when the queues are
+    overloaded or the client is over its rate limit.
+
+    Blocking; idempotent routes call it from their submit callback, so
+    replays of accepted submissions are neither rejected nor charged.
+
+    Args:
+        request: The incoming request
+        cost: Rate limit tokens the submission takes
+    """
+    decision = admission_controller.admit(client_identity(request), cost)
+    if not decision.allowed:
+        raise HTTPException(
+            status_code=429,
+            detail="Too many jobs are waiting, please retry later"
+            if decision.reason != "rate_limit"
+            else "Too many submissions, please retry later",
+            headers={"Retry-After": str(decision.retry_after)},
+        )
+
+
+async def check_admission(request: Request, cost: int = 1):
+    """
+    Admission control from async code, see `admit_client`.
+    """
+    await run_in_threadpool(admit_client, request, cost)
+
+
+async def admit_submission(request: Request):
+    """
+    Admission control for a submission of a single job.
+    """
+    await check_admission(request)
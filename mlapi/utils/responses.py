@@ -0,0 +1,257 @@
+"""
+Responses built from pre-serialized job results.
+
+Finished results are immutable, so every response carries a strong ETag
+derived from the job ID and the hash of the result, together with
+`Cache-Control: immutable`. Requests whose `If-None-Match` matches get an
+empty 304.
+"""
+
+import os
+from typing import Callable, Optional, Tuple, Type
+
+from fastapi import HTTPException, Query, Request
+from fastapi.responses import Response
+
+from redisStore.myconnection import get_async_redis_con
+from redisStore.result_store import (
+    IDENTITY,
+    StoredResult,
+    decode_json,
+    decompress,
+    encode_json,
+    load_result,
+    result_bytes_cache,
+)
+from pydantic import BaseModel
+from utils.result_views import ResultView
+
+# Seconds browsers may reuse a finished result without asking again
+RESULT_CACHE_MAX_AGE = int(os.getenv("RESULT_CACHE_MAX_AGE", 24 * 60 * 60))
+
+
+def accepts_encoding(accept_encoding: Optional[str], encoding: str) -> bool:
+    """
+    Check whether an Accept-Encoding header allows the given content coding.
+    """
+    if encoding == IDENTITY:
+        return True
+    for part in (accept_encoding or "").split(","):
+        name, _, params = part.strip().partition(";")
+        if name.strip().lower() not in (encoding, "*"):
+            continue
+        quality = params.strip()
+        return not (quality.startswith("q=") and float(quality[2:] or 0) == 0)
+    return False
+
+
+def make_etag(job_id: str, digest: str, *variant: str) -> str:
+    """
+    Strong ETag of one representation of a job result.
+
+    Args:
+        job_id: The job ID
+        digest: Hash of the result JSON
+        variant: Parts telling representations of the same result apart
+            (content coding, view, wrapping)
+
+    Returns:
+        str: Quoted entity tag
+    """
+    return '"' + ".".join((job_id, digest) + variant) + '"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """
+    Check the request's If-None-Match header against an ETag.
+    """
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    # If-None-Match uses weak comparison
+    return etag in (tag.strip().removeprefix("W/") for tag in header.split(","))
+
+
+def _cached_response(
+    request: Request,
+    etag: str,
+    build: Callable[[], Tuple[bytes, dict]],
+    vary: Optional[str] = None,
+) -> Response:
+    # A 304 carries the same validators and Vary as the 200 it stands for
+    headers = {
+        "ETag": etag,
+        "Cache-Control": f"private, max-age={RESULT_CACHE_MAX_AGE}, immutable",
+    }
+    if vary:
+        headers["Vary"] = vary
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+    body, extra_headers = build()
+    return Response(
+        content=body,
+        media_type="application/json",
+        headers={**headers, **extra_headers},
+    )
+
+
+def stored_result_response(
+    job_id: str, stored: StoredResult, request: Request
+) -> Response:
+    """
+    Send a stored JSON result as is, decompressing only for clients that do
+    not accept its encoding.
+
+    Args:
+        job_id: The job ID
+        stored: The stored result bytes
+        request: The incoming request
+
+    Returns:
+        Response: application/json response, or 304 if the client's copy is current
+    """
+    encoded = stored.encoding != IDENTITY and accepts_encoding(
+        request.headers.get("accept-encoding"), stored.encoding
+    )
+    variant = (stored.encoding,) if encoded else ()
+
+    def build():
+        if encoded:
+            return stored.body, {"Content-Encoding": stored.encoding}
+        return decompress(stored), {}
+
+    return _cached_response(
+        request,
+        make_etag(job_id, stored.digest, *variant),
+        build,
+        vary="Accept-Encoding",
+    )
+
+
+def wrapped_result_response(
+    job_id: str, stored: StoredResult, request: Request
+) -> Response:
+    """
+    Send a stored result as `{"result": ..., "status": "success"}` without
+    parsing it.
+
+    Args:
+        job_id: The job ID
+        stored: The stored result bytes
+        request: The incoming request
+
+    Returns:
+        Response: application/json response, or 304 if the client's copy is current
+    """
+
+    def build():
+        body = b'{"result":' + decompress(stored) + b',"status":"success"}'
+        return body, {}
+
+    return _cached_response(request, make_etag(job_id, stored.digest, "wrapped"), build)
+
+
+def result_view_response(
+    job_id: str, view: ResultView, stored: StoredResult, request: Request
+) -> Response:
+    """
+    Send the requested view of a result.
+
+    Args:
+        job_id: The job ID
+        view: Fields and timeline window to send
+        stored: The full result
+        request: The incoming request
+
+    Returns:
+        Response: application/json response with the timeline length before
+        paging in the X-Timeline-Total header, or 304 if the client's copy is
+        current
+    """
+
+    def build():
+        data, timeline_total = view.apply(decode_json(decompress(stored)))
+        headers = {}
+        if timeline_total is not None:
+            headers["X-Timeline-Total"] = str(timeline_total)
+        return encode_json(data), headers
+
+    return _cached_response(
+        request, make_etag(job_id, stored.digest, "view", view.key), build
+    )
+
+
+def finished_result_response(
+    job_id: str,
+    stored: StoredResult,
+    request: Request,
+    view: Optional[ResultView] = None,
+) -> Response:
+    """
+    Send a finished job's result, or the requested view of it.
+    """
+    if view is None or view.is_full:
+        return stored_result_response(job_id, stored, request)
+    return result_view_response(job_id, view, stored, request)
+
+
+async def get_stored_result(job_id: str) -> Optional[StoredResult]:
+    """
+    Get the pre-serialized result of a finished job, if the worker stored
+    one, from the in-process cache or Redis.
+    """
+    stored = result_bytes_cache.get(job_id)
+    if stored is not None:
+        return stored
+    redis_conn = get_async_redis_con()
+    try:
+        loaded = await load_result(redis_conn, job_id)
+    finally:
+        await redis_conn.aclose()
+    if loaded is None:
+        return None
+    stored, ttl = loaded
+    result_bytes_cache.put(job_id, stored, ttl)
+    return stored
+
+
+def result_view_query(
+    model: Type[BaseModel], timeline_path: Tuple[str, ...]
+) -> Callable[..., ResultView]:
+    """
+    Build a dependency that reads the result view query parameters.
+
+    Args:
+        model: Result model of the route
+        timeline_path: Location of the timeline in the result
+
+    Returns:
+        Callable: FastAPI dependency returning a `ResultView`
+    """
+
+    def dependency(
+        fields: Optional[str] = Query(
+            None,
+            description="Comma-separated dotted fields to return, e.g. "
+            "`evaluation.aggregateScore,evaluation.bigFive` (default: all)",
+        ),
+        timeline_offset: int = Query(
+            0, ge=0, description="First timeline entry to return"
+        ),
+        timeline_limit: Optional[int] = Query(
+            None, ge=1, description="Maximum timeline entries to return"
+        ),
+        buckets: Optional[int] = Query(
+            None, ge=1, description="Downsample the timeline to this many windows"
+        ),
+    ) -> ResultView:
+        try:
+            return ResultView(
+                model, timeline_path, fields, timeline_offset, timeline_limit, buckets
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+    return dependency
@@ -0,0 +1,233 @@
+"""
+Field projection and timeline paging/downsampling for job results.
+
+Long videos produce results dominated by their timeline, while summary views
+only need a few scores. A `ResultView` trims a result to the requested fields
+and timeline window before it is serialized.
+"""
+
+import hashlib
+import os
+from collections import Counter
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Type
+
+from pydantic import BaseModel
+
+# Upper bound on the `buckets` query parameter
+MAX_TIMELINE_BUCKETS = int(os.getenv("MAX_TIMELINE_BUCKETS", 1000))
+
+
+def parse_fields(model: Type[BaseModel], fields: str) -> List[Tuple[str, ...]]:
+    """
+    Parse a comma-separated list of dotted field paths.
+
+    Args:
+        model: Result model the paths must exist in
+        fields: e.g. "evaluation.aggregateScore,evaluation.bigFive"
+
+    Returns:
+        List[Tuple[str, ...]]: The paths, split on dots
+
+    Raises:
+        ValueError: If a path does not exist in the model
+    """
+    paths = []
+    for field in fields.split(","):
+        field = field.strip()
+        if not field:
+            continue
+        path = tuple(field.split("."))
+        current: Any = model
+        for name in path:
+            if not (isinstance(current, type) and issubclass(current, BaseModel)):
+                raise ValueError(f"Unknown field: {field}")
+            if name not in current.model_fields:
+                raise ValueError(f"Unknown field: {field}")
+            current = current.model_fields[name].annotation
+        paths.append(path)
+    if not paths:
+        raise ValueError("No fields requested")
+    return paths
+
+
+def project(data: Dict[str, Any], paths: Sequence[Tuple[str, ...]]) -> Dict[str, Any]:
+    """
+    Keep only the given field paths of a result, preserving nesting.
+    """
+    projected: Dict[str, Any] = {}
+    for path in paths:
+        source: Any = data
+        for name in path:
+            if not isinstance(source, dict) or name not in source:
+                break
+            source = source[name]
+        else:
+            target = projected
+            for name in path[:-1]:
+                target = target.setdefault(name, {})
+            target[path[-1]] = source
+    return projected
+
+
+def bucket_series(values: List[float], buckets: int) -> List[float]:
+    """
+    Downsample a numeric series to `buckets` window means.
+    """
+    if len(values) <= buckets:
+        return values
+    averaged = []
+    for i in range(buckets):
+        window = values[i * len(values) // buckets : (i + 1) * len(values) // buckets]
+        averaged.append(round(sum(window) / len(window), 4))
+    return averaged
+
+
+def bucket_intervals(
+    timeline: List[Dict[str, Any]], buckets: int
+) -> List[Dict[str, Any]]:
+    """
+    Aggregate answer timeline intervals into `buckets` equal time windows.
+
+    Each window reports its most common audio sentiment and the facial
+    emotions seen in it, most frequent first. Empty windows are dropped.
+    """
+    if len(timeline) <= buckets:
+        return timeline
+    first = min(entry["start"] for entry in timeline)
+    last = max(entry["end"] for entry in timeline)
+    width = max((last - first) / buckets, 1)
+
+    windows: List[List[Dict[str, Any]]] = [[] for _ in range(buckets)]
+    for entry in timeline:
+        windows[min(int((entry["start"] - first) / width), buckets - 1)].append(entry)
+
+    aggregated = []
+    for entries in windows:
+        if not entries:
+            continue
+        sentiments = Counter(entry["audioSentiment"] for entry in entries)
+        emotions = Counter(
+            emotion for entry in entries for emotion in entry.get("facialEmotion", [])
+        )
+        aggregated.append(
+            {
+                "start": min(entry["start"] for entry in entries),
+                "end": max(entry["end"] for entry in entries),
+                "audioSentiment": sentiments.most_common(1)[0][0],
+                "facialEmotion": [emotion for emotion, _ in emotions.most_common()],
+            }
+        )
+    return aggregated
+
+
+class ResultView:
+    """
+    Requested subset of a result: fields, timeline page and resolution.
+    """
+
+    def __init__(
+        self,
+        model: Type[BaseModel],
+        timeline_path: Tuple[str, ...],
+        fields: Optional[str] = None,
+        timeline_offset: int = 0,
+        timeline_limit: Optional[int] = None,
+        buckets: Optional[int] = None,
+    ):
+        """
+        Args:
+            model: Result model, used to validate `fields`
+            timeline_path: Location of the timeline in the result
+            fields: Comma-separated dotted field paths to keep (default: all)
+            timeline_offset: Index of the first timeline entry to return
+            timeline_limit: Maximum timeline entries to return
+            buckets: Downsample the timeline to this many windows
+
+        Raises:
+            ValueError: If a field does not exist or `buckets` is out of range
+        """
+        if buckets is not None and not 1 <= buckets <= MAX_TIMELINE_BUCKETS:
+            raise ValueError(f"buckets must be between 1 and {MAX_TIMELINE_BUCKETS}")
+        self.paths = parse_fields(model, fields) if fields else None
+        self.timeline_path = timeline_path
+        self.timeline_offset = timeline_offset
+        self.timeline_limit = timeline_limit
+        self.buckets = buckets
+
+    @property
+    def is_full(self) -> bool:
+        """
+        Whether the view is the whole, unmodified result.
+        """
+        return (
+            self.paths is None
+            and self.timeline_offset == 0
+            and self.timeline_limit is None
+            and self.buckets is None
+        )
+
+    @property
+    def key(self) -> str:
+        """
+        Short identifier of the view, used to tell its ETags apart.
+        """
+        fields = ",".join(".".join(path) for path in self.paths or ())
+        params = f"{fields}|{self.timeline_offset}|{self.timeline_limit}|{self.buckets}"
+        return hashlib.blake2b(params.encode("utf-8"), digest_size=4).hexdigest()
+
+    def _reshape_timeline(self, timeline: Any) -> Tuple[Any, int]:
+        end = (
+            self.timeline_offset + self.timeline_limit
+            if self.timeline_limit is not None
+            else None
+        )
+        if isinstance(timeline, dict):
+            # Facial timelines hold one series per emotion
+            if self.buckets is not None:
+                timeline = {
+                    name: bucket_series(values, self.buckets)
+                    for name, values in timeline.items()
+                }
+            total = max((len(values) for values in timeline.values()), default=0)
+            return {
+                name: values[self.timeline_offset : end]
+                for name, values in timeline.items()
+            }, total
+        if self.buckets is not None:
+            timeline = bucket_intervals(timeline, self.buckets)
+        return timeline[self.timeline_offset : end], len(timeline)
+
+    def apply(self, data: Dict[str, Any]) -> Tuple[Dict[str, Any], Optional[int]]:
+        """
+        Apply the view to a JSON-compatible result.
+
+        Args:
+            data: The full result
+
+        Returns:
+            Tuple: The trimmed result, and the number of timeline entries
+            before paging (None if the result has no timeline)
+        """
+        parent: Any = data
+        for name in self.timeline_path[:-1]:
+            parent = parent.get(name) if isinstance(parent, dict) else None
+        key = self.timeline_path[-1]
+        total = None
+        if isinstance(parent, dict) and parent.get(key) is not None:
+            reshaped, total = self._reshape_timeline(parent[key])
+            # Copy the path down to the timeline instead of mutating the input
+            data = self._replace(data, self.timeline_path, reshaped)
+        if self.paths is not None:
+            data = project(data, self.paths)
+        return data, total
+
+    @staticmethod
+    def _replace(
+        data: Dict[str, Any], path: Tuple[str, ...], value: Any
+    ) -> Dict[str, Any]:
+        copy = dict(data)
+        if len(path) == 1:
+            copy[path[0]] = value
+        else:
+            copy[path[0]] = ResultView._replace(data[path[0]], path[1:], value)
+        return copy